@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+from library.overdue import start_configured_sweeper  # noqa: E402
+
+start_configured_sweeper()
@@ -0,0 +1,126 @@
+# OpenAPI-схема API, сгенерированная один раз: командой generate_schema при сборке или при первом запросе.
+# drf_yasg импортируется только при генерации — он тяжёлый и замедляет запуск каждого воркера.
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from library.conditional import not_modified
+
+SCHEMA_FILE = "openapi.json"
+# Для адресов с хэшем содержимого: ответ не меняется никогда
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+REDOC_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Library Snippets API</title>
+</head>
+<body>
+<redoc spec-url="{spec_url}"></redoc>
+<script src="{script_url}"></script>
+</body>
+</html>
+"""
+
+_lock = threading.Lock()
+_schema = None
+
+
+def build_schema():
+    """
+    Схема в JSON (bytes) по текущим маршрутам и сериализаторам.
+    """
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    info = openapi.Info(
+        title="Library Snippets API",
+        default_version='v1',
+        description="Library description",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="Library contact@snippets.local"),
+        license=openapi.License(name="Library BSD License"),
+    )
+    schema = OpenAPISchemaGenerator(info).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def generate_schema(directory=None):
+    """
+    Генерирует схему и сохраняет её в directory (по умолчанию API_SCHEMA_DIR) как openapi.json
+    и openapi.<хэш>.json; прежние файлы с хэшем удаляются. Возвращает (содержимое, хэш).
+    """
+    global _schema
+
+    content = build_schema()
+    digest = content_hash(content)
+    directory = directory or settings.API_SCHEMA_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("openapi.*.json"):
+        stale.unlink()
+    (directory / f"openapi.{digest}.json").write_bytes(content)
+    (directory / SCHEMA_FILE).write_bytes(content)
+    _schema = (content, digest)
+    return _schema
+
+
+def get_schema():
+    """
+    Схема из памяти процесса; при первом обращении — из файла, а если его нет
+    (или включён DEBUG и схема могла устареть) — генерируется.
+    """
+    global _schema
+
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                path = settings.API_SCHEMA_DIR / SCHEMA_FILE
+                if path.exists() and not settings.DEBUG:
+                    content = path.read_bytes()
+                else:
+                    content = build_schema()
+                _schema = (content, content_hash(content))
+    return _schema
+
+
+@require_GET
+def schema_json(request, digest=None):
+    content, current = get_schema()
+    if digest is not None and digest != current:
+        raise Http404("Схема обновлена, актуальный адрес — на странице документации.")
+
+    headers = {"ETag": quote_etag(current)}
+    response = not_modified(request, headers)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json", headers=headers)
+    if digest is None:
+        patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+@require_GET
+def redoc(request):
+    _, digest = get_schema()
+    page = REDOC_PAGE.format(
+        spec_url=reverse("schema-json-hashed", kwargs={"digest": digest}),
+        script_url=static("drf-yasg/redoc/redoc.min.js"),
+    )
+    response = HttpResponse(page)
+    # Страница ссылается на текущий хэш схемы, поэтому кэшируется так же недолго, как openapi.json
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    return response
@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 load_dotenv(override=True)
@@ -28,9 +29,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG=1 в .env — режим разработки (в т.ч. OpenAPI-схема генерируется заново вместо готового файла)
+DEBUG = os.getenv("DEBUG") == "1"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in (os.getenv("ALLOWED_HOSTS") or "localhost,127.0.0.1").split(",") if host]
 
 
 # Application definition
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -51,9 +54,11 @@ INSTALLED_APPS = [
 
     'users',
     'library',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,6 +103,45 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMemCache вытесняет давно не использованные записи (LRU) при достижении MAX_ENTRIES.
+# REDIS_URL переключает кэши на Redis, общий для всех процессов (нужен пакет redis).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Сводки читателей me/summary/ (library.summary)
+    'summary': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'summary',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Отметки об изменении пользователей и их групп (users.roles)
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+            'KEY_PREFIX': alias,
+            'TIMEOUT': CACHES[alias].get('TIMEOUT', 300),
+        }
+        for alias in CACHES
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,6 +179,11 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# OpenAPI-схема (manage.py generate_schema); при DEBUG генерируется заново при первом запросе к процессу
+API_SCHEMA_DIR = BASE_DIR / 'schema'
+# Cache-Control для redoc/ и schema/openapi.json (адрес с хэшем кэшируется бессрочно)
+API_SCHEMA_MAX_AGE = 300
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -149,7 +198,7 @@ AUTH_USER_MODEL = 'users.User'
 # Rest
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -161,8 +210,93 @@ REST_FRAMEWORK = {
     ),
 }
 
+# LIBRARY
+# Интервал (сек.) фоновой пометки просроченных выдач; 0 — отключено (используйте команду mark_overdue)
+OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL") or 0)
+# Сколько выдач помечать просроченными в одной транзакции
+OVERDUE_SWEEP_BATCH_SIZE = 1000
+# Возвращённые выдачи старше N дней переносятся в архив BorrowHistory (команда archive_borrows)
+BORROW_ARCHIVE_AFTER_DAYS = int(os.getenv("BORROW_ARCHIVE_AFTER_DAYS") or 365)
+# Сколько выдач переносить в одной транзакции
+BORROW_ARCHIVE_BATCH_SIZE = 1000
+# Сколько последних выдач показывать в карточке пользователя
+USER_BORROWS_HISTORY_LIMIT = 10
+# Сводка читателя me/summary/: сколько ближайших по сроку выдач показывать и сколько секунд кэшировать
+USER_SUMMARY_LOANS = 5
+USER_SUMMARY_CACHE_TIMEOUT = 300
+# Алиас CACHES для сводок; сброс виден другим воркерам только с общим бэкендом (REDIS_URL)
+USER_SUMMARY_CACHE_ALIAS = "summary"
+# Наличие книг books/availability/: максимум id в запросе и кэш в памяти процесса (записей, секунд)
+AVAILABILITY_MAX_IDS = 5000
+AVAILABILITY_CACHE_SIZE = 100000
+AVAILABILITY_CACHE_TTL = 30
+# Максимум заявок в одной пакетной операции bulk_approve / bulk_reject
+BOOK_REQUEST_BULK_LIMIT = 1000
+# Алиас CACHES для ответов публичного каталога (books/, authors/)
+CATALOG_CACHE_ALIAS = "catalog"
+# Сколько значений каждого измерения возвращает books/facets/
+FACET_LIMIT = 20
+
+# OUTBOX
+# Получатель событий выдач и заявок (library.outbox): WebhookSink, FileSink или MemorySink (для тестов)
+OUTBOX_SINK = os.getenv("OUTBOX_SINK", "library.outbox.WebhookSink")
+# Адрес вебхука: события отправляются POST-запросом пачкой (JSON-массив)
+OUTBOX_WEBHOOK_URL = os.getenv("OUTBOX_WEBHOOK_URL", "")
+OUTBOX_WEBHOOK_TIMEOUT = 5
+# Файл для FileSink (одно событие на строку, NDJSON)
+OUTBOX_FILE_PATH = BASE_DIR / "outbox.ndjson"
+# Сколько событий доставлять за раз
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE") or 100)
+# Повтор после ошибки доставки: BASE * 2^(попытка - 1) секунд, но не больше MAX
+OUTBOX_BACKOFF_BASE = 1
+OUTBOX_BACKOFF_MAX = 300
+# Пауза между опросами очереди, если событий нет (секунд)
+OUTBOX_POLL_INTERVAL = 1
+
+# LIVE EVENTS (SSE)
+# Шина событий для events/: library.bus.LocalBus (один процесс) или library.bus.PostgresBus (LISTEN/NOTIFY)
+EVENT_BUS = os.getenv("EVENT_BUS", "library.bus.LocalBus")
+EVENT_BUS_CHANNEL = "library_events"
+# Комментарий-heartbeat в простаивающем потоке, секунд
+SSE_HEARTBEAT_INTERVAL = 15
+# Очередь сообщений одного соединения; при переполнении клиент получает событие overflow
+SSE_QUEUE_SIZE = 100
+# Максимум книг в подписке ?books=
+SSE_MAX_BOOK_IDS = 1000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=600),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.RoleTokenObtainPairSerializer',
 }
+
+# MONITORING
+# Замеры запросов (время, SQL, сериализация, размер ответа) и гистограммы для /metrics
+MONITORING_ENABLED = os.getenv("MONITORING_ENABLED", "1") != "0"
+# Заголовок Server-Timing в ответах (видно в DevTools браузера)
+MONITORING_SERVER_TIMING = True
+# Токен Prometheus для /metrics (Authorization: Bearer ...); пустой — эндпоинт закрыт
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Запросы дольше порога (мс) попадают в журнал медленных запросов; 0 — отключено
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS") or 200)
+# Сколько последних медленных запросов хранить в памяти процесса
+SLOW_QUERY_BUFFER_SIZE = 500
+# Дополнительно сохранять медленные запросы из HTTP-запросов в таблицу (админка «Медленные запросы»)
+SLOW_QUERY_PERSIST = os.getenv("SLOW_QUERY_PERSIST") == "1"
+# Сколько кадров стека из кода проекта сохранять
+SLOW_QUERY_STACK_DEPTH = 8
+# Комментарии sqlcommenter к SQL (обработчик, действие, метод, id запроса) — для pg_stat_statements и логов БД
+SQL_COMMENTER_ENABLED = os.getenv("SQL_COMMENTER_ENABLED") == "1"
+# id запроса делает текст каждого запроса уникальным; отключите при серверных подготовленных выражениях
+SQL_COMMENTER_REQUEST_ID = os.getenv("SQL_COMMENTER_REQUEST_ID", "1") != "0"
+
+# Группы из claim 'roles' JWT и кэш пользователей процесса (users.authentication). Отметки об изменениях
+# пишутся в кэш USER_MARKERS_CACHE_ALIAS; доверять токену можно, только если этот кэш общий для всех процессов
+# и не вытесняет записи (Redis с maxmemory-policy noeviction). Иначе пользователь и группы читаются из БД.
+TRUST_TOKEN_ROLES = os.getenv("TRUST_TOKEN_ROLES") == "1"
+if TRUST_TOKEN_ROLES and not os.getenv("REDIS_URL"):
+    raise ImproperlyConfigured("TRUST_TOKEN_ROLES=1 требует общего кэша: задайте REDIS_URL.")
+USER_MARKERS_CACHE_ALIAS = "users"
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 60
@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш ограниченного размера: записи живут не дольше ttl секунд,
+    при переполнении вытесняются давно не использованные.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, newer_than=0):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if stored_at < newer_than or time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
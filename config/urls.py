@@ -1,28 +1,17 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.urls import re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Library Snippets API",
-      default_version='v1',
-      description="Library description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="Library contact@snippets.local"),
-      license=openapi.License(name="Library BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from .schema import redoc, schema_json
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls', namespace='users')),
     path('api/library/', include('library.urls', namespace='library')),
+    path('', include('monitoring.urls', namespace='monitoring')),
 
-    # Swagger
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Документация: схема генерируется один раз (manage.py generate_schema), см. config/schema.py
+    path('redoc/', redoc, name='schema-redoc'),
+    path('schema/openapi.json', schema_json, name='schema-json'),
+    re_path(r'^schema/openapi\.(?P<digest>[0-9a-f]{12})\.json$', schema_json, name='schema-json-hashed'),
 ]
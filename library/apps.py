@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library'
+
+    def ready(self):
+        # Фоновую пометку просрочек запускают только точки входа сервера (config.wsgi, config.asgi):
+        # ready() выполняется и в manage.py migrate/shell/test, и в родительском процессе автоперезагрузки
+        from library import signals  # noqa: F401
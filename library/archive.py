@@ -0,0 +1,82 @@
+# Перенос закрытых выдач из Borrow в архив BorrowHistory (секционирован по месяцам на PostgreSQL).
+# Списки и выгрузка истории читают обе таблицы через представление BorrowRecord.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from library.models import Borrow, BorrowHistory
+
+HISTORY_FIELDS = ("id", "user_id", "book_id", "borrowed_at", "due_date", "returned_at", "status", "updated_at")
+
+# Секции, созданные этим процессом (чтобы не выполнять DDL перед каждой пачкой)
+_partitions = set()
+
+
+def month_bounds(day):
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def partition_name(month):
+    return f"{BorrowHistory._meta.db_table}_p{month:%Y_%m}"
+
+
+def ensure_partitions(days):
+    """
+    Создаёт недостающие месячные секции архива для дат выдачи days (только PostgreSQL).
+    """
+    if connection.vendor != "postgresql":
+        return
+    months = {month_bounds(day) for day in days} - _partitions
+    if not months:
+        return
+    table = connection.ops.quote_name(BorrowHistory._meta.db_table)
+    with connection.cursor() as cursor:
+        for start, end in sorted(months):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(partition_name(start))} "
+                f"PARTITION OF {table} FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+    # При откате транзакции откатится и DDL, поэтому запоминаем секции только после фиксации
+    transaction.on_commit(lambda: _partitions.update(months))
+
+
+def archive_batch(before, batch_size):
+    """
+    Переносит до batch_size возвращённых до before выдач в одной транзакции:
+    INSERT в архив и DELETE из Borrow. Возвращает число перенесённых.
+    """
+    with transaction.atomic():
+        rows = list(
+            Borrow.objects.select_for_update(skip_locked=True)
+            .filter(status="returned", returned_at__lt=before)
+            .order_by("returned_at")
+            .values_list(*HISTORY_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ensure_partitions(row[3] for row in rows)
+        archived_at = timezone.now()
+        BorrowHistory.objects.bulk_create(
+            BorrowHistory(**dict(zip(HISTORY_FIELDS, row)), archived_at=archived_at) for row in rows
+        )
+        Borrow.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_returned_borrows(before=None, batch_size=None):
+    """
+    Переносит в архив все выдачи, возвращённые раньше before
+    (по умолчанию — BORROW_ARCHIVE_AFTER_DAYS дней назад). Возвращает число перенесённых.
+    """
+    before = before or timezone.now() - timedelta(days=settings.BORROW_ARCHIVE_AFTER_DAYS)
+    batch_size = batch_size or settings.BORROW_ARCHIVE_BATCH_SIZE
+    total = 0
+    while True:
+        moved = archive_batch(before, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
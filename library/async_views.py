@@ -0,0 +1,173 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from users.authentication import CachedJWTAuthentication
+from users.roles import ais_administrator
+
+from .bus import book_key, event_stream, user_key
+from .cache import cached_response, catalog_cache
+from .filters import BookFilter, BookSearchFilter
+from .models import Author, Book, BookRequest, BorrowRecord
+from .serializers import (
+    AuthorSerializer, BookRequestSerializer, BookSerializer, BorrowSerializer, EventStreamSerializer
+)
+
+
+def error_response(exc):
+    return JsonResponse(
+        exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail},
+        status=exc.status_code, safe=False,
+    )
+
+
+class AsyncListView(View):
+    """
+    Асинхронный список только для чтения: тот же JSON, что и у соответствующего DRF-представления
+    (count/next/previous/results). Запросы к БД — через async ORM (Django выполняет их в потоке запроса),
+    фильтры и сериализаторы DRF работают с уже загруженными объектами и к БД не обращаются.
+    Ответ из кэша каталога отдаётся без запросов к БД; кэш (в том числе Redis) не блокирует цикл событий.
+    """
+    serializer_class = None
+    filter_backends = ()
+    filterset_class = None
+    search_fields = ()
+    ordering_fields = ()
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # Ответ не зависит от пользователя и кэшируется в кэше каталога (см. CatalogCacheMixin)
+    catalog_cached = False
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.user = await self.authenticate(request)
+            drf_request = Request(request)
+            queryset = self.filter_queryset(drf_request, await self.get_queryset())
+            if self.catalog_cached:
+                return await self.cached_page(request, queryset)
+            return JsonResponse(await self.paginate(request, queryset))
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+    @staticmethod
+    async def authenticate(request):
+        result = await CachedJWTAuthentication().aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        return result[0]
+
+    async def get_queryset(self):
+        raise NotImplementedError
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    async def paginate(self, request, queryset):
+        page_size = self.get_page_size(request)
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 0
+        count = await queryset.acount()
+        pages = max((count + page_size - 1) // page_size, 1)
+        if not 1 <= page <= pages:
+            raise exceptions.NotFound("Неверная страница.")
+
+        offset = (page - 1) * page_size
+        rows = [obj async for obj in queryset[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+        if page > 1:
+            previous = replace_query_param(url, "page", page - 1) if page > 2 else remove_query_param(url, "page")
+        else:
+            previous = None
+        return {
+            "count": count,
+            "next": replace_query_param(url, "page", page + 1) if page < pages else None,
+            "previous": previous,
+            "results": self.serializer_class(rows, many=True).data,
+        }
+
+    async def cached_page(self, request, queryset):
+        # Версия каталога, чтение и статистика — сетевые обращения при Redis: одним переходом в поток
+        key, data = await sync_to_async(cached_response)(request, f"async:{type(self).__name__}")
+        if data is not None:
+            return JsonResponse(data, headers={"X-Cache": "HIT"})
+        data = await self.paginate(request, queryset)
+        await catalog_cache().aset(key, data)
+        return JsonResponse(data, headers={"X-Cache": "MISS"})
+
+
+class AsyncBookListView(AsyncListView):
+    serializer_class = BookSerializer
+    filter_backends = (DjangoFilterBackend, BookSearchFilter, OrderingFilter)
+    filterset_class = BookFilter
+    search_fields = ("title", "author__last_name", "genre")
+    ordering_fields = ("title", "created_at")
+    catalog_cached = True
+
+    async def get_queryset(self):
+        return Book.objects.all()
+
+
+class AsyncAuthorListView(AsyncListView):
+    serializer_class = AuthorSerializer
+    catalog_cached = True
+
+    async def get_queryset(self):
+        return Author.objects.all()
+
+
+class AsyncBorrowListView(AsyncListView):
+    serializer_class = BorrowSerializer
+
+    async def get_queryset(self):
+        return BorrowRecord.objects.filter(user=self.user).select_related("user", "book").with_effective_status()
+
+
+class AsyncBookRequestListView(AsyncListView):
+    serializer_class = BookRequestSerializer
+
+    async def get_queryset(self):
+        queryset = BookRequest.objects.select_related("user", "book")
+        if await ais_administrator(self.user):
+            return queryset.filter(status="pending")
+        return queryset.filter(user=self.user)
+
+
+class EventStreamView(View):
+    """
+    Поток server-sent events: изменения наличия книг из ?books=1,2,3 (событие availability)
+    и события выдач и заявок текущего пользователя (borrow.*, book_request.*).
+    Соединение не занимает поток: ожидание идёт в цикле событий ASGI-сервера.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await AsyncListView.authenticate(request)
+            ids = [part for value in request.GET.getlist("books") for part in value.split(",") if part]
+            serializer = EventStreamSerializer(data={"books": ids} if ids else {})
+            serializer.is_valid(raise_exception=True)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+        keys = [user_key(user.pk), *(book_key(book_id) for book_id in serializer.validated_data.get("books", ()))]
+        response = StreamingHttpResponse(event_stream(keys), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Не буферизовать поток в nginx
+        response["X-Accel-Buffering"] = "no"
+        return response
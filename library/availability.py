@@ -0,0 +1,66 @@
+# Наличие экземпляров для OPAC и киосков: сотни и тысячи книг одним запросом.
+# Ответы по книгам кэшируются в памяти процесса и сбрасываются при выдаче, возврате и правке выдач (library.signals);
+# изменения из других процессов видны не позже чем через AVAILABILITY_CACHE_TTL секунд.
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+
+from config.ttlcache import TTLCache
+from library.models import ACTIVE_BORROW_STATUSES, Book, Borrow
+
+availability_cache = TTLCache(maxsize=settings.AVAILABILITY_CACHE_SIZE, ttl=settings.AVAILABILITY_CACHE_TTL)
+
+
+def query_availability(book_ids):
+    """
+    Остаток и ближайший срок возврата (MIN(due_date) активных выдач) для книг book_ids одним запросом.
+    Срок — коррелированным подзапросом по индексу book_id выдач, без GROUP BY по книгам.
+    """
+    next_return = (
+        Borrow.objects.filter(book=OuterRef("pk"), status__in=ACTIVE_BORROW_STATUSES).order_by()
+        .values("book").annotate(due_date=Min("due_date")).values("due_date")
+    )
+    rows = (
+        Book.objects.filter(pk__in=book_ids).order_by()
+        .annotate(next_return_date=Subquery(next_return))
+        .values_list("pk", "total_copies", "available_copies", "next_return_date")
+    )
+    return {
+        pk: {"id": pk, "total_copies": total, "available_copies": available, "next_return_date": next_return}
+        for pk, total, available, next_return in rows
+    }
+
+
+def lookup_availability(book_ids):
+    """
+    Наличие книг в порядке book_ids (без повторов): из кэша, недостающие — одним запросом.
+    Возвращает (список найденных, список id несуществующих книг).
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    found = {}
+    for book_id in book_ids:
+        item = availability_cache.get(book_id)
+        if item is not None:
+            found[book_id] = item
+    missing = [book_id for book_id in book_ids if book_id not in found]
+    if missing:
+        loaded = query_availability(missing)
+        for book_id, item in loaded.items():
+            availability_cache.set(book_id, item)
+        found.update(loaded)
+    results = [found[book_id] for book_id in book_ids if book_id in found]
+    return results, [book_id for book_id in book_ids if book_id not in found]
+
+
+def forget_availability(book_ids):
+    """
+    Сбрасывает кэш книг — сразу и повторно после фиксации транзакции, как и версию каталога.
+    """
+    book_ids = list(book_ids)
+
+    def forget():
+        for book_id in book_ids:
+            availability_cache.pop(book_id)
+
+    forget()
+    transaction.on_commit(forget, robust=True)
@@ -0,0 +1,235 @@
+# Живые события для потока SSE (events/): шина публикации/подписки внутри процесса (LocalBus)
+# и межпроцессный вариант на PostgreSQL LISTEN/NOTIFY (PostgresBus). Выбирается настройкой EVENT_BUS.
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+from library import outbox
+from library.models import Book
+
+logger = logging.getLogger(__name__)
+
+# События, меняющие остаток экземпляров
+AVAILABILITY_TOPICS = (outbox.BORROW_CREATED, outbox.BORROW_RETURNED)
+
+
+def book_key(book_id):
+    return f"book:{book_id}"
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """
+    Подписка одного соединения: очередь в цикле событий подписчика. Если клиент не успевает читать
+    и очередь заполнена, новые сообщения отбрасываются, а клиент получает событие overflow.
+    """
+
+    def __init__(self, keys, loop, maxsize):
+        self.keys = frozenset(keys)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, messages):
+        for message in messages:
+            try:
+                self.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                return
+
+
+class LocalBus:
+    """
+    Шина внутри процесса. Подписки индексируются по ключам (book:<id>, user:<id>), поэтому публикация
+    не перебирает все соединения. publish можно вызывать из любого потока.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, keys):
+        """
+        Вызывается из цикла событий, в котором подписчик будет читать очередь.
+        """
+        subscription = Subscription(keys, asyncio.get_running_loop(), settings.SSE_QUEUE_SIZE)
+        with self._lock:
+            for key in subscription.keys:
+                self._subscriptions[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscriptions.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[key]
+
+    def has_subscribers(self, keys):
+        with self._lock:
+            return any(key in self._subscriptions for key in keys)
+
+    def publish(self, messages):
+        """
+        messages — пары (ключи, сообщение); сообщение — {"event": имя, "data": данные}.
+        """
+        self.deliver(messages)
+
+    def deliver(self, messages):
+        batches = defaultdict(list)
+        with self._lock:
+            for keys, message in messages:
+                targets = set().union(*(self._subscriptions.get(key, ()) for key in keys))
+                for subscription in targets:
+                    batches[subscription].append(message)
+        for subscription, batch in batches.items():
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, batch)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+
+class PostgresBus(LocalBus):
+    """
+    Межпроцессная шина: publish отправляет pg_notify, а поток-слушатель каждого процесса
+    (запускается при первой подписке) доставляет сообщения своим подписчикам.
+    """
+
+    def __init__(self, channel=None):
+        super().__init__()
+        self.channel = channel or settings.EVENT_BUS_CHANNEL
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, keys):
+        self.start_listener()
+        return super().subscribe(keys)
+
+    def has_subscribers(self, keys):
+        # Подписчики других процессов неизвестны
+        return True
+
+    def publish(self, messages):
+        with connection.cursor() as cursor:
+            for keys, message in messages:
+                # Отдельное уведомление на сообщение: размер payload NOTIFY ограничен 8000 байт
+                payload = json.dumps([sorted(keys), message], cls=DjangoJSONEncoder)
+                cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def start_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self.listen, name="event-bus-listener", daemon=True)
+                self._listener.start()
+
+    def listen(self):
+        import psycopg2
+
+        while True:
+            listener = None
+            try:
+                listener = psycopg2.connect(**connections["default"].get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f"LISTEN {connection.ops.quote_name(self.channel)}")
+                while True:
+                    if select.select([listener], [], [], settings.SSE_HEARTBEAT_INTERVAL) == ([], [], []):
+                        continue
+                    listener.poll()
+                    messages = []
+                    while listener.notifies:
+                        keys, message = json.loads(listener.notifies.pop(0).payload)
+                        messages.append((keys, message))
+                    self.deliver(messages)
+            except psycopg2.Error:
+                logger.exception("Слушатель шины событий потерял соединение, переподключение")
+                time.sleep(1)
+            finally:
+                if listener is not None:
+                    listener.close()
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = import_string(settings.EVENT_BUS)()
+    return _bus
+
+
+def live_messages(events, bus):
+    """
+    Сообщения для подписчиков по событиям outbox: событие — владельцу выдачи или заявки,
+    новый остаток — подписчикам книги (один запрос, только если у книг есть подписчики).
+    """
+    messages = [
+        ([user_key(event.payload["user_id"])], {"event": event.topic, "data": event.payload}) for event in events
+    ]
+    book_ids = {event.payload["book_id"] for event in events if event.topic in AVAILABILITY_TOPICS}
+    if book_ids and bus.has_subscribers([book_key(book_id) for book_id in book_ids]):
+        rows = Book.objects.filter(pk__in=book_ids).values_list("pk", "available_copies", "total_copies")
+        messages += [
+            ([book_key(pk)], {"event": "availability",
+                              "data": {"id": pk, "available_copies": available, "total_copies": total}})
+            for pk, available, total in rows
+        ]
+    return messages
+
+
+def publish_events(events, bus=None):
+    """
+    Публикует события outbox в шину. Вызывается после фиксации транзакции (library.signals).
+    """
+    bus = bus or get_bus()
+    messages = live_messages(events, bus)
+    if messages:
+        bus.publish(messages)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+
+
+async def event_stream(keys, bus=None):
+    """
+    Поток text/event-stream для подписки на keys: событие ready, затем сообщения шины;
+    при простое — комментарий-heartbeat каждые SSE_HEARTBEAT_INTERVAL секунд (держит прокси и соединение).
+    """
+    bus = bus or get_bus()
+    subscription = bus.subscribe(keys)
+    try:
+        yield format_event("ready", {"keys": sorted(subscription.keys)})
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), settings.SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if subscription.overflowed:
+                # Часть сообщений потеряна: клиенту нужно перечитать состояние
+                subscription.overflowed = False
+                yield format_event("overflow", {})
+            yield format_event(message["event"], message["data"])
+    finally:
+        bus.unsubscribe(subscription)
@@ -0,0 +1,109 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from library.conditional import VALIDATOR_HEADERS, not_modified
+
+VERSION_KEY = "catalog:version"
+STATS_KEY = "catalog:stats:{}"
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def catalog_version():
+    """
+    Текущая версия каталога. Если ключ вытеснен, создаётся новая версия:
+    записи под старой версией больше не читаются.
+    """
+    cache = catalog_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    catalog_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def record(event):
+    cache = catalog_cache()
+    key = STATS_KEY.format(event)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счётчик вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    values = catalog_cache().get_many([STATS_KEY.format("hits"), STATS_KEY.format("misses")])
+    hits = values.get(STATS_KEY.format("hits"), 0)
+    misses = values.get(STATS_KEY.format("misses"), 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 3) if total else None}
+
+
+def reset_cache_stats():
+    catalog_cache().delete_many([STATS_KEY.format("hits"), STATS_KEY.format("misses")])
+
+
+def cache_key(request, prefix):
+    """
+    Ключ ответа: версия каталога, хост (ссылки пагинации абсолютные), путь и параметры запроса
+    в каноническом виде — порядок параметров и пустые значения на ключ не влияют.
+    Принимает и запрос DRF, и HttpRequest (асинхронные представления).
+    """
+    query = getattr(request, "query_params", request.GET)
+    params = sorted(
+        (name, value)
+        for name, values in query.lists()
+        for value in values
+        if value != ""
+    )
+    raw = f"{request.get_host()}{request.path}?{urlencode(params)}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"catalog:{catalog_version()}:{prefix}:{digest}"
+
+
+def cached_response(request, prefix):
+    """
+    Ключ ответа и запись из кэша (None при промахе) с учётом попадания в статистике.
+    Все обращения к кэшу в одном вызове: асинхронные представления переходят в поток один раз.
+    """
+    key = cache_key(request, prefix)
+    cached = catalog_cache().get(key)
+    record("hits" if cached is not None else "misses")
+    return key, cached
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует ответы списка публичного каталога. Ответ не зависит от пользователя,
+    поэтому записи общие; сбрасываются сменой версии каталога (library.signals).
+    Вместе с данными хранятся ETag/Last-Modified: условный запрос при попадании обходится без БД.
+    """
+    cache_prefix = None
+
+    def list(self, request, *args, **kwargs):
+        key, cached = cached_response(request, self.cache_prefix or type(self).__name__)
+        if cached is not None:
+            data, headers = cached
+            response = not_modified(request, headers) or Response(data, headers=headers)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {name: response[name] for name in VALIDATOR_HEADERS if name in response}
+            catalog_cache().set(key, (response.data, headers))
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,295 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from library import outbox
+from library.facets import adjust_book_availability, adjust_facets
+from library.models import ACTIVE_BORROW_STATUSES, Book, BookRequest, Borrow, default_due_date
+from library.signals import book_requests_changed, circulation_changed
+
+
+class CheckoutError(Exception):
+    message = "Операция выдачи не выполнена."
+
+    def __init__(self, message=None):
+        super().__init__(message or self.message)
+
+
+class NoCopiesAvailable(CheckoutError):
+    message = "Нет доступных экземпляров книги."
+
+
+class AlreadyBorrowed(CheckoutError):
+    message = "У пользователя уже есть активный borrow для этой книги."
+
+
+class AlreadyReturned(CheckoutError):
+    message = "Эта книга уже была возвращена."
+
+
+class RequestAlreadyProcessed(CheckoutError):
+    message = "Эта заявка уже обработана."
+
+
+class BorrowStillActive(CheckoutError):
+    message = "Выдача не закрыта: сначала верните книгу."
+
+
+def reserve_copy(book_id):
+    """
+    Резервирует экземпляр условным UPDATE. Возвращает False, если свободных копий нет.
+    Последний экземпляр резервируется отдельным UPDATE: так известно, что книга стала недоступна,
+    и сводка фасетов уменьшается без лишних запросов в остальных случаях.
+    """
+    books = Book.objects.filter(pk=book_id)
+    while True:
+        now = timezone.now()
+        if books.filter(available_copies__gt=1).update(available_copies=F("available_copies") - 1, updated_at=now):
+            return True
+        if books.filter(available_copies=1).update(available_copies=0, updated_at=now):
+            adjust_book_availability(book_id, -1)
+            return True
+        # Остаток мог измениться между двумя UPDATE
+        if not books.filter(available_copies__gt=0).exists():
+            return False
+
+
+def release_copy(book_id):
+    """
+    Возвращает экземпляр в фонд, не превышая total_copies. Возврат в пустой фонд — отдельным UPDATE
+    (книга снова доступна, сводка фасетов увеличивается).
+    """
+    books = Book.objects.filter(pk=book_id, available_copies__lt=F("total_copies"))
+    while True:
+        now = timezone.now()
+        if books.filter(available_copies__gt=0).update(available_copies=F("available_copies") + 1, updated_at=now):
+            return True
+        if books.filter(available_copies=0).update(available_copies=1, updated_at=now):
+            adjust_book_availability(book_id, 1)
+            return True
+        if not books.exists():
+            return False
+
+
+def _checkout(user, book, due_date=None):
+    # Сначала остаток (UPDATE блокирует строку книги), затем вставка выдачи — тот же порядок блокировок,
+    # что в bulk_approve_requests: конкурирующие выдачи одной книги ждут друг друга, а не взаимоблокируются
+    if not reserve_copy(book.pk):
+        raise NoCopiesAvailable()
+    try:
+        with transaction.atomic():
+            borrow = Borrow.objects.create(user=user, book=book, due_date=due_date or default_due_date())
+    except IntegrityError:
+        raise AlreadyBorrowed()
+    circulation_changed.send(sender=Borrow, book_ids=[book.pk], user_ids=[user.pk])
+    return borrow
+
+
+def borrow_created_event(borrow):
+    return outbox.borrow_event(outbox.BORROW_CREATED, borrow.pk, borrow.user_id, borrow.book_id, borrow.due_date,
+                               status=borrow.status)
+
+
+def checkout(user, book, due_date=None):
+    """
+    Выдаёт книгу пользователю. Строка книги блокируется только на время короткой транзакции:
+    условное уменьшение остатка и вставка выдачи (уникальность активной выдачи проверяет БД).
+    """
+    with transaction.atomic():
+        borrow = _checkout(user, book, due_date)
+        outbox.record([borrow_created_event(borrow)])
+    return borrow
+
+
+def return_borrow(borrow):
+    """
+    Закрывает выдачу и возвращает экземпляр. Повторный возврат отклоняется.
+    """
+    returned_at = timezone.now()
+    with transaction.atomic():
+        updated = Borrow.objects.filter(pk=borrow.pk, status__in=ACTIVE_BORROW_STATUSES).update(
+            status="returned", returned_at=returned_at, updated_at=returned_at
+        )
+        if not updated:
+            raise AlreadyReturned()
+        release_copy(borrow.book_id)
+        circulation_changed.send(sender=Borrow, book_ids=[borrow.book_id], user_ids=[borrow.user_id])
+        outbox.record([outbox.borrow_event(outbox.BORROW_RETURNED, borrow.pk, borrow.user_id, borrow.book_id,
+                                           borrow.due_date, returned_at=returned_at)])
+    borrow.status = "returned"
+    borrow.returned_at = returned_at
+    borrow.updated_at = returned_at
+    return borrow
+
+
+def delete_borrow(borrow):
+    """
+    Удаляет закрытую выдачу. Активную удалить нельзя: экземпляр остался бы выданным без записи о выдаче.
+    """
+    deleted, _ = Borrow.objects.filter(pk=borrow.pk, status="returned").delete()
+    if not deleted:
+        raise BorrowStillActive()
+
+
+def approve_request(book_request):
+    """
+    Одобряет заявку в ожидании и выдаёт книгу в одной транзакции.
+    События об одобрении и о выдаче записываются одной вставкой.
+    """
+    with transaction.atomic():
+        updated = BookRequest.objects.filter(pk=book_request.pk, status="pending").update(
+            status="approved", updated_at=timezone.now()
+        )
+        if not updated:
+            raise RequestAlreadyProcessed()
+        borrow = _checkout(book_request.user, book_request.book, due_date=book_request.desired_due_date)
+        outbox.record([
+            outbox.request_event(outbox.REQUEST_APPROVED, book_request, borrow_id=borrow.pk),
+            borrow_created_event(borrow),
+        ])
+    book_request.status = "approved"
+    return borrow
+
+
+def _pending_requests(request_ids, failed):
+    """
+    Заявки в ожидании из request_ids (в порядке создания); для остальных id пишет ошибку в failed.
+    """
+    requests = list(
+        BookRequest.objects.select_for_update()
+        .filter(pk__in=request_ids, status="pending")
+        .order_by("created_at", "pk")
+    )
+    found = {request.pk for request in requests}
+    for request_id in request_ids:
+        if request_id not in found:
+            failed[request_id] = RequestAlreadyProcessed.message
+    return requests
+
+
+def bulk_approve_requests(request_ids):
+    """
+    Одобряет пачку заявок в одной транзакции: одна выборка активных выдач, одно уменьшение остатков
+    по всем книгам (CASE по book_id), bulk_create выдач и одно обновление статусов заявок.
+    Возвращает (одобренные id, {id: причина отказа}). Заявки обрабатываются в порядке создания:
+    если экземпляров не хватает, одобряются самые ранние.
+
+    Активные выдачи читаются после блокировки книг: одиночная выдача тоже сначала блокирует книгу,
+    поэтому к этому моменту конкурирующие выдачи этих книг либо уже видны, либо ждут нашего коммита,
+    и bulk_create не натыкается на unique_active_borrow.
+    """
+    failed = {}
+    with transaction.atomic():
+        requests = _pending_requests(request_ids, failed)
+
+        # Блокировки в порядке pk: параллельные пачки с общими книгами не взаимоблокируются
+        books = {
+            pk: (genre_id, author_id, available)
+            for pk, genre_id, author_id, available in Book.objects.select_for_update()
+            .filter(pk__in={request.book_id for request in requests})
+            .order_by("pk")
+            .values_list("pk", "genre_ref_id", "author_id", "available_copies")
+        }
+        active = set(
+            Borrow.objects.filter(
+                status__in=ACTIVE_BORROW_STATUSES,
+                user_id__in={request.user_id for request in requests},
+                book_id__in={request.book_id for request in requests},
+            ).values_list("user_id", "book_id")
+        )
+        available = {pk: book[2] for pk, book in books.items()}
+
+        approved = []
+        for request in requests:
+            key = (request.user_id, request.book_id)
+            if key in active:
+                failed[request.pk] = AlreadyBorrowed.message
+            elif available[request.book_id] < 1:
+                failed[request.pk] = NoCopiesAvailable.message
+            else:
+                active.add(key)
+                available[request.book_id] -= 1
+                approved.append(request)
+
+        if approved:
+            now = timezone.now()
+            taken = Counter(request.book_id for request in approved)
+            Book.objects.filter(pk__in=taken).update(
+                available_copies=F("available_copies") - Case(
+                    *[When(pk=book_id, then=Value(count)) for book_id, count in taken.items()],
+                    output_field=IntegerField(),
+                ),
+                updated_at=now,
+            )
+            # Строки заблокированы: книги, у которых остаток дошёл до нуля, известны точно
+            adjust_facets(
+                (genre_id, author_id, 0, -1)
+                for pk, (genre_id, author_id, before) in books.items() if before > 0 and available[pk] == 0
+            )
+            today = now.date()
+            borrows = Borrow.objects.bulk_create(
+                Borrow(
+                    user_id=request.user_id,
+                    book_id=request.book_id,
+                    due_date=request.desired_due_date,
+                    status="overdue" if request.desired_due_date < today else "borrowed",
+                )
+                for request in approved
+            )
+            BookRequest.objects.filter(pk__in=[request.pk for request in approved]).update(
+                status="approved", updated_at=now
+            )
+            outbox.record([
+                event
+                for request, borrow in zip(approved, borrows)
+                for event in (
+                    outbox.request_event(outbox.REQUEST_APPROVED, request, borrow_id=borrow.pk),
+                    borrow_created_event(borrow),
+                )
+            ])
+            circulation_changed.send(
+                sender=Borrow,
+                book_ids=list(taken),
+                user_ids=list({request.user_id for request in approved}),
+            )
+
+    return [request.pk for request in approved], failed
+
+
+def bulk_reject_requests(request_ids, reject_reason):
+    """
+    Отклоняет пачку заявок одним UPDATE. Возвращает (отклонённые id, {id: причина отказа}).
+    """
+    failed = {}
+    with transaction.atomic():
+        requests = _pending_requests(request_ids, failed)
+        rejected = [request.pk for request in requests]
+        BookRequest.objects.filter(pk__in=rejected).update(
+            status="rejected", reject_reason=reject_reason, updated_at=timezone.now()
+        )
+        outbox.record(
+            outbox.request_event(outbox.REQUEST_REJECTED, request, reject_reason=reject_reason) for request in requests
+        )
+        book_requests_changed.send(sender=BookRequest, user_ids=[request.user_id for request in requests])
+    return rejected, failed
+
+
+def reject_request(book_request, reject_reason):
+    """
+    Отклоняет заявку в ожидании.
+    """
+    updated_at = timezone.now()
+    with transaction.atomic():
+        updated = BookRequest.objects.filter(pk=book_request.pk, status="pending").update(
+            status="rejected", reject_reason=reject_reason, updated_at=updated_at
+        )
+        if not updated:
+            raise RequestAlreadyProcessed()
+        outbox.record([outbox.request_event(outbox.REQUEST_REJECTED, book_request, reject_reason=reject_reason)])
+        book_requests_changed.send(sender=BookRequest, user_ids=[book_request.user_id])
+    book_request.status = "rejected"
+    book_request.reject_reason = reject_reason
+    book_request.updated_at = updated_at
+    return book_request
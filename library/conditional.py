@@ -0,0 +1,97 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest())
+
+
+def validator_headers(etag, last_modified):
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return headers
+
+
+def not_modified(request, headers):
+    """
+    Ответ 304 (или 412 для If-Match), если клиентская копия актуальна, иначе None.
+    """
+    last_modified = headers.get("Last-Modified")
+    if last_modified is not None:
+        last_modified = parse_http_date_safe(last_modified)
+    response = get_conditional_response(request, etag=headers.get("ETag"), last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag для list/retrieve и Last-Modified для retrieve. Перед выборкой выполняется дешёвая проба:
+    MAX(updated_at) и COUNT(*) по отфильтрованному queryset (для детального — updated_at строки).
+    Если клиент прислал актуальный If-None-Match / If-Modified-Since, ответ 304 без сериализации.
+    conditional_related — связи, чьи updated_at попадают в представление (например, название книги).
+    """
+    conditional_related = ()
+    # effective_status выдач зависит от текущей даты
+    conditional_daily = False
+
+    def conditional_parts(self, request):
+        # Пользователь входит в ETag: содержимое списков может зависеть от него (borrows/)
+        parts = [type(self).__name__, request.get_full_path(), request.user.pk]
+        if self.conditional_daily:
+            parts.append(timezone.localdate())
+        return parts
+
+    def list_validators(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {"count": Count("pk"), "updated_at": Max("updated_at")}
+        for related in self.conditional_related:
+            aggregates[f"{related}_updated_at"] = Max(f"{related}__updated_at")
+        probe = queryset.aggregate(**aggregates)
+        count = probe.pop("count")
+        # Без Last-Modified: MAX(updated_at) не меняется при удалении строки или её выходе из фильтра,
+        # и клиент с одним If-Modified-Since получил бы 304 с устаревшим списком. ETag учитывает COUNT.
+        etag = make_etag(*self.conditional_parts(request), count, *probe.values())
+        return validator_headers(etag, None)
+
+    def retrieve_validators(self, request, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields = ["updated_at", *(f"{related}__updated_at" for related in self.conditional_related)]
+        probe = (
+            self.get_queryset().order_by()
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .values_list(*fields).first()
+        )
+        if probe is None:
+            return None
+        last_modified = max((value for value in probe if value is not None), default=None)
+        etag = make_etag(*self.conditional_parts(request), *probe)
+        return validator_headers(etag, last_modified)
+
+    def conditional(self, request, headers, render, *args, **kwargs):
+        if headers is None:
+            return render(request, *args, **kwargs)
+        response = not_modified(request, headers)
+        if response is not None:
+            return response
+        response = render(request, *args, **kwargs)
+        if response.status_code == 200:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, self.list_validators(request), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        headers = self.retrieve_validators(request, **kwargs)
+        return self.conditional(request, headers, super().retrieve, *args, **kwargs)
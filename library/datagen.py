@@ -0,0 +1,200 @@
+import random
+import uuid
+from bisect import bisect
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from library.cache import bump_catalog_version
+from library.facets import rebuild_facets
+from library.models import Author, Book, BookRequest, Borrow, Genre
+from library.search import get_search_backend
+
+User = get_user_model()
+
+GENRES = (
+    "Роман", "Детектив", "Фантастика", "Фэнтези", "Поэзия", "История", "Биография",
+    "Психология", "Наука", "Детская литература", "Приключения", "Драма", "Сатира", "Философия",
+)
+FIRST_NAMES = ("Анна", "Иван", "Мария", "Пётр", "Елена", "Сергей", "Ольга", "Николай", "Татьяна", "Алексей")
+LAST_NAMES = ("Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Волков", "Соколов", "Лебедев", "Козлов", "Новиков")
+WORDS = ("тень", "город", "ветер", "сад", "море", "дорога", "письмо", "зима", "остров", "память", "свет", "дом")
+
+LOAN_DAYS = 14
+# Выдачи за последние ACTIVE_WINDOW дней могут быть ещё не возвращены
+ACTIVE_WINDOW = 45
+
+
+class ZipfChooser:
+    """
+    Выбор индекса 0..n-1 с вероятностью ~ 1 / (rank + 1) ** s: несколько популярных значений
+    и длинный хвост. Порядок рангов перемешан, чтобы популярность не совпадала с порядком вставки.
+    """
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.ranks = list(range(n))
+        rng.shuffle(self.ranks)
+        self.cumulative = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+    def __call__(self):
+        rank = bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+        return self.ranks[min(rank, len(self.ranks) - 1)]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class LibraryGenerator:
+    """
+    Синтетическая библиотека для нагрузочных проверок: авторы, книги с популярностью по закону Ципфа,
+    читатели, история выдач за years лет (с активными и просроченными) и заявки в ожидании.
+    Всё вставляется пачками bulk_create; даты в прошлом проставляются bulk_update,
+    так как auto_now_add перезаписывает их при вставке.
+    """
+
+    def __init__(self, authors=1000, books=10000, users=5000, borrows=100000, requests=2000, years=3,
+                 zipf=1.1, seed=None, batch_size=2000, progress=None):
+        self.counts = {"authors": authors, "books": books, "users": users, "borrows": borrows, "requests": requests}
+        self.years = years
+        self.zipf = zipf
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.run_id = uuid.uuid4().hex[:8]
+        self.today = timezone.localdate()
+        self.stats = Counter()
+
+    def run(self):
+        with transaction.atomic():
+            genres = [Genre.objects.resolve(name) for name in GENRES]
+            author_ids = self.create_authors()
+            books = self.create_books(author_ids, genres)
+            user_ids = self.create_users()
+            self.create_borrows(books, user_ids)
+            self.create_requests(books, user_ids)
+        rebuild_facets()
+        get_search_backend().rebuild()
+        bump_catalog_version()
+        return dict(self.stats)
+
+    def report(self, stage):
+        if self.progress:
+            self.progress(stage, dict(self.stats))
+
+    def create_authors(self):
+        rng = self.rng
+        authors = (
+            Author(first_name=rng.choice(FIRST_NAMES), last_name=f"{rng.choice(LAST_NAMES)}-{self.run_id}-{i}")
+            for i in range(self.counts["authors"])
+        )
+        ids = []
+        for chunk in batched(authors, self.batch_size):
+            ids += [author.pk for author in Author.objects.bulk_create(chunk)]
+        self.stats["authors"] = len(ids)
+        self.report("authors")
+        return ids
+
+    def create_books(self, author_ids, genres):
+        rng = self.rng
+        pick_author = ZipfChooser(len(author_ids), self.zipf, rng)
+        pick_genre = ZipfChooser(len(genres), 0.8, rng)
+        books = []
+        for i in range(self.counts["books"]):
+            genre = genres[pick_genre()]
+            copies = rng.choice((1, 1, 2, 3, 5, 10))
+            books.append(Book(
+                title=f"{' '.join(rng.sample(WORDS, 2)).capitalize()} {i}",
+                author_id=author_ids[pick_author()],
+                genre=genre.name,
+                genre_ref=genre,
+                total_copies=copies,
+                available_copies=copies,
+                description=" ".join(rng.choices(WORDS, k=12)),
+            ))
+        for chunk in batched(books, self.batch_size):
+            Book.objects.bulk_create(chunk)
+        self.stats["books"] = len(books)
+        self.report("books")
+        return books
+
+    def create_users(self):
+        # Один общий непригодный для входа пароль: хэширование на каждого пользователя заняло бы минуты
+        password = make_password(None)
+        users = (
+            User(email=f"reader.{self.run_id}.{i}@example.com", password=password)
+            for i in range(self.counts["users"])
+        )
+        ids = []
+        for chunk in batched(users, self.batch_size):
+            ids += [user.pk for user in User.objects.bulk_create(chunk)]
+        self.stats["users"] = len(ids)
+        self.report("users")
+        return ids
+
+    def borrow_rows(self, books, user_ids):
+        """
+        Выдачи в случайном порядке по популярности книг; активные не превышают числа экземпляров
+        и не повторяются для пары (читатель, книга).
+        """
+        rng = self.rng
+        pick_book = ZipfChooser(len(books), self.zipf, rng)
+        pick_user = ZipfChooser(len(user_ids), 0.6, rng)
+        history_days = max(self.years * 365, 1)
+        active = set()
+        for _ in range(self.counts["borrows"]):
+            book = books[pick_book()]
+            user_id = user_ids[pick_user()]
+            borrowed_at = self.today - timedelta(days=rng.randrange(history_days))
+            due_date = borrowed_at + timedelta(days=LOAN_DAYS)
+            age = (self.today - borrowed_at).days
+            if (age < ACTIVE_WINDOW and rng.random() < 0.5 and book.available_copies > 0
+                    and (user_id, book.pk) not in active):
+                active.add((user_id, book.pk))
+                book.available_copies -= 1
+                status = "overdue" if due_date < self.today else "borrowed"
+                returned_at = None
+            else:
+                status = "returned"
+                returned_days = min(rng.randint(1, LOAN_DAYS + 10), age)
+                returned_at = timezone.now() - timedelta(days=age - returned_days)
+            yield Borrow(user_id=user_id, book_id=book.pk, due_date=due_date, status=status,
+                         returned_at=returned_at), borrowed_at
+
+    def create_borrows(self, books, user_ids):
+        for chunk in batched(self.borrow_rows(books, user_ids), self.batch_size):
+            created = Borrow.objects.bulk_create(borrow for borrow, _ in chunk)
+            for borrow, (_, borrowed_at) in zip(created, chunk):
+                borrow.borrowed_at = borrowed_at
+            Borrow.objects.bulk_update(created, ["borrowed_at"])
+            self.stats["borrows"] += len(created)
+            self.stats["active_borrows"] += sum(borrow.status != "returned" for borrow in created)
+            self.report("borrows")
+        changed = [book for book in books if book.available_copies != book.total_copies]
+        for chunk in batched(changed, self.batch_size):
+            Book.objects.bulk_update(chunk, ["available_copies"])
+
+    def create_requests(self, books, user_ids):
+        rng = self.rng
+        pick_book = ZipfChooser(len(books), self.zipf, rng)
+        now = timezone.now()
+        requests = []
+        for _ in range(self.counts["requests"]):
+            request = BookRequest(user_id=rng.choice(user_ids), book_id=books[pick_book()].pk)
+            request.generated_at = now - timedelta(minutes=rng.randrange(60 * 24 * 30))
+            requests.append(request)
+        for chunk in batched(requests, self.batch_size):
+            created = BookRequest.objects.bulk_create(chunk)
+            for request in created:
+                request.created_at = request.generated_at
+            BookRequest.objects.bulk_update(created, ["created_at"])
+        self.stats["requests"] = len(requests)
+        self.report("requests")
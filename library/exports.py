@@ -0,0 +1,75 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Размер пачки строк, читаемых из серверного курсора
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """
+    Псевдо-файл для csv.writer: возвращает строку вместо записи в буфер.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, columns):
+    """
+    Построчно читает queryset без загрузки в память: только нужные столбцы (values_list)
+    и серверный курсор (iterator) на PostgreSQL.
+    """
+    lookups = [lookup for _, lookup in columns]
+    return queryset.order_by("pk").values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_ndjson(rows, columns):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + "\n"
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+STREAMERS = {"ndjson": stream_ndjson, "csv": stream_csv}
+
+
+def export_response(queryset, columns, file_format, filename):
+    rows = iter_rows(queryset, columns)
+    response = StreamingHttpResponse(STREAMERS[file_format](rows, columns), content_type=EXPORT_FORMATS[file_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+class ExportAPIView(generics.GenericAPIView):
+    """
+    Потоковая выгрузка queryset (с фильтрами filterset_class) в NDJSON или CSV: ?file_format=ndjson|csv.
+    Подклассы задают columns — пары (имя столбца, lookup для values_list).
+    """
+    # Ответ — файл, а не сериализатор: в OpenAPI-схему выгрузки не попадают
+    swagger_schema = None
+    columns = ()
+    filename = "export"
+    format_query_param = "file_format"
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get(self.format_query_param, "ndjson")
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({self.format_query_param: f"Допустимые форматы: {', '.join(EXPORT_FORMATS)}."})
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, self.columns, file_format, self.filename)
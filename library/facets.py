@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Subquery
+from django.db.models.functions import Greatest
+
+from library.models import Author, Book, FacetCount, Genre
+
+# Измерение -> (поле Book, модель значений)
+DIMENSIONS = {
+    "genre": ("genre_ref", Genre),
+    "author": ("author", Author),
+}
+
+AVAILABLE = Count("pk", filter=Q(available_copies__gt=0))
+
+
+def count_rows(queryset, field):
+    return (
+        queryset.filter(**{f"{field}__isnull": False}).order_by()
+        .values(field).annotate(books=Count("pk"), available=AVAILABLE)
+    )
+
+
+def value_filter(keys):
+    """
+    Q по парам (измерение, значение).
+    """
+    values = defaultdict(set)
+    for dimension, value_id in keys:
+        values[dimension].add(value_id)
+    condition = Q()
+    for dimension, ids in values.items():
+        condition |= Q(dimension=dimension, value_id__in=ids)
+    return condition
+
+
+def upsert_facets(rows):
+    """
+    Прибавляет приращения (измерение, значение, книг, доступно) одним INSERT ... ON CONFLICT DO UPDATE:
+    строка нового значения создаётся, существующая увеличивается без гонки с параллельными изменениями.
+    """
+    table = connection.ops.quote_name(FacetCount._meta.db_table)
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (dimension, value_id, books, available) VALUES {placeholders} "
+            f"ON CONFLICT (dimension, value_id) DO UPDATE "
+            f"SET books = {table}.books + excluded.books, available = {table}.available + excluded.available",
+            [value for row in rows for value in row],
+        )
+
+
+def adjust_facets(changes):
+    """
+    Инкрементально обновляет сводку. changes — четвёрки (genre_id, author_id, Δкниг, Δдоступно) по книгам;
+    «доступно» меняется, только когда остаток книги переходит через ноль. Значения, где книг прибавилось, —
+    одним upsert, остальные — UPDATE на каждую пару приращений; значения без книг удаляются.
+    Расхождение (например, после правки в обход приложения) устраняет rebuild_facets.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for genre_id, author_id, books, available in changes:
+        for key in (("genre", genre_id), ("author", author_id)):
+            if key[1] is not None and (books or available):
+                totals[key][0] += books
+                totals[key][1] += available
+
+    grown, updates = [], defaultdict(list)
+    for key, (books, available) in totals.items():
+        if books > 0:
+            grown.append((*key, books, max(available, 0)))
+            books, available = 0, min(available, 0)
+        if books or available:
+            updates[(books, available)].append(key)
+    if grown:
+        upsert_facets(grown)
+    for (books, available), keys in updates.items():
+        fields = {}
+        if books:
+            fields["books"] = Greatest(F("books") + books, 0)
+        if available:
+            fields["available"] = Greatest(F("available") + available, 0)
+        FacetCount.objects.filter(value_filter(keys)).update(**fields)
+    shrunk = [key for key, (books, _) in totals.items() if books < 0]
+    if shrunk:
+        FacetCount.objects.filter(value_filter(shrunk), books=0).delete()
+
+
+def adjust_book_availability(book_id, delta):
+    """
+    Остаток книги перешёл через ноль (library.checkout): «доступно» её жанра и автора меняется на delta
+    одним UPDATE — значения берутся подзапросами из строки книги.
+    """
+    book = Book.objects.filter(pk=book_id)
+    FacetCount.objects.filter(
+        Q(dimension="genre", value_id=Subquery(book.values("genre_ref_id")))
+        | Q(dimension="author", value_id=Subquery(book.values("author_id")))
+    ).update(available=Greatest(F("available") + delta, 0))
+
+
+def rebuild_facets():
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        for dimension, (field, _) in DIMENSIONS.items():
+            FacetCount.objects.bulk_create(
+                (
+                    FacetCount(dimension=dimension, value_id=row[field], books=row["books"], available=row["available"])
+                    for row in count_rows(Book.objects.all(), field).iterator()
+                ),
+                batch_size=1000,
+            )
+
+
+def label_values(dimension, rows):
+    """
+    Добавляет к строкам {"id", "count", "available"} название значения (один запрос на измерение).
+    """
+    _, model = DIMENSIONS[dimension]
+    names = {obj.pk: str(obj) for obj in model.objects.filter(pk__in=[row["id"] for row in rows])}
+    return [{**row, "name": names.get(row["id"], "")} for row in rows]
+
+
+def global_facets(limit=None):
+    limit = limit or settings.FACET_LIMIT
+    result = {}
+    for dimension in DIMENSIONS:
+        rows = [
+            {"id": facet.value_id, "count": facet.books, "available": facet.available}
+            for facet in FacetCount.objects.filter(dimension=dimension).order_by("-books", "value_id")[:limit]
+        ]
+        result[dimension] = label_values(dimension, rows)
+    return result
+
+
+def queryset_facets(queryset, limit=None):
+    """
+    Фасеты для отфильтрованного набора книг (GROUP BY только по результату фильтра).
+    """
+    limit = limit or settings.FACET_LIMIT
+    result = {}
+    for dimension, (field, _) in DIMENSIONS.items():
+        rows = [
+            {"id": row[field], "count": row["books"], "available": row["available"]}
+            for row in count_rows(queryset, field).order_by("-books", field)[:limit]
+        ]
+        result[dimension] = label_values(dimension, rows)
+    return result
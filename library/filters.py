@@ -1,20 +1,51 @@
 import django_filters
-from .models import Book, Borrow
+from rest_framework.filters import SearchFilter
+
+from .models import Book, Borrow, BookRequest
+from .search import NullSearchBackend, get_search_backend
 
 
 class BookFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(field_name="title", lookup_expr="icontains")
     author = django_filters.CharFilter(field_name="author__last_name", lookup_expr="icontains")
     genre = django_filters.CharFilter(field_name="genre", lookup_expr="icontains")
+    # Точный фильтр по справочнику жанров и автору (значения из facets/)
+    genre_id = django_filters.NumberFilter(field_name="genre_ref")
+    author_id = django_filters.NumberFilter(field_name="author")
 
     class Meta:
         model = Book
-        fields = ["title", "author", "genre"]
+        fields = ["title", "author", "genre", "genre_id", "author_id"]
 
 
 class BorrowFilter(django_filters.FilterSet):
-    status = django_filters.CharFilter(field_name="status", lookup_expr="icontains")
+    """
+    Без Meta.model: применяется и к Borrow, и к BorrowRecord (выдачи вместе с архивом).
+    """
+    status = django_filters.ChoiceFilter(choices=Borrow.STATUS_CHOICES, method="filter_status")
+
+    def filter_status(self, queryset, name, value):
+        # Фильтруем по актуальному статусу: просрочка определяется по due_date в БД
+        return queryset.with_status(value)
+
+
+class BookRequestFilter(django_filters.FilterSet):
+    status = django_filters.ChoiceFilter(choices=BookRequest.STATUS_CHOICES)
 
     class Meta:
-        model = Borrow
-        fields = ["status"]
\ No newline at end of file
+        model = BookRequest
+        fields = ["status", "user", "book"]
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    Полнотекстовый поиск по каталогу с ранжированием (PostgreSQL, локально — SQLite FTS5).
+    Для прочих СУБД — стандартный поиск по search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend()
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query or isinstance(backend, NullSearchBackend):
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, query)
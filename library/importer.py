@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from library.facets import adjust_facets
+from library.models import Author, Book, Genre
+from library.search import get_search_backend
+from library.signals import circulation_changed
+
+FORMATS = ("csv", "jsonl")
+BOOK_FIELDS = ("description", "genre", "genre_ref")
+
+
+class InvalidRecord:
+    """
+    Строка файла, которую не удалось разобрать; попадает в ошибки загрузки, не прерывая её.
+    """
+
+    def __init__(self, detail):
+        self.detail = detail
+
+
+def iter_csv(stream):
+    """
+    Пары (номер строки файла, запись).
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def iter_jsonl(stream):
+    """
+    Пары (номер строки файла, запись); пустые строки пропускаются.
+    """
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield number, InvalidRecord(f"Некорректный JSON: {exc.msg}.")
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+
+def detect_format(name):
+    suffix = Path(name).suffix.lower().lstrip(".")
+    return {"ndjson": "jsonl", "json": "jsonl"}.get(suffix, suffix)
+
+
+@contextmanager
+def open_records(source, file_format=None):
+    """
+    Потоково читает записи каталога из пути или бинарного файлового объекта (CSV или JSONL).
+    """
+    file_format = file_format or detect_format(getattr(source, "name", str(source)))
+    if file_format not in READERS:
+        raise ValueError(f"Неизвестный формат файла: {file_format}")
+    if isinstance(source, (str, Path)):
+        stream = open(source, encoding="utf-8-sig", newline="")
+    else:
+        stream = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        yield READERS[file_format](stream)
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+        else:
+            stream.detach()
+
+
+class CatalogImporter:
+    """
+    Загрузка каталога пачками: авторы дедуплицируются через кэш (first_name, last_name) -> id,
+    книги с тем же названием и автором обновляются (bulk_update), новые создаются (bulk_create).
+    Запись: title, author_first_name, author_last_name, description, genre, total_copies.
+    run принимает пары (номер строки файла, запись), как их отдают iter_csv и iter_jsonl.
+    """
+
+    def __init__(self, batch_size=1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.authors = {}
+        self.genres = {}
+        self.stats = Counter()
+        self.errors = []
+        self.started = None
+
+    def run(self, records):
+        self.started = time.perf_counter()
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.batch_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self.report())
+        return self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        return {
+            **self.stats,
+            "rows_per_sec": round(self.stats["rows"] / elapsed, 1) if elapsed else None,
+            "errors": self.errors[:100],
+        }
+
+    def import_chunk(self, chunk):
+        rows = []
+        for line, record in chunk:
+            try:
+                rows.append(self.clean(record))
+            except (KeyError, TypeError, ValueError) as exc:
+                self.errors.append({"line": line, "detail": str(exc)})
+                self.stats["failed"] += 1
+        self.stats["rows"] += len(chunk)
+        if not rows:
+            return
+
+        self.resolve_authors({row["author"] for row in rows if row["author"]})
+        self.resolve_genres({Genre.normalize(row["genre"]): row["genre"] for row in rows if row["genre"].strip()})
+
+        # Внутри пачки повторы схлопываются: побеждает последняя запись
+        books = {}
+        for row in rows:
+            author_id = self.authors.get(row["author"])
+            books[(row["title"], author_id)] = {**row, "author_id": author_id}
+
+        existing = {
+            (book.title, book.author_id): book
+            # Строки блокируются до конца пачки: bulk_update не затрёт параллельную выдачу или возврат
+            for book in Book.objects.select_for_update().filter(title__in={title for title, _ in books})
+            .only("title", "author_id", "genre_ref_id", "total_copies", "available_copies")
+        }
+
+        now = timezone.now()
+        created, updated, facets = [], [], []
+        for key, row in books.items():
+            book = existing.get(key)
+            if book is None:
+                created.append(Book(
+                    title=row["title"], author_id=row["author_id"], description=row["description"],
+                    genre=row["genre"], genre_ref_id=self.genres.get(Genre.normalize(row["genre"])),
+                    total_copies=row["total_copies"], available_copies=row["total_copies"],
+                ))
+                continue
+            # Выданные экземпляры сохраняются при изменении общего количества
+            on_loan = book.total_copies - book.available_copies
+            facets.append((book.genre_ref_id, book.author_id, -1, -int(book.available_copies > 0)))
+            book.description = row["description"]
+            book.genre = row["genre"]
+            book.genre_ref_id = self.genres.get(Genre.normalize(row["genre"]))
+            book.total_copies = row["total_copies"]
+            book.available_copies = max(row["total_copies"] - on_loan, 0)
+            book.updated_at = now
+            updated.append(book)
+            facets.append((book.genre_ref_id, book.author_id, 1, int(book.available_copies > 0)))
+
+        Book.objects.bulk_create(created, batch_size=self.batch_size)
+        Book.objects.bulk_update(updated, [*BOOK_FIELDS, "total_copies", "available_copies", "updated_at"],
+                                 batch_size=self.batch_size)
+        book_ids = [book.pk for book in created + updated]
+        get_search_backend().index_books(book_ids)
+        adjust_facets(facets + [(book.genre_ref_id, book.author_id, 1, int(book.total_copies > 0)) for book in created])
+        circulation_changed.send(sender=Book, book_ids=book_ids, user_ids=[])
+        self.stats["created"] += len(created)
+        self.stats["updated"] += len(updated)
+
+    @staticmethod
+    def text(record, name):
+        value = record.get(name)
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"Поле {name} должно быть строкой.")
+        return str(value)
+
+    @staticmethod
+    def copies(record):
+        value = record.get("total_copies")
+        # 0 — допустимое значение (JSONL передаёт его числом), по умолчанию 1 только для отсутствующего
+        if value is None or isinstance(value, str) and not value.strip():
+            return 1
+        try:
+            total_copies = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("Количество копий должно быть целым числом.")
+        if total_copies < 0:
+            raise ValueError("Количество копий не может быть отрицательным.")
+        # Иначе одно большое число прервало бы всю загрузку ошибкой БД
+        _, maximum = connection.ops.integer_field_range(Book._meta.get_field("total_copies").get_internal_type())
+        if total_copies > maximum:
+            raise ValueError(f"Количество копий не может быть больше {maximum}.")
+        return total_copies
+
+    @classmethod
+    def clean(cls, record):
+        if isinstance(record, InvalidRecord):
+            raise ValueError(record.detail)
+        if not isinstance(record, dict):
+            raise ValueError("Запись должна быть объектом.")
+        title = cls.text(record, "title").strip()
+        if not title:
+            raise ValueError("Не указано название книги.")
+        first_name = cls.text(record, "author_first_name").strip()
+        last_name = cls.text(record, "author_last_name").strip()
+        total_copies = cls.copies(record)
+        return {
+            "title": title[:255],
+            "author": (first_name, last_name) if first_name or last_name else None,
+            "description": cls.text(record, "description"),
+            "genre": cls.text(record, "genre").strip()[:100],
+            "total_copies": total_copies,
+        }
+
+    def resolve_authors(self, names):
+        missing = names - self.authors.keys()
+        if not missing:
+            return
+        candidates = Author.objects.filter(last_name__in={last for _, last in missing}).only("first_name", "last_name")
+        for author in candidates:
+            self.authors.setdefault((author.first_name, author.last_name), author.pk)
+        new = [Author(first_name=first, last_name=last) for first, last in missing - self.authors.keys()]
+        for author in Author.objects.bulk_create(new, batch_size=self.batch_size):
+            self.authors[(author.first_name, author.last_name)] = author.pk
+        self.stats["authors_created"] += len(new)
+
+    def resolve_genres(self, names):
+        """
+        names: {нормализованный ключ: название как в файле}.
+        """
+        missing = names.keys() - self.genres.keys()
+        if not missing:
+            return
+        for genre in Genre.objects.filter(key__in=missing).only("key"):
+            self.genres[genre.key] = genre.pk
+        new = [Genre(key=key, name=" ".join(names[key].split())) for key in missing - self.genres.keys()]
+        # ignore_conflicts: жанр мог появиться в параллельной загрузке, id перечитываются ниже
+        Genre.objects.bulk_create(new, batch_size=self.batch_size, ignore_conflicts=True)
+        for genre in Genre.objects.filter(key__in=[genre.key for genre in new]).only("key"):
+            self.genres[genre.key] = genre.pk
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from library.archive import archive_returned_borrows
+
+
+class Command(BaseCommand):
+    help = "Переносит давно возвращённые выдачи из Borrow в архив BorrowHistory (для запуска по cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.BORROW_ARCHIVE_AFTER_DAYS,
+                            help="Архивировать выдачи, возвращённые больше N дней назад")
+        parser.add_argument("--batch-size", type=int, default=settings.BORROW_ARCHIVE_BATCH_SIZE,
+                            help="Выдач в одной транзакции")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        moved = archive_returned_borrows(before, options["batch_size"])
+        self.stdout.write(f"Перенесено в архив: {moved}")
@@ -0,0 +1,78 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from library.perf.benchmark import compare, run_benchmark, run_concurrency
+from library.perf.profiling import ENDPOINTS
+
+
+class Command(BaseCommand):
+    help = ("Прогоняет все маршруты library и users в процессе поверх текущих данных (см. generate_library) "
+            "и сообщает задержку p50/p95/p99, число SQL-запросов и выделения памяти на запрос")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Запросов на маршрут")
+        parser.add_argument("--warmup", type=int, default=2, help="Прогревочных запросов (не учитываются)")
+        parser.add_argument("--endpoint", action="append", help="Только маршруты, содержащие подстроку")
+        parser.add_argument("--cold-cache", action="store_true", help="Сбрасывать кэш каталога перед запросом")
+        parser.add_argument("--label", help="Метка прогона, например хэш коммита")
+        parser.add_argument("--output", help="Сохранить отчёт в JSON-файл")
+        parser.add_argument("--compare", help="JSON-отчёт предыдущего прогона для сравнения")
+        parser.add_argument("--concurrency", type=int,
+                            help="Вместо отчёта по маршрутам: параллельная нагрузка через ASGI на пары "
+                                 "синхронных и асинхронных списков")
+        parser.add_argument("--requests", type=int, default=200, help="Запросов на маршрут при --concurrency")
+        parser.add_argument("--user", help="Email пользователя для --concurrency (по умолчанию первый активный)")
+
+    def handle(self, *args, **options):
+        if options["concurrency"]:
+            return self.handle_concurrency(options)
+
+        endpoints = ENDPOINTS
+        if options["endpoint"]:
+            endpoints = [e for e in ENDPOINTS if any(part in e.name for part in options["endpoint"])]
+            if not endpoints:
+                raise CommandError("Нет маршрутов, подходящих под --endpoint")
+
+        report = run_benchmark(endpoints, repeat=options["repeat"], warmup=options["warmup"],
+                               cold_cache=options["cold_cache"], label=options["label"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"{'endpoint':45} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>4} {'alloc КБ':>9}")
+        for row in report["results"]:
+            self.stdout.write(
+                f"{row['endpoint']:45} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} "
+                f"{row['queries']:4d} {row['alloc_peak_kb']:9.1f}"
+            )
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)
+            self.stdout.write("Сравнение с " + str(baseline["meta"].get("label") or options["compare"]))
+            for row in compare(report, baseline):
+                self.stdout.write(
+                    f"{row['endpoint']:45} p95 {row['p95_change_pct']:+.1f}% SQL {row['queries_change']:+d}"
+                    if row["p95_change_pct"] is not None else f"{row['endpoint']:45} SQL {row['queries_change']:+d}"
+                )
+
+    def handle_concurrency(self, options):
+        users = get_user_model().objects.filter(is_active=True).order_by("pk")
+        user = users.filter(email=options["user"]).first() if options["user"] else users.first()
+        if user is None:
+            raise CommandError("Нет пользователя для запросов (см. generate_library или --user)")
+
+        results = run_concurrency(user, total=options["requests"], concurrency=options["concurrency"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"{'route':40} {'коды':>10} {'запр/с':>8} {'p95':>8} {'потоков':>8}")
+        for row in results:
+            codes = ",".join(map(str, row["statuses"]))
+            self.stdout.write(
+                f"{row['route']:40} {codes:>10} {row['rps']:8.1f} {row['p95_ms']:8.2f} {row['peak_threads']:8d}"
+            )
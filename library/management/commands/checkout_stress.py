@@ -0,0 +1,22 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.perf.profiling import run_checkout_stress
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест выдачи и возврата одной книги из нескольких потоков: "
+            "пропускная способность и проверка инвариантов available_copies")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--copies", type=int, default=50)
+        parser.add_argument("--attempts", type=int, default=200)
+
+    def handle(self, *args, **options):
+        report = run_checkout_stress(options["threads"], options["copies"], options["attempts"])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        failed = [name for name, ok in report["invariants"].items() if not ok]
+        if failed:
+            raise CommandError("Нарушены инварианты: " + ", ".join(failed))
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.outbox import drain, get_sink, purge_dispatched
+
+
+class Command(BaseCommand):
+    help = "Доставляет события outbox (выдачи, возвраты, заявки) получателю OUTBOX_SINK"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Опрашивать очередь, не завершаясь")
+        parser.add_argument("--interval", type=float, default=settings.OUTBOX_POLL_INTERVAL,
+                            help="Пауза между опросами пустой очереди, секунд")
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help="Событий в одной доставке")
+        parser.add_argument("--sink", default=None, help="Путь к классу получателя (по умолчанию OUTBOX_SINK)")
+        parser.add_argument("--purge-days", type=int, default=0,
+                            help="Удалить доставленные события старше N дней перед запуском")
+
+    def handle(self, *args, **options):
+        if options["purge_days"]:
+            deleted = purge_dispatched(timedelta(days=options["purge_days"]))
+            self.stdout.write(f"Удалено доставленных событий: {deleted}")
+
+        sink = get_sink(options["sink"])
+        while True:
+            delivered = drain(sink, options["batch_size"])
+            if delivered or not options["loop"]:
+                self.stdout.write(f"Доставлено событий: {delivered}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.perf.explain import explain_endpoints
+
+
+class Command(BaseCommand):
+    help = ("Наполняет БД набором размера N (с откатом), выполняет все маршруты и прогоняет их SQL через EXPLAIN. "
+            "Сообщает о полных сканированиях таблиц и сортировках больше порога строк")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=2000, help="Размер набора данных")
+        parser.add_argument("--threshold", type=int, default=1000, help="Порог строк для сканирования/сортировки")
+        parser.add_argument("--format", choices=("text", "json"), default="text", help="Формат отчёта")
+        parser.add_argument("--include-counts", action="store_true",
+                            help="Проверять и запросы COUNT(*) пагинации и проб ETag")
+        parser.add_argument("--fail", action="store_true", help="Завершиться с ошибкой, если найдены проблемы")
+
+    def handle(self, *args, **options):
+        report = explain_endpoints(options["size"], options["threshold"], include_counts=options["include_counts"])
+        flagged = [row for row in report if row["issues"]]
+
+        if options["format"] == "json":
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        else:
+            for row in flagged:
+                self.stdout.write(f"{row['endpoint']} {row['path']}")
+                for issue in row["issues"]:
+                    self.stdout.write(f"  - {issue}")
+                self.stdout.write(f"    {row['sql']}")
+            self.stdout.write(f"Запросов проверено: {len(report)}, с проблемами: {len(flagged)}")
+
+        if flagged and options["fail"]:
+            raise CommandError("Найдены полные сканирования или сортировки больших таблиц: "
+                               + ", ".join(sorted({row["endpoint"] for row in flagged})))
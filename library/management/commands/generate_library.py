@@ -0,0 +1,36 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.datagen import LibraryGenerator
+
+
+class Command(BaseCommand):
+    help = ("Создаёт синтетическую библиотеку заданного размера: авторы, книги с неравномерной популярностью, "
+            "читатели, история выдач за несколько лет и заявки в ожидании (bulk-вставки)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--authors", type=int, default=1000)
+        parser.add_argument("--books", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--borrows", type=int, default=100000)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--years", type=int, default=3, help="Глубина истории выдач")
+        parser.add_argument("--zipf", type=float, default=1.1, help="Показатель распределения популярности")
+        parser.add_argument("--seed", type=int, help="Зерно генератора для воспроизводимого набора")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        generator = LibraryGenerator(
+            authors=options["authors"], books=options["books"], users=options["users"],
+            borrows=options["borrows"], requests=options["requests"], years=options["years"],
+            zipf=options["zipf"], seed=options["seed"], batch_size=options["batch_size"], progress=self.progress,
+        )
+        started = time.perf_counter()
+        stats = generator.run()
+        stats["seconds"] = round(time.perf_counter() - started, 1)
+        self.stdout.write(json.dumps(stats, ensure_ascii=False, indent=2))
+
+    def progress(self, stage, stats):
+        self.stdout.write(f"{stage}: {stats.get(stage, 0)}")
@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from config.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = "Генерирует OpenAPI-схему API в файлы openapi.json и openapi.<хэш>.json (запускать при сборке)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output-dir", type=Path, help="Каталог для схемы (по умолчанию API_SCHEMA_DIR)")
+
+    def handle(self, *args, **options):
+        content, digest = generate_schema(options["output_dir"])
+        self.stdout.write(f"Схема сохранена: openapi.{digest}.json ({len(content) // 1024} КБ)")
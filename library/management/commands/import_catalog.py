@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.importer import FORMATS, CatalogImporter, open_records
+
+
+class Command(BaseCommand):
+    help = ("Потоковая загрузка каталога из CSV/JSONL: title, author_first_name, author_last_name, "
+            "description, genre, total_copies. Повторная загрузка обновляет существующие книги.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="По умолчанию — по расширению файла")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(batch_size=options["batch_size"], progress=self.progress)
+        try:
+            with open_records(options["path"], options["format"]) as records:
+                report = importer.run(records)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def progress(self, report):
+        self.stdout.write(
+            f"Обработано {report['rows']}: создано {report.get('created', 0)}, "
+            f"обновлено {report.get('updated', 0)}, ошибок {report.get('failed', 0)} "
+            f"({report['rows_per_sec']} строк/с)"
+        )
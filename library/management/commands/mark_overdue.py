@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.overdue import mark_overdue_borrows
+
+
+class Command(BaseCommand):
+    help = "Переводит просроченные выдачи в статус 'overdue' (для запуска по cron или в цикле)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Запускать периодически, не завершаясь")
+        parser.add_argument("--interval", type=int, default=3600, help="Интервал между запусками, секунд")
+
+    def handle(self, *args, **options):
+        while True:
+            updated = mark_overdue_borrows()
+            self.stdout.write(f"Помечено просроченными: {updated}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.perf.profiling import budget_violations, run_query_budget
+
+
+class Command(BaseCommand):
+    help = ("Наполняет БД наборами размера N и 10×N (с откатом), опрашивает все маршруты library и users "
+            "и проверяет, что число SQL-запросов не растёт вместе с данными и не превышает бюджет маршрута")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10, help="Базовый размер набора данных N")
+        parser.add_argument("--format", choices=("json", "csv"), default="json", help="Формат отчёта")
+
+    def handle(self, *args, **options):
+        size = options["size"]
+        rows = run_query_budget((size, size * 10))
+
+        if options["format"] == "csv":
+            writer = csv.DictWriter(self.stdout, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+
+        violations = budget_violations(rows)
+        if violations:
+            raise CommandError(
+                "Число запросов растёт с объёмом данных или превышает QUERY_BUDGETS: " + ", ".join(violations)
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from library.cache import bump_catalog_version
+from library.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводку фасетов каталога (жанры и авторы) с нуля"
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        bump_catalog_version()
+        self.stdout.write("Сводка фасетов пересчитана")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковый индекс каталога (например, после массовой загрузки книг)"
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write("Поисковый индекс перестроен")
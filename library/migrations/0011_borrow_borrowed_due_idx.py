@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_borrow_unique_active_borrow'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('status', 'borrowed')), fields=['due_date'], name='borrow_borrowed_due_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:38
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    CREATE OR REPLACE FUNCTION library_book_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(
+                (SELECT first_name || ' ' || last_name FROM library_author WHERE id = NEW.author_id), ''
+            )), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.genre, '')), 'C') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER library_book_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, genre, author_id ON library_book
+    FOR EACH ROW EXECUTE FUNCTION library_book_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION library_author_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE library_book SET title = title WHERE author_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER library_author_search_vector
+    AFTER UPDATE OF first_name, last_name ON library_author
+    FOR EACH ROW EXECUTE FUNCTION library_author_search_vector_update()
+    """,
+    "UPDATE library_book SET title = title",
+    "CREATE INDEX library_book_search_vector_gin ON library_book USING gin (search_vector)",
+    "CREATE INDEX library_book_title_trgm ON library_book USING gin (title gin_trgm_ops)",
+    "CREATE INDEX library_book_genre_trgm ON library_book USING gin (genre gin_trgm_ops)",
+    "CREATE INDEX library_author_last_name_trgm ON library_author USING gin (last_name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS library_author_last_name_trgm",
+    "DROP INDEX IF EXISTS library_book_genre_trgm",
+    "DROP INDEX IF EXISTS library_book_title_trgm",
+    "DROP INDEX IF EXISTS library_book_search_vector_gin",
+    "DROP TRIGGER IF EXISTS library_author_search_vector ON library_author",
+    "DROP FUNCTION IF EXISTS library_author_search_vector_update()",
+    "DROP TRIGGER IF EXISTS library_book_search_vector ON library_book",
+    "DROP FUNCTION IF EXISTS library_book_search_vector_update()",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE library_book_fts USING fts5("
+    "title, author, genre, description, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO library_book_fts (rowid, title, author, genre, description) "
+    "SELECT b.id, b.title, coalesce(a.first_name || ' ' || a.last_name, ''), b.genre, b.description "
+    "FROM library_book b LEFT JOIN library_author a ON a.id = b.author_id",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS library_book_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {"postgresql": postgres, "sqlite": sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_borrow_borrowed_due_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
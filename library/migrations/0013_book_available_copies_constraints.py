@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:41
+
+from django.db import migrations, models
+
+
+def clamp_available_copies(apps, schema_editor):
+    # Существующие строки могли нарушать границы из-за потерянных обновлений
+    Book = apps.get_model('library', 'Book')
+    Book.objects.filter(available_copies__gt=models.F('total_copies')).update(
+        available_copies=models.F('total_copies')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_book_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_available_copies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__gte', 0)), name='book_available_copies_gte_0'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__lte', models.F('total_copies'))), name='book_available_copies_lte_total'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_book_available_copies_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now,
+                                       verbose_name='Изменён'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now,
+                                       verbose_name='Изменена'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='borrow',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменена'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='bookrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменена'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_genres_and_facets(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    Genre = apps.get_model('library', 'Genre')
+    FacetCount = apps.get_model('library', 'FacetCount')
+
+    genres = {}
+    for name in list(Book.objects.exclude(genre='').values_list('genre', flat=True).distinct()):
+        key = ' '.join(name.split()).casefold()[:100]
+        if not key:
+            continue
+        if key not in genres:
+            genres[key] = Genre.objects.create(key=key, name=' '.join(name.split()))
+        Book.objects.filter(genre=name).update(genre_ref=genres[key])
+
+    available = models.Count('pk', filter=models.Q(available_copies__gt=0))
+    for dimension, field in (('genre', 'genre_ref'), ('author', 'author')):
+        rows = (
+            Book.objects.filter(**{f'{field}__isnull': False}).order_by()
+            .values(field).annotate(books=models.Count('pk'), available=available)
+        )
+        FacetCount.objects.bulk_create(
+            FacetCount(dimension=dimension, value_id=row[field], books=row['books'], available=row['available'])
+            for row in rows.iterator()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('genre', 'Жанр'), ('author', 'Автор')], max_length=20, verbose_name='Измерение')),
+                ('value_id', models.PositiveBigIntegerField(verbose_name='Значение')),
+                ('books', models.PositiveIntegerField(default=0, verbose_name='Книг')),
+                ('available', models.PositiveIntegerField(default=0, verbose_name='Доступно сейчас')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', '-books'], name='facet_count_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value_id'), name='facet_count_dimension_value_uniq')],
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='genre_ref',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='books', to='library.genre', verbose_name='Жанр (справочник)'),
+        ),
+        migrations.RunPython(backfill_genres_and_facets, migrations.RunPython.noop),
+    ]
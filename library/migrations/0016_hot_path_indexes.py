@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_genre_facets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['last_name', 'first_name'], name='author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='book_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at'], name='bookrequest_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookrequest',
+            index=models.Index(fields=['user', 'status'], name='bookrequest_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user', 'status'], name='borrow_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user', '-borrowed_at'], name='borrow_user_borrowed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['-borrowed_at'], name='borrow_borrowed_at_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:34
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=50, verbose_name='Событие')),
+                ('aggregate_id', models.PositiveBigIntegerField(verbose_name='Объект')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток доставки')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# На PostgreSQL архив секционирован по месяцам borrowed_at (секции создаёт library.archive перед вставкой);
+# первичный ключ секционированной таблицы обязан включать ключ секционирования
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE library_borrowhistory (
+        id bigint NOT NULL,
+        user_id bigint NOT NULL REFERENCES users_user (id) DEFERRABLE INITIALLY DEFERRED,
+        book_id bigint NOT NULL REFERENCES library_book (id) DEFERRABLE INITIALLY DEFERRED,
+        borrowed_at date NOT NULL,
+        due_date date NOT NULL,
+        returned_at timestamp with time zone NULL,
+        status varchar(20) NOT NULL,
+        updated_at timestamp with time zone NOT NULL,
+        archived_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, borrowed_at)
+    ) PARTITION BY RANGE (borrowed_at)
+    """,
+    "CREATE INDEX borrowhistory_user_idx ON library_borrowhistory (user_id, borrowed_at DESC)",
+    "CREATE INDEX borrowhistory_borrowed_idx ON library_borrowhistory (borrowed_at DESC)",
+    "CREATE INDEX library_borrowhistory_book_id_idx ON library_borrowhistory (book_id)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP TABLE IF EXISTS library_borrowhistory CASCADE",
+]
+
+BORROW_RECORD_VIEW = """
+    CREATE VIEW library_borrowrecord AS
+    SELECT id, user_id, book_id, borrowed_at, due_date, returned_at, status, updated_at, FALSE AS archived
+    FROM library_borrow
+    UNION ALL
+    SELECT id, user_id, book_id, borrowed_at, due_date, returned_at, status, updated_at, TRUE AS archived
+    FROM library_borrowhistory
+"""
+
+
+def create_history_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRES_FORWARD:
+            schema_editor.execute(statement)
+    else:
+        schema_editor.create_model(apps.get_model("library", "BorrowHistory"))
+
+
+def drop_history_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRES_BACKWARD:
+            schema_editor.execute(statement)
+    else:
+        schema_editor.delete_model(apps.get_model("library", "BorrowHistory"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_outbox_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('status', 'returned')), fields=['returned_at'], name='borrow_returned_at_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='BorrowHistory',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID выдачи')),
+                        ('borrowed_at', models.DateField(verbose_name='Отдана')),
+                        ('due_date', models.DateField(verbose_name='До')),
+                        ('returned_at', models.DateTimeField(blank=True, null=True, verbose_name='Возвращена')),
+                        ('status', models.CharField(choices=[('borrowed', 'Отдана'), ('returned', 'Возвращена'), ('overdue', 'Просрочена')], default='returned', max_length=20, verbose_name='Статус')),
+                        ('updated_at', models.DateTimeField(verbose_name='Изменена')),
+                        ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Перенесена в архив')),
+                        ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrow_history', to='library.book', verbose_name='Книга')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrow_history', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                    ],
+                    options={
+                        'ordering': ['-borrowed_at'],
+                        'indexes': [
+                            models.Index(fields=['user', '-borrowed_at'], name='borrowhistory_user_idx'),
+                            models.Index(fields=['-borrowed_at'], name='borrowhistory_borrowed_idx'),
+                        ],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_history_table, drop_history_table),
+        migrations.CreateModel(
+            name='BorrowRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('borrowed_at', models.DateField(verbose_name='Отдана')),
+                ('due_date', models.DateField(verbose_name='До')),
+                ('returned_at', models.DateTimeField(blank=True, null=True, verbose_name='Возвращена')),
+                ('status', models.CharField(choices=[('borrowed', 'Отдана'), ('returned', 'Возвращена'), ('overdue', 'Просрочена')], max_length=20, verbose_name='Статус')),
+                ('updated_at', models.DateTimeField(verbose_name='Изменена')),
+                ('archived', models.BooleanField(verbose_name='В архиве')),
+            ],
+            options={
+                'db_table': 'library_borrowrecord',
+                'ordering': ['-borrowed_at'],
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(BORROW_RECORD_VIEW, "DROP VIEW IF EXISTS library_borrowrecord"),
+    ]
@@ -1,8 +1,10 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.conf import settings
 from datetime import timedelta
 
-from django.db.models import Q
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 
 from library.services import is_past_date
@@ -12,37 +14,113 @@ class Author(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     bio = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменён")
 
     class Meta:
         ordering = ["last_name", "first_name"]
+        indexes = [
+            models.Index(fields=["last_name", "first_name"], name="author_name_idx"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
 
+class GenreManager(models.Manager):
+    def resolve(self, name):
+        """
+        Жанр из справочника по свободному тексту (без учёта регистра и лишних пробелов); None для пустого.
+        """
+        key = Genre.normalize(name)
+        if not key:
+            return None
+        genre, _ = self.get_or_create(key=key, defaults={"name": " ".join(name.split())})
+        return genre
+
+
+class Genre(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Название")
+    key = models.CharField(max_length=100, unique=True, verbose_name="Ключ")
+
+    objects = GenreManager()
+
+    class Meta:
+        ordering = ["name"]
+
+    @staticmethod
+    def normalize(name):
+        return " ".join((name or "").split()).casefold()[:100]
+
+    def __str__(self):
+        return self.name
+
+
 class Book(models.Model):
     title = models.CharField(max_length=255, verbose_name="Название")
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="books", null=True,
                                 verbose_name="Автор")
     description = models.TextField(blank=True, verbose_name="Описание")
     genre = models.CharField(max_length=100, blank=True, verbose_name="Жанр")
+    # Нормализованный жанр для фильтров и фасетов; заполняется из genre при сохранении
+    genre_ref = models.ForeignKey(Genre, on_delete=models.SET_NULL, related_name="books", null=True, editable=False,
+                                  verbose_name="Жанр (справочник)")
     total_copies = models.PositiveIntegerField(default=1, verbose_name="Всего копий")
     available_copies = models.PositiveIntegerField(default=1, verbose_name="Доступно копий")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Добвалена")
+    # auto_now не срабатывает в update()/bulk_update(): такие пути выставляют updated_at явно
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменена")
+    # Поддерживается триггером БД на PostgreSQL (см. library.search и миграцию 0012)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["title"]
+        constraints = [
+            # Остаток меняется условными UPDATE (library.checkout), БД дополнительно гарантирует границы
+            models.CheckConstraint(condition=Q(available_copies__gte=0), name="book_available_copies_gte_0"),
+            models.CheckConstraint(condition=Q(available_copies__lte=F("total_copies")),
+                                   name="book_available_copies_lte_total"),
+        ]
+        indexes = [
+            # Сортировка каталога по умолчанию
+            models.Index(fields=["title"], name="book_title_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки: по ним определяются затронутые фасеты (library.facets)
+        instance._loaded = {
+            name: value for name, value in zip(field_names, values) if name in ("genre", "genre_ref_id", "author_id")
+        }
+        return instance
 
     def save(self, *args, **kwargs):
+        if self._state.adding or self.genre != getattr(self, "_loaded", {}).get("genre", self.genre):
+            self.genre_ref = Genre.objects.resolve(self.genre)
         # Если книга создаётся впервые — делаем доступные копии равными общим
         if self._state.adding:
             self.available_copies = self.total_copies
+            super().save(*args, **kwargs)
         else:
-            # Если книга уже существует — не даём доступных копий быть больше total_copies
-            if self.available_copies > self.total_copies:
-                self.available_copies = self.total_copies
+            with transaction.atomic():
+                self.sync_available_copies()
+                super().save(*args, **kwargs)
+        self._loaded = {"genre": self.genre, "genre_ref_id": self.genre_ref_id, "author_id": self.author_id,
+                        "available_copies": self.available_copies}
 
-        super().save(*args, **kwargs)
+    def sync_available_copies(self):
+        """
+        Берёт остаток из заблокированной строки: сохранение всей строки не затирает параллельную выдачу
+        или возврат (library.checkout), а изменение total_copies переносится на остаток.
+        """
+        current = Book.objects.select_for_update().filter(pk=self.pk).values_list(
+            "total_copies", "available_copies").first()
+        if current is None:
+            return
+        total, available = current
+        self.available_copies = min(max(available + self.total_copies - total, 0), self.total_copies)
+        # Остаток до сохранения — для сводки фасетов (library.signals)
+        self._loaded = {**getattr(self, "_loaded", {}), "available_copies": available}
 
     def __str__(self):
         return self.title
@@ -52,6 +130,43 @@ def default_due_date():
     return timezone.now().date() + timedelta(days=14)
 
 
+ACTIVE_BORROW_STATUSES = ("borrowed", "overdue")
+
+
+class BorrowQuerySet(models.QuerySet):
+    def with_effective_status(self, today=None):
+        """
+        Добавляет аннотацию effective_status — актуальный статус, вычисленный на стороне БД.
+        """
+        today = today or timezone.now().date()
+        return self.annotate(
+            effective_status=Case(
+                When(status="returned", then=Value("returned")),
+                When(due_date__lt=today, then=Value("overdue")),
+                default=F("status"),
+                output_field=models.CharField(),
+            )
+        )
+
+    def with_status(self, status, today=None):
+        """
+        Фильтрует выдачи по актуальному статусу, не дожидаясь пересохранения строк.
+        """
+        today = today or timezone.now().date()
+        if status == "overdue":
+            return self.filter(Q(status="overdue") | Q(status="borrowed", due_date__lt=today))
+        if status == "borrowed":
+            return self.filter(status="borrowed", due_date__gte=today)
+        return self.filter(status=status)
+
+    def past_due(self, today=None):
+        """
+        Выдачи со статусом 'borrowed', срок возврата которых уже прошёл.
+        """
+        today = today or timezone.now().date()
+        return self.filter(status="borrowed", due_date__lt=today)
+
+
 class Borrow(models.Model):
     STATUS_CHOICES = (
         ("borrowed", "Отдана"),
@@ -65,16 +180,32 @@ class Borrow(models.Model):
     due_date = models.DateField(verbose_name="До", default=default_due_date)
     returned_at = models.DateTimeField(null=True, blank=True, verbose_name="Возвращена")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="borrowed", verbose_name="Статус")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
+
+    objects = BorrowQuerySet.as_manager()
 
     class Meta:
         ordering = ["-borrowed_at"]
         constraints = [
+            # Только одна выданная книга на пользователя
             models.UniqueConstraint(
                 fields=["user", "book"],
                 condition=Q(status__in=["borrowed", "overdue"]),
-                name="Только одна выданя книга на пользователя"
+                name="unique_active_borrow"
             )
         ]
+        indexes = [
+            # Для поиска просроченных выдач без полного сканирования таблицы
+            models.Index(fields=["due_date"], condition=Q(status="borrowed"), name="borrow_borrowed_due_idx"),
+            # Проверки активной выдачи пользователя и фильтр по статусу
+            models.Index(fields=["user", "status"], name="borrow_user_status_idx"),
+            # Выдачи пользователя (borrows/) в порядке сортировки по умолчанию
+            models.Index(fields=["user", "-borrowed_at"], name="borrow_user_borrowed_idx"),
+            # Общий список выдач администратора (admin_borrows/)
+            models.Index(fields=["-borrowed_at"], name="borrow_borrowed_at_idx"),
+            # Отбор возвращённых выдач для переноса в архив (library.archive)
+            models.Index(fields=["returned_at"], condition=Q(status="returned"), name="borrow_returned_at_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if self.status != "returned":
@@ -89,6 +220,9 @@ class Borrow(models.Model):
         """
         Возвращает актуальный статус:
         """
+        # Если статус уже вычислен в БД (with_effective_status) — используем его
+        if hasattr(self, "effective_status"):
+            return self.effective_status
         if self.status == "returned":
             return "returned"
         if is_past_date(self.due_date):
@@ -96,6 +230,65 @@ class Borrow(models.Model):
         return self.status
 
 
+class BorrowHistory(models.Model):
+    """
+    Архив закрытых выдач: возвращённые выдачи старше BORROW_ARCHIVE_AFTER_DAYS переносятся сюда
+    пачками (library.archive), чтобы таблица Borrow и её индексы оставались небольшими.
+    На PostgreSQL таблица секционирована по месяцам borrowed_at; id совпадает с id исходной выдачи.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID выдачи")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="borrow_history",
+                             verbose_name="Пользователь")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="borrow_history", verbose_name="Книга")
+    borrowed_at = models.DateField(verbose_name="Отдана")
+    due_date = models.DateField(verbose_name="До")
+    returned_at = models.DateTimeField(null=True, blank=True, verbose_name="Возвращена")
+    status = models.CharField(max_length=20, choices=Borrow.STATUS_CHOICES, default="returned",
+                              verbose_name="Статус")
+    updated_at = models.DateTimeField(verbose_name="Изменена")
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Перенесена в архив")
+
+    class Meta:
+        ordering = ["-borrowed_at"]
+        indexes = [
+            # История пользователя в порядке сортировки по умолчанию
+            models.Index(fields=["user", "-borrowed_at"], name="borrowhistory_user_idx"),
+            # Общий список выдач администратора вместе с архивом
+            models.Index(fields=["-borrowed_at"], name="borrowhistory_borrowed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.book_id} ({self.borrowed_at})"
+
+
+class BorrowRecord(models.Model):
+    """
+    Все выдачи — из Borrow и из архива BorrowHistory (представление UNION ALL, только чтение).
+    Используется в списках и выгрузке истории; проверки активных выдач идут только по Borrow.
+    При изменении столбцов Borrow представление нужно пересоздать в миграции.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name="borrow_records", verbose_name="Пользователь")
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+                             verbose_name="Книга")
+    borrowed_at = models.DateField(verbose_name="Отдана")
+    due_date = models.DateField(verbose_name="До")
+    returned_at = models.DateTimeField(null=True, blank=True, verbose_name="Возвращена")
+    status = models.CharField(max_length=20, choices=Borrow.STATUS_CHOICES, verbose_name="Статус")
+    updated_at = models.DateTimeField(verbose_name="Изменена")
+    archived = models.BooleanField(verbose_name="В архиве")
+
+    objects = BorrowQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = "library_borrowrecord"
+        ordering = ["-borrowed_at"]
+
+    current_status = Borrow.current_status
+
+
 class BookRequest(models.Model):
     STATUS_CHOICES = (
         ("pending", "В ожидании"),
@@ -119,9 +312,69 @@ class BookRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="Статус")
     reject_reason = models.TextField(null=True, blank=True, verbose_name="Причина отказа")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Очередь администратора: заявки в ожидании, новые первыми
+            models.Index(fields=["-created_at"], condition=Q(status="pending"), name="bookrequest_pending_idx"),
+            # Проверка повторной заявки и список заявок пользователя
+            models.Index(fields=["user", "status"], name="bookrequest_user_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} → {self.book.title} ({self.status})"
+
+
+class FacetCount(models.Model):
+    """
+    Сводка каталога по измерению (жанр или автор): число книг и книг с доступными экземплярами.
+    Поддерживается инкрементально (library.facets), чтобы не считать GROUP BY по всему каталогу.
+    """
+    DIMENSION_CHOICES = (
+        ("genre", "Жанр"),
+        ("author", "Автор"),
+    )
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name="Измерение")
+    value_id = models.PositiveBigIntegerField(verbose_name="Значение")
+    books = models.PositiveIntegerField(default=0, verbose_name="Книг")
+    available = models.PositiveIntegerField(default=0, verbose_name="Доступно сейчас")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "value_id"], name="facet_count_dimension_value_uniq"),
+        ]
+        indexes = [
+            # Топ значений измерения: WHERE dimension = ... ORDER BY books DESC
+            models.Index(fields=["dimension", "-books"], name="facet_count_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.value_id} ({self.books})"
+
+
+class OutboxEvent(models.Model):
+    """
+    Событие выдачи или заявки для внешних получателей. Пишется в той же транзакции, что и изменение,
+    и доставляется отдельным процессом (library.outbox, команда dispatch_outbox) в порядке id
+    (порядок выделения id, а не фиксации транзакций — см. dispatch_batch).
+    """
+    topic = models.CharField(max_length=50, verbose_name="Событие")
+    aggregate_id = models.PositiveBigIntegerField(verbose_name="Объект")
+    payload = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Данные")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name="Доставлено")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток доставки")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Очередь доставки: недоставленные события по порядку
+            models.Index(fields=["id"], condition=Q(dispatched_at__isnull=True), name="outbox_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.aggregate_id}"
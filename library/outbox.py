@@ -0,0 +1,194 @@
+# Transactional outbox: события выдач и заявок пишутся одной вставкой в транзакции изменения
+# и доставляются получателю отдельным процессом (manage.py dispatch_outbox), а не в обработчике запроса.
+import json
+import logging
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from library.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+BORROW_CREATED = "borrow.created"
+BORROW_RETURNED = "borrow.returned"
+BORROW_OVERDUE = "borrow.overdue"
+REQUEST_APPROVED = "book_request.approved"
+REQUEST_REJECTED = "book_request.rejected"
+
+# События записаны в outbox (ещё до фиксации транзакции). Аргументы: events.
+events_recorded = Signal()
+
+
+def borrow_event(topic, borrow_id, user_id, book_id, due_date, **extra):
+    return OutboxEvent(
+        topic=topic,
+        aggregate_id=borrow_id,
+        payload={"borrow_id": borrow_id, "user_id": user_id, "book_id": book_id, "due_date": due_date, **extra},
+    )
+
+
+def request_event(topic, book_request, **extra):
+    return OutboxEvent(
+        topic=topic,
+        aggregate_id=book_request.pk,
+        payload={"request_id": book_request.pk, "user_id": book_request.user_id,
+                 "book_id": book_request.book_id, **extra},
+    )
+
+
+def record(events):
+    """
+    Сохраняет события одним INSERT. Вызывается внутри транзакции изменения:
+    при откате события исчезают вместе с ним.
+    """
+    events = list(events)
+    if events:
+        OutboxEvent.objects.bulk_create(events)
+        events_recorded.send(sender=OutboxEvent, events=events)
+    return events
+
+
+# SINKS
+
+class DeliveryError(Exception):
+    """
+    Получатель не принял пачку событий; доставка будет повторена позже.
+    """
+
+
+class MemorySink:
+    """
+    Получатель в памяти процесса (для тестов и отладки).
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def send(self, events):
+        self.events.extend(events)
+
+
+class FileSink:
+    """
+    Дописывает события в файл, по одному JSON-объекту на строку.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.OUTBOX_FILE_PATH
+
+    def send(self, events):
+        lines = "".join(json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n" for event in events)
+        try:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(lines)
+        except OSError as exc:
+            raise DeliveryError(str(exc)) from exc
+
+
+class WebhookSink:
+    """
+    Отправляет пачку событий POST-запросом (JSON-массив). Успех — любой ответ 2xx.
+    """
+
+    def __init__(self, url=None, timeout=None):
+        self.url = url or settings.OUTBOX_WEBHOOK_URL
+        self.timeout = timeout or settings.OUTBOX_WEBHOOK_TIMEOUT
+        if not self.url:
+            raise ValueError("Не задан OUTBOX_WEBHOOK_URL.")
+
+    def send(self, events):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(events, cls=DjangoJSONEncoder).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except (urllib.error.URLError, OSError) as exc:
+            raise DeliveryError(str(exc)) from exc
+
+
+def get_sink(path=None):
+    return import_string(path or settings.OUTBOX_SINK)()
+
+
+# DISPATCH
+
+def backoff(attempts):
+    """
+    Пауза перед следующей попыткой: экспоненциальная, с ограничением OUTBOX_BACKOFF_MAX.
+    """
+    return timedelta(seconds=min(settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX))
+
+
+def as_message(event):
+    return {
+        "id": event.pk,
+        "topic": event.topic,
+        "aggregate_id": event.aggregate_id,
+        "payload": event.payload,
+        "created_at": event.created_at,
+    }
+
+
+def dispatch_batch(sink, batch_size=None):
+    """
+    Доставляет пачку самых ранних недоставленных событий. Возвращает число доставленных.
+    Строки блокируются до конца доставки, поэтому параллельные диспетчеры не обгоняют друг друга.
+    Пока первое событие очереди ждёт повтора после ошибки, следующие не отправляются.
+    Порядок id — порядок выделения, а не фиксации: событие транзакции, зафиксированной позже соседей
+    с бо́льшими id, может уйти после них (для событий одного объекта этого не бывает — его изменения
+    сериализуются блокировкой строки). Доставка «хотя бы один раз»: получатель отбрасывает повторы по id.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update().filter(dispatched_at__isnull=True).order_by("id")[:batch_size]
+        )
+        now = timezone.now()
+        if not events or (events[0].next_attempt_at and events[0].next_attempt_at > now):
+            return 0
+        ids = [event.pk for event in events]
+        try:
+            sink.send([as_message(event) for event in events])
+        except DeliveryError as exc:
+            attempts = events[0].attempts + 1
+            OutboxEvent.objects.filter(pk__in=ids).update(
+                attempts=F("attempts") + 1, next_attempt_at=now + backoff(attempts), last_error=str(exc)
+            )
+            logger.warning("Не удалось доставить события outbox %s-%s: %s", ids[0], ids[-1], exc)
+            return 0
+        OutboxEvent.objects.filter(pk__in=ids).update(dispatched_at=timezone.now(), next_attempt_at=None)
+    return len(events)
+
+
+def drain(sink, batch_size=None):
+    """
+    Доставляет пачки, пока очередь не опустеет или доставка не прервётся ошибкой. Возвращает число событий.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    total = 0
+    while True:
+        delivered = dispatch_batch(sink, batch_size)
+        total += delivered
+        if delivered < batch_size:
+            return total
+
+
+def purge_dispatched(older_than):
+    """
+    Удаляет доставленные события старше older_than (timedelta). Возвращает число удалённых.
+    """
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=timezone.now() - older_than).delete()
+    return deleted
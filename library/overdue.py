@@ -0,0 +1,118 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from library import outbox
+from library.models import Borrow
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_FIELDS = ("id", "user_id", "book_id", "due_date")
+
+
+def update_overdue(today, batch_size):
+    """
+    Помечает до batch_size просроченных выдач и возвращает их (id, user_id, book_id, due_date).
+    На PostgreSQL — одним UPDATE ... RETURNING по заблокированным строкам (SKIP LOCKED: параллельные
+    обходчики делят работу), на прочих СУБД — выборкой с блокировкой и UPDATE по id.
+    """
+    batch = Borrow.objects.past_due(today).select_for_update(skip_locked=True).order_by("pk")
+    now = timezone.now()
+    if connection.vendor == "postgresql":
+        ids, params = batch.values("pk")[:batch_size].query.sql_with_params()
+        columns = ", ".join(connection.ops.quote_name(column) for column in OVERDUE_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {connection.ops.quote_name(Borrow._meta.db_table)} SET status = %s, updated_at = %s "
+                f"WHERE id IN ({ids}) RETURNING {columns}",
+                ["overdue", now, *params],
+            )
+            return cursor.fetchall()
+    rows = list(batch.values_list(*OVERDUE_FIELDS)[:batch_size])
+    if rows:
+        Borrow.objects.filter(pk__in=[row[0] for row in rows]).update(status="overdue", updated_at=now)
+    return rows
+
+
+def mark_overdue_batch(today, batch_size):
+    """
+    Одна пачка в своей транзакции: UPDATE и события outbox одной вставкой. Возвращает размер пачки.
+    """
+    with transaction.atomic():
+        rows = update_overdue(today, batch_size)
+        outbox.record(outbox.borrow_event(outbox.BORROW_OVERDUE, *row) for row in rows)
+    return len(rows)
+
+
+def mark_overdue_borrows(today=None, batch_size=None):
+    """
+    Переводит все просроченные выдачи в статус 'overdue' пачками по OVERDUE_SWEEP_BATCH_SIZE:
+    память и число параметров запроса ограничены и после пропущенных обходов.
+    Возвращает количество обновлённых строк.
+    """
+    today = today or timezone.now().date()
+    batch_size = batch_size or settings.OVERDUE_SWEEP_BATCH_SIZE
+    total = 0
+    while True:
+        marked = mark_overdue_batch(today, batch_size)
+        total += marked
+        if marked < batch_size:
+            return total
+
+
+class OverdueSweeper(threading.Thread):
+    """
+    Фоновый поток, периодически помечающий просроченные выдачи.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name="overdue-sweeper", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sweep()
+
+    def sweep(self):
+        try:
+            updated = mark_overdue_borrows()
+            if updated:
+                logger.info("Помечено просроченными выдач: %s", updated)
+        except DatabaseError:
+            logger.exception("Не удалось обновить просроченные выдачи")
+        finally:
+            close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_overdue_sweeper(interval):
+    """
+    Запускает фоновый поток (один на процесс) и возвращает его.
+    """
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = OverdueSweeper(interval)
+            _sweeper.start()
+        return _sweeper
+
+
+def start_configured_sweeper():
+    """
+    Запускает фоновый поток, если задан OVERDUE_SWEEP_INTERVAL. Вызывается из config.wsgi и config.asgi,
+    то есть только в процессах, которые обслуживают запросы.
+    """
+    interval = settings.OVERDUE_SWEEP_INTERVAL
+    if interval:
+        return start_overdue_sweeper(interval)
+    return None
@@ -1,7 +1,261 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Приблизительное число строк по статистике планировщика PostgreSQL (без COUNT(*)).
+    Для прочих СУБД возвращает точное значение.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CursorEncoder(json.JSONEncoder):
+    # В отличие от DjangoJSONEncoder сохраняет микросекунды: они нужны для точного сравнения ключей
+    def default(self, o):
+        if isinstance(o, (datetime.date, datetime.datetime)):
+            return o.isoformat()
+        return str(o)
+
+
+class EstimatedPage(Page):
+    # Следующая страница определяется по лишней прочитанной строке, а не по оценке числа строк
+    has_more = False
+
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator с приблизительным count. Оценка может оказаться меньше реального числа строк,
+    поэтому номер страницы ограничивается только наличием строк, а не оценкой.
+    """
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        page = EstimatedPage(rows[:self.per_page], number, self)
+        page.has_more = len(rows) > self.per_page
+        # В ответе — не меньше строк, чем уже увидели
+        self.count = max(self.count, bottom + len(page.object_list))
+        return page
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по сортировке запроса (Meta.ordering модели или ?ordering=)
+    с добавлением id для однозначного порядка. Страница выбирается условием WHERE по ключу
+    последней строки, поэтому не требует ни OFFSET, ни COUNT(*).
+    Параметр count=estimate|exact добавляет в ответ общее число строк.
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        position, self.reverse = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [(field, not descending) for field, descending in ordering]
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.after(ordering, position))
+            except (ValidationError, ValueError, TypeError):
+                # Значения ключа не приводятся к типам полей сортировки
+                raise NotFound("Некорректный курсор.")
+        queryset = queryset.order_by(*[("-" if descending else "") + field for field, descending in ordering])
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_previous = self.has_more if self.reverse else position is not None
+        self.has_next = position is not None if self.reverse else self.has_more
+        self.first = self.position(rows[0]) if rows else None
+        self.last = self.position(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data}
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == "estimate":
+            return estimate_count(queryset)
+        if mode == "exact":
+            return queryset.count()
+        return None
+
+    @staticmethod
+    def get_ordering(queryset):
+        ordering = [
+            (field.lstrip("-"), field.startswith("-"))
+            for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        names = {field for field, _ in ordering}
+        if not names & {"pk", "id"}:
+            ordering.append(("pk", ordering[0][1] if ordering else False))
+        return ordering
+
+    @staticmethod
+    def after(ordering, position):
+        """
+        Условие «строго после position» для составного ключа сортировки.
+        """
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(ordering, position):
+            lookup = "lt" if descending else "gt"
+            condition |= equal & Q(**{f"{field}__{lookup}": value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def position(self, obj):
+        values = []
+        for field, _ in self.ordering:
+            value = obj
+            for attr in field.split("__"):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = payload["p"], bool(payload["r"])
+        except (ValueError, KeyError, TypeError):
+            raise NotFound("Некорректный курсор.")
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound("Курсор не соответствует сортировке.")
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({"p": position, "r": reverse}, cls=CursorEncoder)
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, True)
 
 
 class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Постраничная пагинация по умолчанию. В запросе можно выбрать:
+    ?pagination=cursor (или ?cursor=...) — курсорный режим (KeysetPagination),
+    ?count=estimate — приблизительное общее число строк вместо COUNT(*).
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    pagination_query_param = "pagination"
+    count_query_param = "count"
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        params = request.query_params
+        if params.get(self.pagination_query_param) == "cursor" or params.get(self.keyset_class.cursor_query_param):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.estimated = params.get(self.count_query_param) == "estimate"
+        if self.estimated:
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.estimated:
+            response.data["count_estimated"] = True
+        return response
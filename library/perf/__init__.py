@@ -0,0 +1,2 @@
+# Инструменты производительности для команд query_budget, explain_endpoints, benchmark_endpoints и checkout_stress
+# и для тестов: наполнение БД, тестовый клиент, JWT и замеры запросов. Код приложения их не импортирует.
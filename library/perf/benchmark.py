@@ -0,0 +1,217 @@
+import asyncio
+import math
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, transaction
+from django.urls import reverse
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from library.cache import bump_catalog_version
+from library.perf.profiling import ENDPOINTS, access_token, call_endpoint, seed_dataset
+
+# Пары «синхронный DRF-маршрут — асинхронный аналог» для сравнения под ASGI
+CONCURRENCY_ROUTES = (
+    ("library:books-list", "library:async-books-list"),
+    ("library:authors-list", "library:async-authors-list"),
+    ("library:borrows-list", "library:async-borrows-list"),
+    ("library:bookrequest-list", "library:async-book-requests-list"),
+)
+
+
+def percentile(values, percent):
+    """
+    Процентиль по методу ближайшего ранга (без интерполяции, как в большинстве APM).
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def call_rolled_back(endpoint, context, cold_cache):
+    """
+    Один запрос в транзакции с откатом: изменяющие маршруты повторяются на тех же данных.
+    """
+    if cold_cache:
+        bump_catalog_version()
+    with transaction.atomic():
+        result = call_endpoint(endpoint, context)
+        transaction.set_rollback(True)
+    return result
+
+
+def measure_allocations(endpoint, context, cold_cache):
+    """
+    Пиковый и итоговый объём памяти, выделенной за запрос. Отдельный прогон:
+    tracemalloc замедляет выполнение в разы и исказил бы задержки.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        call_rolled_back(endpoint, context, cold_cache)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_kb": round((peak - before) / 1024, 1), "alloc_retained_kb": round((current - before) / 1024, 1)}
+
+
+def benchmark_endpoint(endpoint, context, repeat=20, warmup=2, cold_cache=False):
+    for _ in range(warmup):
+        call_rolled_back(endpoint, context, cold_cache)
+
+    timings, query_counts = [], []
+    for _ in range(repeat):
+        path, response, queries, elapsed = call_rolled_back(endpoint, context, cold_cache)
+        timings.append(elapsed * 1000)
+        query_counts.append(len(queries))
+
+    return {
+        "endpoint": endpoint.name,
+        "method": endpoint.method.upper(),
+        "path": path,
+        "status": response.status_code,
+        "n": repeat,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "queries": max(query_counts),
+        **measure_allocations(endpoint, context, cold_cache),
+    }
+
+
+def run_benchmark(endpoints=ENDPOINTS, repeat=20, warmup=2, seed_size=10, cold_cache=False, label=None):
+    """
+    Прогоняет маршруты в процессе поверх текущих данных БД (например, созданных generate_library).
+    Объекты, на которые ссылаются маршруты, создаются seed_dataset; всё откатывается в конце.
+    """
+    results = []
+    with override_settings(ALLOWED_HOSTS=["*"]), transaction.atomic():
+        context = seed_dataset(seed_size)
+        for endpoint in endpoints:
+            results.append(benchmark_endpoint(endpoint, context, repeat, warmup, cold_cache))
+        transaction.set_rollback(True)
+    return {
+        "meta": {
+            "label": label,
+            "created_at": timezone.now().isoformat(),
+            "vendor": connection.vendor,
+            "repeat": repeat,
+            "warmup": warmup,
+            "cold_cache": cold_cache,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """
+    Изменение p95 и числа запросов относительно сохранённого прогона (по имени маршрута).
+    """
+    previous = {row["endpoint"]: row for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        old = previous.get(row["endpoint"])
+        if old is None:
+            continue
+        rows.append({
+            "endpoint": row["endpoint"],
+            "p95_ms": row["p95_ms"],
+            "p95_change_pct": round((row["p95_ms"] / old["p95_ms"] - 1) * 100, 1) if old["p95_ms"] else None,
+            "queries": row["queries"],
+            "queries_change": row["queries"] - old["queries"],
+        })
+    return rows
+
+
+async def asgi_get(application, path, headers):
+    """
+    GET-запрос напрямую к ASGI-приложению (как от uvicorn, без сети). Возвращает код ответа.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"testserver"), *headers],
+        "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    body = [{"type": "http.request", "body": b"", "more_body": False}]
+    disconnected = asyncio.Event()
+    status = None
+
+    async def receive():
+        if body:
+            return body.pop()
+        # Клиент не отключается: ожидание снимает сам обработчик после ответа
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+async def drive(application, path, headers, total, concurrency):
+    """
+    total запросов, не более concurrency одновременно. Параллельно раз в миллисекунду
+    замеряется число потоков процесса.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, statuses, threads = [], [], [threading.active_count()]
+    finished = asyncio.Event()
+
+    async def sample():
+        while not finished.is_set():
+            threads.append(threading.active_count())
+            await asyncio.sleep(0.001)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            statuses.append(await asgi_get(application, path, headers))
+            timings.append((time.perf_counter() - started) * 1000)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    finished.set()
+    await sampler
+    return timings, statuses, max(threads), elapsed
+
+
+def run_concurrency(user=None, routes=CONCURRENCY_ROUTES, total=200, concurrency=50):
+    """
+    Нагрузка на пары маршрутов через ASGI-обработчик Django: пропускная способность,
+    p95 и пик числа потоков процесса при concurrency одновременных запросах.
+    Запросы выполняются в других потоках, поэтому данные должны быть уже сохранены в БД.
+    """
+    application = ASGIHandler()
+    headers = [(b"authorization", f"Bearer {access_token(user)}".encode())] if user else []
+    results = []
+    with override_settings(ALLOWED_HOSTS=["*"]):
+        for pair in routes:
+            for url_name in pair:
+                path = reverse(url_name)
+                timings, statuses, peak_threads, elapsed = asyncio.run(
+                    drive(application, path, headers, total, concurrency)
+                )
+                results.append({
+                    "route": url_name,
+                    "path": path,
+                    "statuses": sorted(set(statuses)),
+                    "requests": total,
+                    "concurrency": concurrency,
+                    "rps": round(total / elapsed, 1),
+                    "p95_ms": round(percentile(timings, 95), 2),
+                    "peak_threads": peak_threads,
+                })
+    return results
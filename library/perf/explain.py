@@ -0,0 +1,122 @@
+import json
+import re
+
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from library.cache import bump_catalog_version
+from library.perf.profiling import ENDPOINTS, call_endpoint, seed_dataset
+
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+# COUNT(*) пагинации и пробы ETag читают весь отфильтрованный набор намеренно
+# (для больших списков есть ?count=estimate и курсорная пагинация)
+COUNT_PREFIX = "SELECT COUNT("
+
+# Полная выгрузка таблицы читает её целиком по определению — сканирование здесь не регрессия
+FULL_SCAN_ENDPOINTS = {"BorrowExportAPIView.get", "BookRequestExportAPIView.get", "BookExportAPIView.get"}
+
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)")
+_LIMIT_RE = re.compile(r"\bLIMIT \d+\s*$", re.IGNORECASE)
+
+
+def plan_postgresql(sql, threshold):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    issues = []
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        rows = int(node.get("Plan Rows", 0))
+        if node["Node Type"] == "Seq Scan" and rows > threshold:
+            issues.append(f"Seq Scan {node.get('Relation Name')} (~{rows} строк)")
+        elif node["Node Type"] in ("Sort", "Incremental Sort") and rows > threshold:
+            issues.append(f"{node['Node Type']} {', '.join(node.get('Sort Key', []))} (~{rows} строк)")
+        stack.extend(node.get("Plans", []))
+    return plan, issues
+
+
+def plan_sqlite(sql, threshold):
+    """
+    SQLite не оценивает число строк в плане, поэтому порогом служит размер сканируемой таблицы.
+    """
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        plan = [row[3] for row in cursor.fetchall()]
+        sizes = {}
+        for detail in plan:
+            match = _SQLITE_SCAN_RE.match(detail)
+            # Подзапросы и CTE в плане тоже называются SCAN — считаем только таблицы
+            if match and match.group(1) in tables and match.group(1) not in sizes:
+                cursor.execute(f'SELECT COUNT(*) FROM "{match.group(1)}"')
+                sizes[match.group(1)] = cursor.fetchone()[0]
+    # Без временного B-дерева строки идут уже в нужном порядке, и LIMIT останавливает сканирование
+    ordered_limit = _LIMIT_RE.search(sql) and not any(detail.startswith("USE TEMP B-TREE") for detail in plan)
+    issues = []
+    for detail in plan:
+        match = _SQLITE_SCAN_RE.match(detail)
+        # SCAN (в том числе USING INDEX) — проход по всей таблице или индексу, SEARCH — выборочное чтение.
+        # У виртуальных таблиц (FTS5) «SCAN ... VIRTUAL TABLE INDEX» — поиск по их собственному индексу
+        scan = match and "VIRTUAL TABLE INDEX" not in detail
+        if scan and not ordered_limit and sizes.get(match.group(1), 0) > threshold:
+            issues.append(f"{detail} ({sizes[match.group(1)]} строк)")
+        elif detail.startswith("USE TEMP B-TREE") and max(sizes.values(), default=0) > threshold:
+            issues.append(detail)
+    return plan, issues
+
+
+PLANNERS = {"postgresql": plan_postgresql, "sqlite": plan_sqlite}
+
+
+def explain_sql(sql, threshold):
+    """
+    План запроса и список проблем: полные сканирования и сортировки больше threshold строк.
+    """
+    planner = PLANNERS.get(connection.vendor)
+    if planner is None:
+        return None, []
+    return planner(sql, threshold)
+
+
+def explain_endpoints(size, threshold, endpoints=ENDPOINTS, include_counts=False):
+    """
+    Наполняет БД набором размера size (с откатом), выполняет маршруты и строит планы всех их запросов.
+    """
+    report = []
+    with override_settings(ALLOWED_HOSTS=["*"]), transaction.atomic():
+        context = seed_dataset(size)
+        # Статистика планировщика по свежему набору, иначе планы не соответствуют данным
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        for endpoint in endpoints:
+            # Без кэша каталога: нужны запросы, а не сохранённый ответ
+            bump_catalog_version()
+            with transaction.atomic():
+                path, response, queries, _ = call_endpoint(endpoint, context)
+                # Изменяющие маршруты откатываются, чтобы следующие работали с тем же набором
+                transaction.set_rollback(True)
+            seen = set()
+            for query in queries:
+                sql = query["sql"]
+                statement = sql.lstrip().upper()
+                if sql in seen or not statement.startswith(EXPLAINABLE):
+                    continue
+                if not include_counts and statement.startswith(COUNT_PREFIX):
+                    continue
+                seen.add(sql)
+                plan, issues = explain_sql(sql, threshold)
+                if endpoint.name in FULL_SCAN_ENDPOINTS:
+                    issues = [issue for issue in issues if not issue.startswith(("SCAN", "Seq Scan"))]
+                report.append({
+                    "endpoint": endpoint.name,
+                    "path": path,
+                    "status": response.status_code,
+                    "sql": sql,
+                    "plan": plan,
+                    "issues": issues,
+                })
+        transaction.set_rollback(True)
+    return report
@@ -0,0 +1,359 @@
+import time
+import uuid
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from library.checkout import CheckoutError, NoCopiesAvailable, checkout, return_borrow
+from library.facets import rebuild_facets
+from library.models import ACTIVE_BORROW_STATUSES, Author, Book, Borrow, BookRequest, Genre
+from library.search import get_search_backend
+from users.serializers import RoleTokenObtainPairSerializer
+
+User = get_user_model()
+
+READER_PASSWORD = "reader-pass-1234"
+
+# name — метка в отчёте, url_name — имя маршрута, target — ключ объекта в контексте (для detail-маршрутов),
+# actor — от чьего имени запрос ('admin', 'reader' или None), data — тело запроса (функция от контекста),
+# format — формат тела запроса для тестового клиента
+Endpoint = namedtuple("Endpoint", "name method url_name target actor data format", defaults=("json",))
+
+CATALOG_SAMPLE = (
+    "title,author_first_name,author_last_name,genre,total_copies\n"
+    "Imported Book,First0,Last0,Проза,2\n"
+    "Another Imported Book,New,Author,Проза,1\n"
+)
+
+ENDPOINTS = [
+    # library: маршруты роутера
+    Endpoint("AuthorViewSet.list", "get", "library:author-list", None, "admin", None),
+    Endpoint("AuthorViewSet.retrieve", "get", "library:author-detail", "author", "admin", None),
+    Endpoint("AuthorViewSet.create", "post", "library:author-list", None, "admin",
+             lambda ctx: {"first_name": "New", "last_name": "Author"}),
+    Endpoint("AuthorViewSet.partial_update", "patch", "library:author-detail", "author", "admin",
+             lambda ctx: {"bio": "Updated"}),
+    Endpoint("AuthorViewSet.destroy", "delete", "library:author-detail", "spare_author", "admin", None),
+    Endpoint("BookViewSet.list", "get", "library:book-list", None, "admin", None),
+    Endpoint("BookViewSet.retrieve", "get", "library:book-detail", "book", "admin", None),
+    Endpoint("BookViewSet.create", "post", "library:book-list", None, "admin",
+             lambda ctx: {"title": "New Book", "author": ctx["author"].pk, "total_copies": 2}),
+    Endpoint("BookViewSet.partial_update", "patch", "library:book-detail", "book", "admin",
+             lambda ctx: {"genre": "Updated"}),
+    Endpoint("BookViewSet.import_catalog", "post", "library:book-import-catalog", None, "admin",
+             lambda ctx: {"file": SimpleUploadedFile("catalog.csv", CATALOG_SAMPLE.encode())}, "multipart"),
+    Endpoint("BorrowViewSet.list", "get", "library:borrow-list", None, "admin", None),
+    Endpoint("BorrowViewSet.retrieve", "get", "library:borrow-detail", "borrow", "admin", None),
+    Endpoint("BorrowViewSet.create", "post", "library:borrow-list", None, "admin",
+             lambda ctx: {"user": ctx["admin"].pk, "book": ctx["spare_book"].pk}),
+    Endpoint("BorrowViewSet.return_borrow", "post", "library:borrow-return-borrow", "return_borrow", "admin", None),
+    Endpoint("BookRequestViewSet.list[admin]", "get", "library:bookrequest-list", None, "admin", None),
+    Endpoint("BookRequestViewSet.list", "get", "library:bookrequest-list", None, "reader", None),
+    Endpoint("BookRequestViewSet.retrieve", "get", "library:bookrequest-detail", "reader_request", "reader", None),
+    Endpoint("BookRequestViewSet.create", "post", "library:bookrequest-list", None, "reader",
+             lambda ctx: {"book": ctx["spare_book"].pk}),
+    Endpoint("BookRequestViewSet.approve", "post", "library:bookrequest-approve", "approve_request", "admin", None),
+    Endpoint("BookRequestViewSet.reject", "post", "library:bookrequest-reject", "reject_request", "admin",
+             lambda ctx: {"reject_reason": "Нет в наличии"}),
+    Endpoint("BookRequestViewSet.bulk_approve", "post", "library:bookrequest-bulk-approve", None, "admin",
+             lambda ctx: {"ids": ctx["bulk_ids"]}),
+    Endpoint("BookRequestViewSet.bulk_reject", "post", "library:bookrequest-bulk-reject", None, "admin",
+             lambda ctx: {"user": ctx["reader"].pk, "reject_reason": "Нет в наличии"}),
+    # library: отдельные маршруты
+    Endpoint("AuthorListAPIView.list", "get", "library:authors-list", None, "reader", None),
+    Endpoint("BookListAPIView.list", "get", "library:books-list", None, "reader", None),
+    # Полнотекстовый поиск: каждая ветка (tsvector, триграммы названия и фамилии автора) — по своему индексу
+    Endpoint("BookListAPIView.list[search]", "get", "library:books-list", None, "reader",
+             lambda ctx: {"search": ctx["book"].title}),
+    Endpoint("BookFacetsAPIView.list", "get", "library:books-facets", None, "reader", None),
+    Endpoint("BookFacetsAPIView.list[filtered]", "get", "library:books-facets", None, "reader",
+             lambda ctx: {"title": "Book"}),
+    # Страница OPAC: несколько сотен книг
+    Endpoint("BookAvailabilityAPIView.get", "get", "library:books-availability", None, "reader",
+             lambda ctx: {"ids": ",".join(str(pk) for pk in ctx["book_ids"][:300])}),
+    Endpoint("BookAvailabilityAPIView.post", "post", "library:books-availability", None, "reader",
+             lambda ctx: {"ids": ctx["book_ids"][-300:]}),
+    Endpoint("BorrowListAPIView.list", "get", "library:borrows-list", None, "reader", None),
+    Endpoint("UserSummaryAPIView.get", "get", "library:me-summary", None, "reader", None),
+    Endpoint("AsyncAuthorListView.get", "get", "library:async-authors-list", None, "reader", None),
+    Endpoint("AsyncBookListView.get", "get", "library:async-books-list", None, "reader", None),
+    Endpoint("AsyncBorrowListView.get", "get", "library:async-borrows-list", None, "reader", None),
+    Endpoint("AsyncBookRequestListView.get[admin]", "get", "library:async-book-requests-list", None, "admin", None),
+    Endpoint("AsyncBookRequestListView.get", "get", "library:async-book-requests-list", None, "reader", None),
+    Endpoint("EventStreamView.get", "get", "library:events", None, "reader", lambda ctx: {"books": ctx["book"].pk}),
+    Endpoint("CatalogCacheStatsAPIView.get", "get", "library:catalog-cache-stats", None, "admin", None),
+    Endpoint("BorrowExportAPIView.get", "get", "library:export-borrows", None, "admin", None),
+    Endpoint("BookRequestExportAPIView.get", "get", "library:export-book-requests", None, "admin", None),
+    Endpoint("BookExportAPIView.get", "get", "library:export-books", None, "admin",
+             lambda ctx: {"file_format": "csv"}),
+    # users
+    Endpoint("RegisterView.create", "post", "users:register", None, None,
+             lambda ctx: {"email": "new.reader@example.com", "password": READER_PASSWORD}),
+    Endpoint("TokenObtainPairView.post", "post", "users:token_obtain_pair", None, None,
+             lambda ctx: {"email": ctx["reader"].email, "password": READER_PASSWORD}),
+    Endpoint("TokenRefreshView.post", "post", "users:token_refresh", None, None,
+             lambda ctx: {"refresh": ctx["refresh"]}),
+    Endpoint("UserViewSet.list", "get", "users:user-list", None, "admin", None),
+    Endpoint("UserViewSet.retrieve", "get", "users:user-detail", "reader", "admin", None),
+]
+
+
+# Бюджет SQL-запросов маршрута с учётом аутентификации по заголовку Authorization (пользователь и группы
+# из БД — режим по умолчанию, TRUST_TOKEN_ROLES=0). Превышение — регрессия, даже если число не растёт с данными
+QUERY_BUDGETS = {
+    "AuthorViewSet.list": 5,
+    "AuthorViewSet.retrieve": 4,
+    "AuthorViewSet.create": 3,
+    "AuthorViewSet.partial_update": 8,
+    "AuthorViewSet.destroy": 5,
+    "BookViewSet.list": 5,
+    "BookViewSet.retrieve": 4,
+    "BookViewSet.create": 8,
+    "BookViewSet.partial_update": 17,
+    "BookViewSet.import_catalog": 12,
+    "BorrowViewSet.list": 4,
+    "BorrowViewSet.retrieve": 3,
+    "BorrowViewSet.create": 12,
+    "BorrowViewSet.return_borrow": 10,
+    "BookRequestViewSet.list[admin]": 4,
+    "BookRequestViewSet.list": 4,
+    "BookRequestViewSet.retrieve": 3,
+    "BookRequestViewSet.create": 5,
+    "BookRequestViewSet.approve": 11,
+    "BookRequestViewSet.reject": 7,
+    "BookRequestViewSet.bulk_approve": 11,
+    "BookRequestViewSet.bulk_reject": 8,
+    "AuthorListAPIView.list": 4,
+    "BookListAPIView.list": 4,
+    "BookListAPIView.list[search]": 4,
+    "BookFacetsAPIView.list": 5,
+    "BookFacetsAPIView.list[filtered]": 5,
+    "BookAvailabilityAPIView.get": 2,
+    "BookAvailabilityAPIView.post": 1,
+    "BorrowListAPIView.list": 4,
+    "UserSummaryAPIView.get": 3,
+    "AsyncAuthorListView.get": 3,
+    "AsyncBookListView.get": 3,
+    "AsyncBorrowListView.get": 3,
+    "AsyncBookRequestListView.get[admin]": 4,
+    "AsyncBookRequestListView.get": 4,
+    "EventStreamView.get": 1,
+    "CatalogCacheStatsAPIView.get": 2,
+    "BorrowExportAPIView.get": 3,
+    "BookRequestExportAPIView.get": 3,
+    "BookExportAPIView.get": 3,
+    "RegisterView.create": 3,
+    "TokenObtainPairView.post": 2,
+    "TokenRefreshView.post": 1,
+    "UserViewSet.list": 5,
+    "UserViewSet.retrieve": 4,
+}
+
+
+def seed_dataset(size):
+    """
+    Наполняет БД набором данных, растущим линейно от size, и возвращает контекст
+    с объектами, на которые ссылаются маршруты из ENDPOINTS.
+    """
+    admin = User.objects.create_user(email=f"budget.admin.{size}@example.com", password=READER_PASSWORD)
+    admin.groups.add(Group.objects.get_or_create(name="Administrator")[0])
+    reader = User.objects.create_user(email=f"budget.reader.{size}@example.com", password=READER_PASSWORD)
+
+    authors = Author.objects.bulk_create(
+        Author(first_name=f"First{i}", last_name=f"Last{i}") for i in range(size)
+    )
+    genre = Genre.objects.resolve("Проза")
+    books = Book.objects.bulk_create(
+        Book(title=f"Book {i:06d}", author=authors[i], genre=genre.name, genre_ref=genre, total_copies=5,
+             available_copies=5)
+        for i in range(size)
+    )
+    # bulk_create не вызывает сигналы: индекс поиска SQLite заполняется явно (на PostgreSQL — триггером)
+    get_search_backend().index_books([book.pk for book in books])
+    patrons = User.objects.bulk_create(
+        User(email=f"budget.patron.{size}.{i}@example.com") for i in range(size)
+    )
+    due_date = timezone.now().date() + timedelta(days=14)
+    Borrow.objects.bulk_create(
+        [Borrow(user=patron, book=book, due_date=due_date) for patron, book in zip(patrons, books)]
+        + [Borrow(user=reader, book=book, due_date=due_date) for book in books]
+    )
+    BookRequest.objects.bulk_create(
+        [BookRequest(user=patron, book=book) for patron, book in zip(patrons, reversed(books))]
+        + [BookRequest(user=reader, book=book) for book in books]
+    )
+    rebuild_facets()
+
+    # Отдельные объекты для изменяющих запросов, чтобы маршруты не мешали друг другу
+    spare_author = Author.objects.create(first_name="Spare", last_name="Author")
+    spare_book = Book.objects.create(title="Spare Book", author=spare_author, total_copies=5)
+    approve_book = Book.objects.create(title="Approve Book", author=spare_author, total_copies=5)
+    return_borrow = Borrow.objects.create(user=admin, book=books[0], due_date=due_date)
+
+    return {
+        "bulk_ids": list(BookRequest.objects.filter(user__in=patrons).values_list("pk", flat=True)),
+        "admin": admin,
+        "reader": reader,
+        "author": authors[0],
+        "spare_author": Author.objects.create(first_name="Deleted", last_name="Author"),
+        "book": books[0],
+        "book_ids": [book.pk for book in books],
+        "spare_book": spare_book,
+        "borrow": Borrow.objects.filter(user=reader).first(),
+        "return_borrow": return_borrow,
+        "reader_request": BookRequest.objects.filter(user=reader).first(),
+        "approve_request": BookRequest.objects.create(user=admin, book=approve_book),
+        "reject_request": BookRequest.objects.create(user=patrons[0], book=spare_book),
+        "refresh": str(RefreshToken.for_user(reader)),
+    }
+
+
+def access_token(user):
+    return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def call_endpoint(endpoint, context):
+    """
+    Выполняет запрос к маршруту. Возвращает (путь, ответ, перехваченные SQL-запросы, время в секундах).
+    """
+    client = APIClient()
+    if endpoint.actor:
+        # Только заголовок Authorization, как у настоящего клиента: запросы аутентификации и ролей
+        # (CachedJWTAuthentication) входят в замер и в бюджет маршрута
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token(context[endpoint.actor])}")
+    kwargs = {"pk": context[endpoint.target].pk} if endpoint.target else {}
+    path = reverse(endpoint.url_name, kwargs=kwargs)
+    data = endpoint.data(context) if endpoint.data else None
+
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, endpoint.method)(path, data=data, format=endpoint.format)
+        if response.streaming and not response.is_async:
+            # Потоковый ответ выполняет запросы при чтении тела; тело не накапливаем.
+            # Асинхронный поток (SSE) бесконечен: измеряется только установка соединения
+            for _ in response.streaming_content:
+                pass
+    elapsed = time.perf_counter() - started
+    return path, response, queries.captured_queries, elapsed
+
+
+def measure(endpoint, context):
+    """
+    Выполняет запрос к маршруту и возвращает число SQL-запросов и время ответа.
+    """
+    path, response, queries, elapsed = call_endpoint(endpoint, context)
+    return {
+        "endpoint": endpoint.name,
+        "method": endpoint.method.upper(),
+        "path": path,
+        "status": response.status_code,
+        "queries": len(queries),
+        "ms": round(elapsed * 1000, 2),
+    }
+
+
+def run_query_budget(sizes, endpoints=ENDPOINTS):
+    """
+    Для каждого размера набора данных наполняет БД, опрашивает все маршруты и откатывает изменения.
+    """
+    rows = []
+    # Запросы выполняются в процессе, поэтому хост тестового клиента разрешаем явно
+    with override_settings(ALLOWED_HOSTS=["*"]):
+        for size in sizes:
+            with transaction.atomic():
+                context = seed_dataset(size)
+                for endpoint in endpoints:
+                    rows.append({"size": size, **measure(endpoint, context)})
+                transaction.set_rollback(True)
+    return rows
+
+
+def budget_violations(rows, budgets=QUERY_BUDGETS):
+    """
+    Маршруты, число запросов которых зависит от размера данных или превышает бюджет QUERY_BUDGETS
+    (маршрут без бюджета тоже считается нарушением).
+    """
+    counts = {}
+    for row in rows:
+        counts.setdefault(row["endpoint"], set()).add(row["queries"])
+    return sorted(
+        name for name, values in counts.items()
+        if len(values) > 1 or name not in budgets or max(values) > budgets[name]
+    )
+
+
+def run_checkout_stress(threads=8, copies=50, attempts=200):
+    """
+    Нагрузочный тест выдачи: attempts пользователей одновременно берут одну книгу с copies экземплярами,
+    затем все выдачи одновременно возвращаются. Данные создаются в БД (с фиксацией) и удаляются в конце.
+    Возвращает пропускную способность, итоги операций и результат проверки инвариантов.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    author = Author.objects.create(first_name="Stress", last_name=run_id)
+    book = Book.objects.create(title=f"Stress {run_id}", author=author, total_copies=copies)
+    users = User.objects.bulk_create(User(email=f"stress.{run_id}.{i}@example.com") for i in range(attempts))
+
+    def attempt(operation, retries=3):
+        try:
+            for retry in range(retries + 1):
+                try:
+                    operation()
+                    return "ok"
+                except NoCopiesAvailable:
+                    return "no_copies"
+                except CheckoutError:
+                    return "rejected"
+                except DatabaseError:
+                    # Конфликт блокировок: транзакция откатилась целиком, повторяем как клиент
+                    time.sleep(0.01 * (retry + 1))
+            return "db_error"
+        finally:
+            connection.close()
+
+    def timed(operations):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = Counter(pool.map(attempt, operations))
+        return outcomes, time.perf_counter() - started
+
+    try:
+        checkouts, checkout_time = timed([lambda user=user: checkout(user, book) for user in users])
+        book.refresh_from_db()
+        active = Borrow.objects.filter(book=book, status__in=ACTIVE_BORROW_STATUSES)
+        after_checkout = {"available": book.available_copies, "active": active.count()}
+
+        returns, return_time = timed([lambda borrow=borrow: return_borrow(borrow) for borrow in active.all()])
+        book.refresh_from_db()
+        after_return = {"available": book.available_copies, "active": active.count()}
+    finally:
+        book.delete()
+        author.delete()
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    invariants = {
+        "no_oversell": checkouts["ok"] <= copies,
+        "copies_balance": after_checkout["available"] + after_checkout["active"] == copies,
+        "every_checkout_recorded": after_checkout["active"] == checkouts["ok"],
+        "copies_balance_after_return": after_return["available"] + after_return["active"] == copies,
+        "every_return_recorded": after_return["active"] == checkouts["ok"] - returns["ok"],
+    }
+    return {
+        "threads": threads,
+        "copies": copies,
+        "attempts": attempts,
+        "checkouts": dict(checkouts),
+        "checkouts_per_sec": round(attempts / checkout_time, 1),
+        "returns": dict(returns),
+        "returns_per_sec": round(sum(returns.values()) / return_time, 1) if return_time else None,
+        "invariants": invariants,
+    }
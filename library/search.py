@@ -0,0 +1,133 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from library.models import Book
+
+# Конфигурация полнотекстового поиска PostgreSQL (совпадает с триггером из миграции 0012)
+SEARCH_CONFIG = "russian"
+
+FTS_TABLE = "library_book_fts"
+# Веса столбцов title, author, genre, description для bm25 (как setweight A-D на PostgreSQL)
+FTS_WEIGHTS = "10.0, 5.0, 2.0, 1.0"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class PostgresSearchBackend:
+    """
+    Поиск по tsvector (поддерживается триггером в БД) с ранжированием
+    и допуском опечаток через pg_trgm.
+    """
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.filter(pk__in=self.matched_ids(query, search_query))
+            .annotate(rank=SearchRank(F("search_vector"), search_query) + TrigramWordSimilarity(query, "title"))
+            .order_by("-rank", "pk")
+        )
+
+    @staticmethod
+    def matched_ids(query, search_query):
+        """
+        id найденных книг: каждое условие — отдельный подзапрос по своему GIN-индексу (миграция 0012),
+        объединённый UNION. OR через соединение с авторами не даёт планировщику совместить индексы
+        и приводит к полному сканированию книг.
+        """
+        books = Book.objects.order_by().values("pk")
+        return books.filter(search_vector=search_query).union(
+            books.filter(title__trigram_word_similar=query),
+            books.filter(author__last_name__trigram_similar=query),
+        )
+
+    def index_books(self, book_ids):
+        # Вектор обновляет триггер library_book_search_vector
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE library_book SET title = title")
+
+
+class SQLiteSearchBackend:
+    """
+    Локальная замена на SQLite FTS5: поиск по префиксам слов с ранжированием bm25.
+    Индекс поддерживается сигналами Book/Author (library.signals).
+    """
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = library_book.id",
+            (match,),
+            output_field=FloatField(),
+        )
+        matched = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        return queryset.filter(pk__in=matched).annotate(rank=rank).order_by("-rank", "pk")
+
+    @staticmethod
+    def match_expression(query):
+        return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+    def index_books(self, book_ids):
+        rows = [
+            (book.pk, book.title, str(book.author or ""), book.genre, book.description)
+            for book in Book.objects.filter(pk__in=book_ids).select_related("author")
+        ]
+        with connection.cursor() as cursor:
+            self._delete(cursor, book_ids)
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, genre, description) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_books(self, book_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, book_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, genre, description) "
+                "SELECT b.id, b.title, coalesce(a.first_name || ' ' || a.last_name, ''), b.genre, b.description "
+                "FROM library_book b LEFT JOIN library_author a ON a.id = b.author_id"
+            )
+
+    @staticmethod
+    def _delete(cursor, book_ids):
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in book_ids])
+
+
+class NullSearchBackend:
+    """
+    Для прочих СУБД: поиск выполняет стандартный SearchFilter (icontains по search_fields).
+    """
+    def index_books(self, book_ids):
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    return _BACKENDS.get(connection.vendor, NullSearchBackend)()
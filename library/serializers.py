@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.relations import StringRelatedField
 from rest_framework.validators import UniqueTogetherValidator
 
+from .checkout import AlreadyBorrowed, CheckoutError, approve_request, checkout, reject_request, return_borrow
+from .importer import FORMATS
 from .models import Author, Book, Borrow, BookRequest
-from django.utils import timezone
 
 from .services import is_past_date
 
@@ -20,13 +22,38 @@ class BookSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 
 class BookCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        fields = "__all__"
+        exclude = ("search_vector",)
+        # Остаток меняют только выдача и возврат; изменение total_copies переносится на него в Book.save
+        read_only_fields = ("available_copies",)
+
+
+class CatalogImportSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text="CSV или JSONL: title, author_first_name, author_last_name, "
+                                           "description, genre, total_copies")
+    format = serializers.ChoiceField(choices=FORMATS, required=False, help_text="По умолчанию — по расширению")
+    batch_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+
+
+class BookAvailabilitySerializer(serializers.Serializer):
+    """
+    Список id книг для books/availability/: в теле POST или в GET-параметре ids=1,2,3.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=settings.AVAILABILITY_MAX_IDS)
+
+
+class EventStreamSerializer(serializers.Serializer):
+    """
+    Подписка потока events/: книги, об изменении наличия которых сообщать (?books=1,2,3).
+    """
+    books = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                  max_length=settings.SSE_MAX_BOOK_IDS)
 
 
 class BorrowSerializer(serializers.ModelSerializer):
@@ -36,6 +63,15 @@ class BorrowSerializer(serializers.ModelSerializer):
     class Meta:
         model = Borrow
         fields = "__all__"
+        # Статус меняют только выдача, возврат (return_borrow) и mark_overdue — с остатком и событиями outbox
+        read_only_fields = ("status", "returned_at")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["status"] = instance.current_status
+        # BorrowRecord (списки и карточка) знает, перенесена ли выдача в архив; Borrow — всегда нет
+        data["archived"] = getattr(instance, "archived", False)
+        return data
 
 
 class BorrowCreateSerializer(serializers.ModelSerializer):
@@ -65,15 +101,11 @@ class BorrowCreateSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        book = validated_data["book"]
-
-        # уменьшаем доступные копии книги
-        book.available_copies -= 1
-        book.save()
-
-        # создаём borrow
-        borrow = Borrow.objects.create(**validated_data)
-        return borrow
+        # Остаток уменьшается условным UPDATE в той же транзакции, что и создание borrow
+        try:
+            return checkout(validated_data["user"], validated_data["book"], validated_data.get("due_date"))
+        except CheckoutError as exc:
+            raise serializers.ValidationError(str(exc))
 
 
 class BorrowReturnSerializer(serializers.ModelSerializer):
@@ -86,18 +118,10 @@ class BorrowReturnSerializer(serializers.ModelSerializer):
         fields = ("id",)
 
     def update(self, instance, validated_data):
-        if instance.status != "borrowed" and instance.status != "overdue":
-            raise serializers.ValidationError("Эта книга уже была возвращена.")
-
-        instance.status = "returned"
-        instance.returned_at = timezone.now()
-        instance.save()
-
-        book = instance.book
-        book.available_copies += 1
-        book.save()
-
-        return instance
+        try:
+            return return_borrow(instance)
+        except CheckoutError as exc:
+            raise serializers.ValidationError(str(exc))
 
 
 class BookRequestSerializer(serializers.ModelSerializer):
@@ -157,28 +181,14 @@ class BookRequestApproveSerializer(serializers.ModelSerializer):
         fields = ("id",)
 
     def update(self, instance, validated_data):
-        book = instance.book
-        user = instance.user
-
-        from .models import Borrow
-        if Borrow.objects.filter(user=user, book=book, status__in=["borrowed", "overdue"]).exists():
+        try:
+            approve_request(instance)
+        except AlreadyBorrowed:
             raise serializers.ValidationError(
                 "Невозможно одобрить заявку: у пользователя уже есть активный экземпляр этой книги."
             )
-
-        instance.status = "approved"
-        instance.save()
-
-        Borrow.objects.create(
-            user=user,
-            book=book,
-            due_date=instance.desired_due_date,
-            status="borrowed"
-        )
-
-        if book.available_copies > 0:
-            book.available_copies -= 1
-            book.save()
+        except CheckoutError as exc:
+            raise serializers.ValidationError(str(exc))
 
         return instance
 
@@ -191,10 +201,44 @@ class BookRequestRejectSerializer(serializers.ModelSerializer):
         fields = ("reject_reason",)
 
     def update(self, instance, validated_data):
-        if instance.status != "pending":
-            raise serializers.ValidationError("Эта заявка уже обработана.")
-
-        instance.status = "rejected"
-        instance.reject_reason = validated_data["reject_reason"]
-        instance.save()
+        try:
+            reject_request(instance, validated_data["reject_reason"])
+        except CheckoutError as exc:
+            raise serializers.ValidationError(str(exc))
         return instance
+
+
+class BookRequestBulkSerializer(serializers.Serializer):
+    """
+    Выбор заявок для пакетной обработки: список ids или фильтр по ожидающим заявкам.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False,
+                                max_length=settings.BOOK_REQUEST_BULK_LIMIT)
+    book = serializers.IntegerField(required=False, help_text="Заявки на эту книгу")
+    user = serializers.IntegerField(required=False, help_text="Заявки этого пользователя")
+    created_before = serializers.DateTimeField(required=False, help_text="Заявки, созданные раньше")
+
+    def validate(self, attrs):
+        if not {"ids", "book", "user", "created_before"} & attrs.keys():
+            raise serializers.ValidationError("Укажите ids заявок или фильтр (book, user, created_before).")
+        return attrs
+
+    def get_request_ids(self):
+        data = self.validated_data
+        if "ids" in data:
+            return list(dict.fromkeys(data["ids"]))
+
+        queryset = BookRequest.objects.filter(status="pending")
+        if "book" in data:
+            queryset = queryset.filter(book_id=data["book"])
+        if "user" in data:
+            queryset = queryset.filter(user_id=data["user"])
+        if "created_before" in data:
+            queryset = queryset.filter(created_at__lt=data["created_before"])
+        return list(
+            queryset.order_by("created_at", "pk").values_list("pk", flat=True)[:settings.BOOK_REQUEST_BULK_LIMIT]
+        )
+
+
+class BookRequestBulkRejectSerializer(BookRequestBulkSerializer):
+    reject_reason = serializers.CharField(required=True, help_text="Причина отклонения заявок")
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from library.availability import forget_availability
+from library.bus import publish_events
+from library.cache import bump_catalog_version
+from library.facets import adjust_facets
+from library.models import Author, Book, BookRequest, Borrow, FacetCount, Genre
+from library.outbox import events_recorded
+from library.search import get_search_backend
+from library.summary import invalidate_summaries
+
+# Выдача, возврат или массовое изменение книг в обход save() (UPDATE, bulk_create/bulk_update).
+# Аргументы: book_ids, user_ids.
+circulation_changed = Signal()
+# Изменение заявок в обход save() (отклонение UPDATE-ом). Аргументы: user_ids.
+book_requests_changed = Signal()
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    get_search_backend().index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    get_search_backend().remove_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index_books(list(instance.books.values_list("pk", flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Author)
+@receiver(circulation_changed)
+def catalog_changed(sender, **kwargs):
+    # Сразу и повторно после фиксации: параллельный запрос мог успеть закэшировать
+    # ещё не зафиксированное состояние под новой версией
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version, robust=True)
+
+
+def facet_values(book, available_copies):
+    return book.genre_ref_id, book.author_id, int(available_copies > 0)
+
+
+@receiver(post_save, sender=Book)
+def book_facets_saved(sender, instance, created, **kwargs):
+    genre_id, author_id, available = facet_values(instance, instance.available_copies)
+    if created:
+        adjust_facets([(genre_id, author_id, 1, available)])
+        return
+    # Значения до сохранения: загруженные из БД и остаток из заблокированной строки (Book.save)
+    loaded = getattr(instance, "_loaded", {})
+    before = (loaded.get("genre_ref_id", genre_id), loaded.get("author_id", author_id),
+              int(loaded.get("available_copies", instance.available_copies) > 0))
+    if before != (genre_id, author_id, available):
+        adjust_facets([(*before[:2], -1, -before[2]), (genre_id, author_id, 1, available)])
+
+
+@receiver(post_delete, sender=Book)
+def book_facets_deleted(sender, instance, **kwargs):
+    genre_id, author_id, available = facet_values(instance, instance.available_copies)
+    adjust_facets([(genre_id, author_id, -1, -available)])
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    # Книги отвязываются через SET_NULL без сигналов
+    FacetCount.objects.filter(dimension="genre", value_id=instance.pk).delete()
+
+
+@receiver(circulation_changed)
+@receiver(book_requests_changed)
+def summaries_changed(sender, user_ids, **kwargs):
+    invalidate_summaries(user_ids)
+
+
+@receiver([post_save, post_delete], sender=Borrow)
+@receiver([post_save, post_delete], sender=BookRequest)
+def summary_rows_changed(sender, instance, **kwargs):
+    invalidate_summaries([instance.user_id])
+
+
+@receiver(circulation_changed)
+def circulation_availability_changed(sender, book_ids, **kwargs):
+    forget_availability(book_ids)
+
+
+@receiver([post_save, post_delete], sender=Book)
+def book_availability_changed(sender, instance, **kwargs):
+    forget_availability([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Borrow)
+def borrow_availability_changed(sender, instance, **kwargs):
+    # Правка срока или удаление выдачи администратором меняет ближайшую дату возврата
+    forget_availability([instance.book_id])
+
+
+@receiver(events_recorded)
+def live_events(sender, events, **kwargs):
+    # Подписчики SSE получают только зафиксированные изменения
+    transaction.on_commit(lambda: publish_events(events), robust=True)
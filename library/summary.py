@@ -0,0 +1,89 @@
+# Сводка читателя для приложения (me/summary/): счётчики одним запросом с условной агрегацией
+# и ближайшие активные выдачи одним запросом с select_related. Кэшируется для каждого пользователя
+# в отдельном кэше USER_SUMMARY_CACHE_ALIAS.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, IntegerField, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from library.models import ACTIVE_BORROW_STATUSES, BookRequest, Borrow
+
+SUMMARY_KEY = "library:summary:{}:{}"
+
+
+def summary_cache():
+    return caches[settings.USER_SUMMARY_CACHE_ALIAS]
+
+
+def summary_key(user_id, today=None):
+    # Дата в ключе: просрочка зависит от текущего дня
+    return SUMMARY_KEY.format(user_id, today or timezone.localdate())
+
+
+def build_summary(user, today=None):
+    """
+    Считает сводку по базе: активные и просроченные выдачи, ближайший срок возврата, заявки в ожидании
+    и USER_SUMMARY_LOANS ближайших по сроку активных выдач.
+    """
+    today = today or timezone.localdate()
+    pending_requests = (
+        BookRequest.objects.filter(user=OuterRef("pk"), status="pending").order_by()
+        .values("user").annotate(count=Count("pk")).values("count")
+    )
+    counters = (
+        get_user_model().objects.filter(pk=user.pk).values("pk")
+        .annotate(
+            active_loans=Count("borrows", filter=Q(borrows__status__in=ACTIVE_BORROW_STATUSES)),
+            overdue=Count("borrows", filter=Q(borrows__status="overdue")
+                          | Q(borrows__status="borrowed", borrows__due_date__lt=today)),
+            next_due_date=Min("borrows__due_date",
+                              filter=Q(borrows__status="borrowed", borrows__due_date__gte=today)),
+            pending_requests=Coalesce(Subquery(pending_requests, output_field=IntegerField()), 0),
+        )
+        .get()
+    )
+    loans = (
+        Borrow.objects.filter(user=user, status__in=ACTIVE_BORROW_STATUSES)
+        .select_related("book").with_effective_status(today)
+        .order_by("due_date", "pk")[:settings.USER_SUMMARY_LOANS]
+    )
+    return {
+        "active_loans": counters["active_loans"],
+        "overdue": counters["overdue"],
+        "pending_requests": counters["pending_requests"],
+        "next_due_date": counters["next_due_date"],
+        "loans": [
+            {
+                "id": borrow.pk,
+                "book": borrow.book_id,
+                "title": borrow.book.title,
+                "due_date": borrow.due_date,
+                "status": borrow.effective_status,
+            }
+            for borrow in loans
+        ],
+    }
+
+
+def get_summary(user):
+    key = summary_key(user.pk)
+    summary = summary_cache().get(key)
+    if summary is None:
+        summary = build_summary(user)
+        summary_cache().set(key, summary, timeout=settings.USER_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_summaries(user_ids):
+    """
+    Сбрасывает сводки пользователей — сразу и повторно после фиксации транзакции:
+    параллельный запрос мог успеть закэшировать ещё не зафиксированное состояние.
+    """
+    keys = [summary_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    summary_cache().delete_many(keys)
+    transaction.on_commit(lambda: summary_cache().delete_many(keys), robust=True)
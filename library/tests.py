@@ -1,6 +1,6 @@
 # library/tests/test_all.py
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.test import APIClient
@@ -148,3 +148,1466 @@ class LibraryAPITest(TestCase):
         serializer.save()
         self.book2.refresh_from_db()
         self.assertEqual(self.book2.available_copies, 0)
+
+
+# OVERDUE TESTS
+
+class OverdueSweepTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="late@example.com", password="pass1234")
+        self.author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.book = Book.objects.create(title="Late Book", author=self.author, total_copies=3)
+        self.other_book = Book.objects.create(title="On Time Book", author=self.author, total_copies=3)
+        self.late = Borrow.objects.create(user=self.user, book=self.book)
+        self.on_time = Borrow.objects.create(user=self.user, book=self.other_book)
+        # Срок прошёл, но строка не пересохранялась — статус в БД устарел
+        Borrow.objects.filter(pk=self.late.pk).update(due_date=timezone.now().date() - timedelta(days=3))
+
+    def test_effective_status_annotation(self):
+        statuses = dict(Borrow.objects.with_effective_status().values_list("id", "effective_status"))
+        self.assertEqual(statuses[self.late.pk], "overdue")
+        self.assertEqual(statuses[self.on_time.pk], "borrowed")
+
+    def test_status_filter_uses_effective_status(self):
+        overdue = Borrow.objects.with_status("overdue")
+        self.assertEqual(list(overdue.values_list("id", flat=True)), [self.late.pk])
+        borrowed = Borrow.objects.with_status("borrowed")
+        self.assertEqual(list(borrowed.values_list("id", flat=True)), [self.on_time.pk])
+
+    def test_mark_overdue_borrows(self):
+        from library.overdue import mark_overdue_borrows
+
+        self.assertEqual(mark_overdue_borrows(), 1)
+        self.late.refresh_from_db()
+        self.on_time.refresh_from_db()
+        self.assertEqual(self.late.status, "overdue")
+        self.assertEqual(self.on_time.status, "borrowed")
+        # Повторный запуск ничего не меняет
+        self.assertEqual(mark_overdue_borrows(), 0)
+
+    def test_mark_overdue_borrows_in_batches(self):
+        from library.models import OutboxEvent
+        from library.outbox import BORROW_OVERDUE
+        from library.overdue import mark_overdue_borrows
+
+        readers = [User.objects.create_user(email=f"late{i}@example.com", password="p") for i in range(6)]
+        Borrow.objects.bulk_create(
+            Borrow(user=reader, book=self.book, due_date=timezone.now().date() - timedelta(days=1))
+            for reader in readers
+        )
+        # 7 просроченных пачками по 3: три транзакции, последняя неполная
+        self.assertEqual(mark_overdue_borrows(batch_size=3), 7)
+        self.assertFalse(Borrow.objects.past_due().exists())
+        self.assertEqual(Borrow.objects.filter(status="overdue").count(), 7)
+        self.assertEqual(OutboxEvent.objects.filter(topic=BORROW_OVERDUE).count(), 7)
+        self.assertEqual(mark_overdue_borrows(batch_size=3), 0)
+
+    @override_settings(OVERDUE_SWEEP_INTERVAL=60)
+    def test_sweeper_starts_only_from_server_entry_point(self):
+        from unittest import mock
+
+        from django.apps import apps
+        from library.overdue import start_configured_sweeper
+
+        with mock.patch("library.overdue.start_overdue_sweeper") as start:
+            # ready() выполняется и в manage.py migrate/shell/test — поток там не нужен
+            apps.get_app_config("library").ready()
+            start.assert_not_called()
+            start_configured_sweeper()
+            start.assert_called_once_with(60)
+            with override_settings(OVERDUE_SWEEP_INTERVAL=0):
+                self.assertIsNone(start_configured_sweeper())
+        self.assertEqual(start.call_count, 1)
+
+    def test_admin_detail_status_uses_current_date(self):
+        from unittest import mock
+
+        from django.contrib.auth.models import Group
+
+        admin = User.objects.create_user(email="late.admin@example.com", password="p")
+        admin.groups.add(Group.objects.create(name="Administrator"))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        path = f"/api/library/admin_borrows/{self.on_time.pk}/"
+        self.assertEqual(client.get(path).json()["status"], "borrowed")
+        # Процесс работает дольше срока выдачи: статус считается на сегодняшнюю дату, а не на дату запуска
+        later = timezone.now() + timedelta(days=30)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(client.get(path).json()["status"], "overdue")
+
+
+# QUERY BUDGET TESTS
+
+class QueryBudgetTest(TestCase):
+    """
+    Число SQL-запросов каждого маршрута не должно зависеть от объёма данных и превышать QUERY_BUDGETS.
+    Отчёт можно сохранить в JSON, указав путь в переменной окружения QUERY_BUDGET_REPORT.
+    """
+
+    def test_budget_includes_authentication(self):
+        from library.perf.profiling import ENDPOINTS, QUERY_BUDGETS, budget_violations, call_endpoint, seed_dataset
+
+        endpoint = next(endpoint for endpoint in ENDPOINTS if endpoint.name == "BookListAPIView.list")
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            _, response, queries, _ = call_endpoint(endpoint, seed_dataset(2))
+        self.assertEqual(response.status_code, 200)
+        # Пользователь загружается CachedJWTAuthentication по токену, а не подставляется тестовым клиентом
+        self.assertTrue(any(f'FROM "{User._meta.db_table}"' in query["sql"] for query in queries))
+        rows = [{"endpoint": endpoint.name, "queries": QUERY_BUDGETS[endpoint.name] + 1}] * 2
+        self.assertEqual(budget_violations(rows), [endpoint.name])
+        self.assertEqual(budget_violations([{"endpoint": "Unknown.get", "queries": 1}]), ["Unknown.get"])
+
+    def test_every_route_is_covered(self):
+        from django.urls import get_resolver
+        from library.perf.profiling import ENDPOINTS
+
+        covered = {endpoint.url_name for endpoint in ENDPOINTS}
+        for namespace in ("library", "users"):
+            resolver = get_resolver().namespace_dict[namespace][1]
+            for pattern in resolver.url_patterns:
+                for name in self._route_names(pattern):
+                    self.assertIn(f"{namespace}:{name}", covered)
+
+    def _route_names(self, pattern):
+        if hasattr(pattern, "url_patterns"):
+            for child in pattern.url_patterns:
+                yield from self._route_names(child)
+        elif pattern.name and pattern.name != "api-root":
+            yield pattern.name
+
+    def test_query_count_does_not_grow_with_data(self):
+        import json
+        import os
+        from library.perf.profiling import budget_violations, run_query_budget
+
+        rows = run_query_budget((2, 20))
+
+        report = os.environ.get("QUERY_BUDGET_REPORT")
+        if report:
+            with open(report, "w", encoding="utf-8") as fh:
+                json.dump(rows, fh, ensure_ascii=False, indent=2)
+
+        for row in rows:
+            self.assertLess(row["status"], 400, row)
+        self.assertEqual(budget_violations(rows), [])
+
+
+# QUERY PLAN TESTS
+
+class QueryPlanTest(TestCase):
+
+    def setUp(self):
+        author = Author.objects.create(first_name="Plan", last_name="Author")
+        Book.objects.bulk_create(Book(title=f"Book {i}", author=author, total_copies=i % 5 + 1) for i in range(30))
+
+    def test_sqlite_plan_flags_full_scan_above_threshold(self):
+        from django.db import connection
+        from library.perf.explain import explain_sql
+
+        if connection.vendor != "sqlite":
+            self.skipTest("Проверяется разбор плана SQLite")
+        by_copies = str(Book.objects.filter(total_copies=3).values("id").query)
+        _, issues = explain_sql(by_copies, threshold=10)
+        self.assertTrue(any(issue.startswith("SCAN library_book") for issue in issues), issues)
+        self.assertEqual(explain_sql(by_copies, threshold=100)[1], [])
+
+        # Страница каталога в сортировке по умолчанию читается по индексу book_title_idx без сортировки
+        by_title = str(Book.objects.order_by("title").values("id", "title")[:10].query)
+        self.assertEqual(explain_sql(by_title, threshold=10)[1], [])
+
+    def test_explain_endpoints_report(self):
+        from library.perf.explain import explain_endpoints
+        from library.perf.profiling import ENDPOINTS
+
+        report = explain_endpoints(size=5, threshold=1000, endpoints=ENDPOINTS[:3])
+        self.assertTrue(report)
+        self.assertEqual({row["endpoint"] for row in report}, {endpoint.name for endpoint in ENDPOINTS[:3]})
+        self.assertTrue(all(row["issues"] == [] for row in report))
+
+    def test_search_endpoint_uses_search_indexes(self):
+        from django.db import connection
+        from library.perf.explain import explain_endpoints
+        from library.perf.profiling import ENDPOINTS
+
+        search = [endpoint for endpoint in ENDPOINTS if endpoint.name == "BookListAPIView.list[search]"]
+        report = explain_endpoints(size=200, threshold=50, endpoints=search)
+        self.assertTrue(report)
+        self.assertTrue(all(row["status"] == 200 for row in report))
+        issues = [issue for row in report for issue in row["issues"]]
+        # Поиск по индексу FTS5 — не полное сканирование
+        self.assertFalse([issue for issue in issues if "VIRTUAL TABLE" in issue], issues)
+        if connection.vendor == "postgresql":
+            # Каждая ветка UNION читает свой GIN-индекс, а не всю таблицу книг
+            self.assertFalse([issue for issue in issues if issue.startswith("Seq Scan library_book ")], issues)
+
+
+# SEARCH TESTS
+
+class BookSearchTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="search@example.com", password="pass1234")
+        self.client.force_authenticate(user=self.user)
+        self.tolstoy = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.orwell = Author.objects.create(first_name="George", last_name="Orwell")
+        self.war = Book.objects.create(title="Война и мир", author=self.tolstoy, genre="Роман")
+        self.anna = Book.objects.create(title="Анна Каренина", author=self.tolstoy, genre="Роман",
+                                        description="О войне ни слова")
+        self.farm = Book.objects.create(title="Animal Farm", author=self.orwell, genre="Сатира")
+
+    def search(self, query, path="/api/library/books/"):
+        response = self.client.get(path, {"search": query})
+        self.assertEqual(response.status_code, 200)
+        return [book["title"] for book in response.json()["results"]]
+
+    def test_search_by_author_and_prefix(self):
+        self.assertEqual(sorted(self.search("толст")), ["Анна Каренина", "Война и мир"])
+        self.assertEqual(self.search("anim"), ["Animal Farm"])
+
+    def test_title_match_ranks_higher(self):
+        self.assertEqual(self.search("войн")[0], "Война и мир")
+
+    def test_index_follows_changes(self):
+        self.orwell.last_name = "Блэр"
+        self.orwell.save()
+        self.assertEqual(self.search("блэр"), ["Animal Farm"])
+        self.farm.delete()
+        self.assertEqual(self.search("блэр"), [])
+
+
+# PAGINATION TESTS
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="pager@example.com", password="pass1234")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        # Повторяющиеся названия проверяют разрешение равенства по id
+        for i in range(25):
+            Book.objects.create(title=f"Book {i % 7}", author=author)
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(data)
+            url = data["next"]
+        return pages
+
+    def test_cursor_walk_returns_every_row_once_in_order(self):
+        pages = self.walk("/api/library/books/?pagination=cursor&page_size=4")
+        ids = [book["id"] for page in pages for book in page["results"]]
+        expected = list(Book.objects.order_by("title", "pk").values_list("pk", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertNotIn("count", pages[0])
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_previous_page(self):
+        pages = self.walk("/api/library/books/?pagination=cursor&page_size=4")
+        previous = self.client.get(pages[2]["previous"]).json()
+        self.assertEqual(previous["results"], pages[1]["results"])
+
+    def test_estimated_count(self):
+        data = self.client.get("/api/library/books/?count=estimate").json()
+        self.assertEqual(data["count"], 25)
+        self.assertTrue(data["count_estimated"])
+        data = self.client.get("/api/library/books/?pagination=cursor&count=estimate").json()
+        self.assertEqual(data["count"], 25)
+
+    def test_estimate_below_real_count_keeps_later_pages(self):
+        from unittest import mock
+
+        with mock.patch("library.pagination.estimate_count", return_value=5):
+            data = self.client.get("/api/library/books/?count=estimate&page_size=10&page=2").json()
+            self.assertEqual(len(data["results"]), 10)
+            self.assertIsNotNone(data["next"])
+            self.assertEqual(data["count"], 20)
+            data = self.client.get("/api/library/books/?count=estimate&page_size=10&page=3").json()
+            self.assertEqual(len(data["results"]), 5)
+            self.assertIsNone(data["next"])
+            response = self.client.get("/api/library/books/?count=estimate&page_size=10&page=4")
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor(self):
+        import base64
+        import json
+
+        response = self.client.get("/api/library/books/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+        # Декодируется, но позиция не список или значения не того типа
+        for payload in ({"p": 5, "r": False}, {"p": ["T1", "abc"], "r": False}):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            response = self.client.get("/api/library/books/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, payload)
+
+
+# CHECKOUT TESTS
+
+class CheckoutEngineTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="reader@example.com", password="pass1234")
+        self.other = User.objects.create_user(email="other@example.com", password="pass1234")
+        self.author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.book = Book.objects.create(title="Single Copy", author=self.author, total_copies=1)
+
+    def test_checkout_and_return_keep_copies_in_bounds(self):
+        from library.checkout import AlreadyReturned, NoCopiesAvailable, checkout, return_borrow
+
+        borrow = checkout(self.user, self.book)
+        with self.assertRaises(NoCopiesAvailable):
+            checkout(self.other, self.book)
+        self.assertFalse(Borrow.objects.filter(user=self.other).exists())
+
+        return_borrow(borrow)
+        with self.assertRaises(AlreadyReturned):
+            return_borrow(borrow)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_approve_without_copies_creates_no_borrow(self):
+        from library.checkout import checkout
+        from library.serializers import BookRequestApproveSerializer
+
+        checkout(self.other, self.book)
+        request = BookRequest.objects.create(user=self.user, book=self.book)
+        serializer = BookRequestApproveSerializer(request, data={})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        request.refresh_from_db()
+        self.assertEqual(request.status, "pending")
+        self.assertFalse(Borrow.objects.filter(user=self.user).exists())
+
+    def test_book_save_keeps_concurrent_checkout(self):
+        from library.checkout import reserve_copy
+
+        Book.objects.filter(pk=self.book.pk).update(total_copies=3, available_copies=3)
+        stale = Book.objects.get(pk=self.book.pk)
+        self.assertTrue(reserve_copy(self.book.pk))
+        stale.title = "Renamed"
+        stale.save()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.title, self.book.available_copies), ("Renamed", 2))
+
+    def test_admin_update_shifts_available_copies_by_total(self):
+        from django.contrib.auth.models import Group
+        from library.checkout import checkout
+
+        admin = User.objects.create_user(email="copies.admin@example.com", password="p")
+        admin.groups.add(Group.objects.create(name="Administrator"))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        checkout(self.user, self.book)
+        response = client.patch(f"/api/library/admin_books/{self.book.pk}/",
+                                {"total_copies": 3, "available_copies": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["available_copies"], 2)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (3, 2))
+
+    def test_check_constraint_rejects_oversell(self):
+        from django.db import IntegrityError, transaction
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=self.book.pk).update(available_copies=5)
+
+
+class CheckoutStressTest(TransactionTestCase):
+
+    def test_concurrent_checkouts_hold_invariants(self):
+        from library.perf.profiling import run_checkout_stress
+
+        report = run_checkout_stress(threads=4, copies=5, attempts=20)
+        self.assertTrue(all(report["invariants"].values()), report)
+        self.assertEqual(Book.objects.count(), 0)
+
+
+# BULK REQUEST PROCESSING TESTS
+
+class BookRequestBulkTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="bulk.admin@example.com", password="admin123")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.scarce = Book.objects.create(title="Scarce", author=author, total_copies=2)
+        self.plenty = Book.objects.create(title="Plenty", author=author, total_copies=10)
+        self.readers = [User.objects.create_user(email=f"bulk{i}@example.com", password="p") for i in range(4)]
+        self.requests = [BookRequest.objects.create(user=reader, book=self.scarce) for reader in self.readers]
+        self.requests += [BookRequest.objects.create(user=reader, book=self.plenty) for reader in self.readers]
+        Borrow.objects.create(user=self.readers[3], book=self.plenty)
+
+    def test_bulk_approve_reports_per_item_failures(self):
+        ids = [request.pk for request in self.requests]
+        response = self.client.post("/api/library/book_requests/bulk_approve/", {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        # Экземпляров Scarce хватает на две самые ранние заявки, у readers[3] уже есть Plenty
+        self.assertEqual(sorted(data["processed"]), sorted(ids[:2] + ids[4:7]))
+        self.assertEqual(sorted(item["id"] for item in data["failed"]), sorted([ids[2], ids[3], ids[7]]))
+
+        self.scarce.refresh_from_db()
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.scarce.available_copies, 0)
+        self.assertEqual(self.plenty.available_copies, 7)
+        self.assertEqual(Borrow.objects.filter(status="borrowed").count(), 6)
+        self.assertEqual(BookRequest.objects.filter(status="approved").count(), 5)
+
+        # Повторная обработка тех же заявок ничего не меняет
+        data = self.client.post("/api/library/book_requests/bulk_approve/", {"ids": ids[:2]}, format="json").json()
+        self.assertEqual(data["processed"], [])
+
+    def test_checkout_and_bulk_approve_lock_book_before_borrows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from library.checkout import bulk_approve_requests, checkout
+
+        def first(queries, prefix):
+            return next(i for i, query in enumerate(queries) if query["sql"].startswith(prefix))
+
+        # Одиночная выдача и пачка блокируют книгу раньше, чем трогают выдачи: иначе выдача, вставленная
+        # между чтением активных выдач и блокировкой книг, роняет bulk_create на unique_active_borrow
+        with CaptureQueriesContext(connection) as single:
+            checkout(self.readers[0], self.plenty)
+        self.assertLess(first(single, 'UPDATE "library_book"'), first(single, 'INSERT INTO "library_borrow"'))
+
+        with CaptureQueriesContext(connection) as bulk:
+            approved, failed = bulk_approve_requests([request.pk for request in self.requests[4:]])
+        self.assertLess(first(bulk, 'SELECT "library_book"'), first(bulk, 'SELECT "library_borrow"'))
+        self.assertEqual(len(approved), 2)
+        self.assertEqual(set(failed.values()), {"У пользователя уже есть активный borrow для этой книги."})
+
+    def test_bulk_reject_by_filter(self):
+        response = self.client.post("/api/library/book_requests/bulk_reject/",
+                                    {"book": self.scarce.pk, "reject_reason": "Списана"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["processed"]), 4)
+        self.assertEqual(BookRequest.objects.filter(status="rejected", reject_reason="Списана").count(), 4)
+
+    def test_selection_is_required(self):
+        response = self.client.post("/api/library/book_requests/bulk_approve/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+# OUTBOX TESTS
+
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="outbox@example.com", password="p")
+        self.other = User.objects.create_user(email="outbox.other@example.com", password="p")
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.book = Book.objects.create(title="Single Copy", author=author, total_copies=1)
+
+    def outbox_inserts(self, func, *args):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args)
+        return result, [q["sql"] for q in queries if q["sql"].startswith('INSERT INTO "library_outboxevent"')]
+
+    def test_events_are_written_in_one_insert_per_change(self):
+        from library.checkout import NoCopiesAvailable, approve_request, checkout, reject_request, return_borrow
+        from library.models import OutboxEvent
+
+        request = BookRequest.objects.create(user=self.user, book=self.book)
+        borrow, inserts = self.outbox_inserts(approve_request, request)
+        self.assertEqual(len(inserts), 1)
+        with self.assertRaises(NoCopiesAvailable):
+            checkout(self.other, self.book)
+        _, inserts = self.outbox_inserts(return_borrow, borrow)
+        self.assertEqual(len(inserts), 1)
+        reject_request(BookRequest.objects.create(user=self.other, book=self.book), "Нет в наличии")
+
+        events = list(OutboxEvent.objects.values_list("topic", "aggregate_id"))
+        self.assertEqual(events, [
+            ("book_request.approved", request.pk),
+            ("borrow.created", borrow.pk),
+            ("borrow.returned", borrow.pk),
+            ("book_request.rejected", request.pk + 1),
+        ])
+        self.assertEqual(OutboxEvent.objects.get(topic="borrow.created").payload["due_date"],
+                         borrow.due_date.isoformat())
+
+    def test_overdue_sweep_records_events(self):
+        from library.models import OutboxEvent
+        from library.overdue import mark_overdue_borrows
+
+        borrow = Borrow.objects.create(user=self.user, book=self.book)
+        today = borrow.due_date + timedelta(days=1)
+        updated, inserts = self.outbox_inserts(mark_overdue_borrows, today)
+        self.assertEqual((updated, len(inserts)), (1, 1))
+        self.assertEqual(OutboxEvent.objects.get().topic, "borrow.overdue")
+        self.assertEqual(mark_overdue_borrows(today), 0)
+
+    def test_admin_borrow_changes_go_through_checkout(self):
+        from django.contrib.auth.models import Group
+        from library.checkout import checkout
+        from library.models import OutboxEvent
+
+        admin = User.objects.create_user(email="outbox.admin@example.com", password="p")
+        admin.groups.add(Group.objects.create(name="Administrator"))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        borrow = checkout(self.user, self.book)
+        path = f"/api/library/admin_borrows/{borrow.pk}/"
+
+        # Статус нельзя сменить в обход возврата: остаток и события outbox остались бы прежними
+        response = client.patch(path, {"status": "returned"}, format="json")
+        self.assertEqual((response.status_code, response.json()["status"]), (200, "borrowed"))
+        self.assertEqual(client.delete(path).status_code, 400)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+        client.post(f"{path}return_borrow/", {}, format="json")
+        self.assertEqual(client.delete(path).status_code, 204)
+        self.assertEqual(list(OutboxEvent.objects.values_list("topic", flat=True)),
+                         ["borrow.created", "borrow.returned"])
+
+    def test_dispatch_in_order_with_backoff(self):
+        from library.checkout import checkout, return_borrow
+        from library.models import OutboxEvent
+        from library.outbox import DeliveryError, MemorySink, dispatch_batch, drain
+
+        return_borrow(checkout(self.user, self.book))
+        checkout(self.other, self.book)
+
+        class BrokenSink:
+            def send(self, events):
+                raise DeliveryError("503")
+
+        self.assertEqual(dispatch_batch(BrokenSink(), batch_size=2), 0)
+        head = OutboxEvent.objects.first()
+        self.assertEqual((head.attempts, head.last_error), (1, "503"))
+
+        # Пока первое событие ждёт повтора, очередь не продвигается
+        sink = MemorySink()
+        self.assertEqual(drain(sink, batch_size=2), 0)
+        OutboxEvent.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain(sink, batch_size=2), 3)
+        self.assertEqual([event["topic"] for event in sink.events],
+                         ["borrow.created", "borrow.returned", "borrow.created"])
+        self.assertEqual([event["id"] for event in sink.events], sorted(event["id"] for event in sink.events))
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+
+    def test_file_sink_and_command(self):
+        import io
+        import json
+        import tempfile
+        from pathlib import Path
+
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        from library.checkout import checkout
+
+        checkout(self.user, self.book)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "outbox.ndjson"
+            with override_settings(OUTBOX_FILE_PATH=path):
+                call_command("dispatch_outbox", sink="library.outbox.FileSink", stdout=io.StringIO())
+            lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual([line["topic"] for line in lines], ["borrow.created"])
+        self.assertEqual(lines[0]["payload"]["user_id"], self.user.pk)
+
+
+# BORROW ARCHIVE TESTS
+
+class BorrowArchiveTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        self.client = APIClient()
+        self.reader = User.objects.create_user(email="archive.reader@example.com", password="p")
+        self.admin = User.objects.create_user(email="archive.admin@example.com", password="p")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.books = [Book.objects.create(title=f"Book {i}", author=author, total_copies=1) for i in range(4)]
+        long_ago = timezone.now() - timedelta(days=800)
+        self.old = [
+            Borrow.objects.create(user=self.reader, book=book, status="returned", returned_at=long_ago)
+            for book in self.books[:3]
+        ]
+        Borrow.objects.filter(pk=self.old[0].pk).update(borrowed_at=(long_ago - timedelta(days=40)).date())
+        self.recent = Borrow.objects.create(user=self.reader, book=self.books[0], status="returned",
+                                            returned_at=timezone.now())
+        self.active = Borrow.objects.create(user=self.reader, book=self.books[3])
+
+    def test_archives_old_returned_borrows_in_batches(self):
+        from library.archive import archive_returned_borrows
+        from library.models import BorrowHistory
+
+        self.assertEqual(archive_returned_borrows(batch_size=2), 3)
+        self.assertEqual(set(Borrow.objects.values_list("pk", flat=True)), {self.recent.pk, self.active.pk})
+        history = BorrowHistory.objects.get(pk=self.old[0].pk)
+        self.assertEqual((history.user_id, history.book_id, history.status), (self.reader.pk, self.books[0].pk,
+                                                                               "returned"))
+        self.assertEqual(archive_returned_borrows(), 0)
+
+    def test_history_endpoints_read_both_tables(self):
+        import io
+
+        from django.core.management import call_command
+
+        call_command("archive_borrows", stdout=io.StringIO())
+        all_ids = {borrow.pk for borrow in (*self.old, self.recent, self.active)}
+
+        self.client.force_authenticate(user=self.reader)
+        data = self.client.get("/api/library/borrows/").json()
+        self.assertEqual({item["id"] for item in data["results"]}, all_ids)
+
+        self.client.force_authenticate(user=self.admin)
+        data = self.client.get("/api/library/admin_borrows/", {"status": "returned"}).json()
+        self.assertEqual(data["count"], 4)
+        response = self.client.get("/api/library/export/borrows/")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        user = self.client.get(f"/api/users/{self.reader.pk}/").json()
+        self.assertEqual(user["borrows_count"], 5)
+
+        # Архивная выдача не участвует в изменениях
+        response = self.client.post(f"/api/library/admin_borrows/{self.old[1].pk}/return_borrow/", {}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_detail_reads_archived_borrow(self):
+        from library.archive import archive_returned_borrows
+
+        archive_returned_borrows()
+        self.client.force_authenticate(user=self.admin)
+        listed = {item["id"]: item for item in self.client.get("/api/library/admin_borrows/").json()["results"]}
+        response = self.client.get(f"/api/library/admin_borrows/{self.old[1].pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), listed[self.old[1].pk])
+        self.assertTrue(response.json()["archived"])
+        self.assertFalse(self.client.get(f"/api/library/admin_borrows/{self.active.pk}/").json()["archived"])
+        # Изменяются только выдачи из Borrow
+        response = self.client.patch(f"/api/library/admin_borrows/{self.old[1].pk}/", {"due_date": "2030-01-01"},
+                                     format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+# USER SUMMARY TESTS
+
+class UserSummaryTest(TestCase):
+
+    def setUp(self):
+        from library.summary import summary_cache
+
+        summary_cache().clear()
+        self.client = APIClient()
+        self.reader = User.objects.create_user(email="summary@example.com", password="p")
+        self.client.force_authenticate(user=self.reader)
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.books = [Book.objects.create(title=f"Book {i}", author=author, total_copies=2) for i in range(4)]
+        today = timezone.localdate()
+        self.late = Borrow.objects.create(user=self.reader, book=self.books[0], due_date=today + timedelta(days=3))
+        Borrow.objects.filter(pk=self.late.pk).update(due_date=today - timedelta(days=2))
+        self.soon = Borrow.objects.create(user=self.reader, book=self.books[1], due_date=today + timedelta(days=5))
+        Borrow.objects.create(user=self.reader, book=self.books[2], status="returned", returned_at=timezone.now())
+        self.request = BookRequest.objects.create(user=self.reader, book=self.books[3])
+
+    def test_summary_in_two_queries(self):
+        from library.summary import build_summary
+
+        with self.assertNumQueries(2):
+            summary = build_summary(self.reader)
+        self.assertEqual(
+            {key: summary[key] for key in ("active_loans", "overdue", "pending_requests", "next_due_date")},
+            {"active_loans": 2, "overdue": 1, "pending_requests": 1, "next_due_date": self.soon.due_date},
+        )
+        self.assertEqual([(loan["id"], loan["title"], loan["status"]) for loan in summary["loans"]],
+                         [(self.late.pk, "Book 0", "overdue"), (self.soon.pk, "Book 1", "borrowed")])
+
+    def test_cached_per_user_and_invalidated(self):
+        from library.checkout import checkout, reject_request, return_borrow
+
+        from django.core.cache import cache
+        from library.summary import summary_cache, summary_key
+
+        self.assertEqual(self.client.get("/api/library/me/summary/").json()["active_loans"], 2)
+        with self.assertNumQueries(0):
+            self.client.get("/api/library/me/summary/")
+        # Отдельный кэш: сводки не вытесняют записи кэша по умолчанию
+        self.assertIsNotNone(summary_cache().get(summary_key(self.reader.pk)))
+        self.assertIsNone(cache.get(summary_key(self.reader.pk)))
+
+        other = User.objects.create_user(email="summary.other@example.com", password="p")
+        checkout(other, self.books[3])
+        with self.assertNumQueries(0):
+            self.client.get("/api/library/me/summary/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return_borrow(self.soon)
+        self.assertEqual(self.client.get("/api/library/me/summary/").json()["active_loans"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            reject_request(self.request, "Нет")
+        self.assertEqual(self.client.get("/api/library/me/summary/").json()["pending_requests"], 0)
+
+
+# AVAILABILITY TESTS
+
+class BookAvailabilityTest(TestCase):
+
+    def setUp(self):
+        from library.availability import availability_cache
+
+        availability_cache.clear()
+        self.client = APIClient()
+        self.reader = User.objects.create_user(email="kiosk@example.com", password="p")
+        self.client.force_authenticate(user=self.reader)
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.books = [Book.objects.create(title=f"Book {i}", author=author, total_copies=1) for i in range(3)]
+        self.patrons = [User.objects.create_user(email=f"kiosk{i}@example.com", password="p") for i in range(2)]
+
+    def test_bulk_lookup_in_one_query_then_cached(self):
+        from library.checkout import checkout
+
+        borrow = checkout(self.patrons[0], self.books[0], due_date=timezone.localdate() + timedelta(days=7))
+        ids = f"{self.books[1].pk},{self.books[0].pk},999999,{self.books[1].pk}"
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/library/books/availability/", {"ids": ids}).json()
+        self.assertEqual(data["missing"], [999999])
+        self.assertEqual(
+            [(item["id"], item["available_copies"], item["next_return_date"]) for item in data["results"]],
+            [(self.books[1].pk, 1, None), (self.books[0].pk, 0, borrow.due_date.isoformat())],
+        )
+        with self.assertNumQueries(0):
+            self.client.post("/api/library/books/availability/", {"ids": [self.books[0].pk]}, format="json")
+
+    def test_checkout_and_return_refresh_cache(self):
+        from library.checkout import checkout, return_borrow
+
+        url = "/api/library/books/availability/"
+        self.assertEqual(self.client.post(url, {"ids": [self.books[2].pk]}, format="json")
+                         .json()["results"][0]["available_copies"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            borrow = checkout(self.patrons[1], self.books[2])
+        self.assertEqual(self.client.get(url, {"ids": self.books[2].pk}).json()["results"][0]["available_copies"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            return_borrow(borrow)
+        item = self.client.get(url, {"ids": self.books[2].pk}).json()["results"][0]
+        self.assertEqual((item["available_copies"], item["next_return_date"]), (1, None))
+
+    def test_admin_due_date_edit_refreshes_cache(self):
+        from django.contrib.auth.models import Group
+        from library.checkout import checkout
+
+        borrow = checkout(self.patrons[0], self.books[0], due_date=timezone.localdate() + timedelta(days=7))
+        url = "/api/library/books/availability/"
+        self.client.get(url, {"ids": self.books[0].pk})
+        self.reader.groups.add(Group.objects.create(name="Administrator"))
+        later = timezone.localdate() + timedelta(days=21)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/api/library/admin_borrows/{borrow.pk}/", {"due_date": later.isoformat()},
+                                         format="json")
+        self.assertEqual(response.status_code, 200)
+        item = self.client.get(url, {"ids": self.books[0].pk}).json()["results"][0]
+        self.assertEqual(item["next_return_date"], later.isoformat())
+
+    def test_validation(self):
+        url = "/api/library/books/availability/"
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {"ids": "1,x"}).status_code, 400)
+        from django.conf import settings
+
+        too_many = list(range(1, settings.AVAILABILITY_MAX_IDS + 2))
+        self.assertEqual(self.client.post(url, {"ids": too_many}, format="json").status_code, 400)
+
+
+# LIVE EVENTS TESTS
+
+class LiveEventsTest(TestCase):
+
+    def setUp(self):
+        from library.perf.profiling import access_token
+
+        self.reader = User.objects.create_user(email="live@example.com", password="p")
+        self.token = access_token(self.reader)
+        author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.book = Book.objects.create(title="Live Book", author=author, total_copies=1)
+
+    def test_checkout_publishes_after_commit(self):
+        import asyncio
+
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from library.bus import book_key, get_bus, user_key
+        from library.checkout import checkout
+
+        def change():
+            with self.captureOnCommitCallbacks(execute=True):
+                checkout(self.reader, self.book)
+
+        async def scenario():
+            bus = get_bus()
+            subscription = bus.subscribe([book_key(self.book.pk), user_key(self.reader.pk)])
+            try:
+                await sync_to_async(change)()
+                await asyncio.sleep(0)
+                return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            finally:
+                bus.unsubscribe(subscription)
+
+        messages = async_to_sync(scenario)()
+        self.assertEqual([message["event"] for message in messages], ["borrow.created", "availability"])
+        self.assertEqual(messages[1]["data"], {"id": self.book.pk, "available_copies": 0, "total_copies": 1})
+        self.assertFalse(get_bus().has_subscribers([book_key(self.book.pk)]))
+
+    async def test_stream_with_heartbeat(self):
+        import asyncio
+
+        from django.test import AsyncClient
+
+        from library.bus import book_key, get_bus
+
+        client = AsyncClient()
+        self.assertEqual((await client.get("/api/library/events/")).status_code, 401)
+
+        response = await client.get("/api/library/events/", {"books": f"{self.book.pk}"},
+                                    headers={"Authorization": f"Bearer {self.token}"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b"event: ready"))
+
+        get_bus().publish([([book_key(self.book.pk)], {"event": "availability", "data": {"id": self.book.pk}})])
+        self.assertEqual(await anext(stream), f'event: availability\ndata: {{"id": {self.book.pk}}}\n\n'.encode())
+        with override_settings(SSE_HEARTBEAT_INTERVAL=0.01):
+            self.assertEqual(await anext(stream), b": heartbeat\n\n")
+
+        # Отключение клиента: ASGI-обработчик отменяет задачу ответа
+        task = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertFalse(get_bus().has_subscribers([book_key(self.book.pk)]))
+
+
+# CATALOG IMPORT TESTS
+
+class CatalogImportTest(TestCase):
+    CSV = (
+        "title,author_first_name,author_last_name,genre,total_copies\n"
+        "Война и мир,Лев,Толстой,Роман,3\n"
+        "Анна Каренина,Лев,Толстой,Роман,2\n"
+        "Animal Farm,George,Orwell,Сатира,1\n"
+        ",,,,1\n"
+    )
+
+    def run_import(self, content, batch_size=2):
+        import io
+        from library.importer import CatalogImporter, iter_csv
+
+        return CatalogImporter(batch_size=batch_size).run(iter_csv(io.StringIO(content)))
+
+    def test_import_creates_books_and_deduplicates_authors(self):
+        report = self.run_import(self.CSV)
+        self.assertEqual(report["created"], 3)
+        self.assertEqual(report["authors_created"], 2)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(Author.objects.count(), 2)
+        book = Book.objects.get(title="Война и мир")
+        self.assertEqual((book.author.last_name, book.available_copies), ("Толстой", 3))
+
+    def test_bad_jsonl_lines_are_reported_with_line_numbers(self):
+        import io
+        from library.importer import CatalogImporter, iter_jsonl
+
+        content = (
+            '{"title": "Dune", "author_last_name": "Herbert"}\n'
+            '\n'
+            '[1, 2]\n'
+            '{"title": "Broken"\n'
+            '{"title": 1984, "author_last_name": "Orwell"}\n'
+        )
+        report = CatalogImporter(batch_size=2).run(iter_jsonl(io.StringIO(content)))
+        self.assertEqual((report["created"], report["failed"]), (2, 2))
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 4])
+        self.assertTrue(Book.objects.filter(title="1984").exists())
+        self.assertEqual(self.run_import(self.CSV)["errors"], [{"line": 5, "detail": "Не указано название книги."}])
+
+    def test_total_copies_zero_and_out_of_range(self):
+        import io
+        from library.importer import CatalogImporter, iter_jsonl
+
+        content = (
+            '{"title": "Zero", "author_last_name": "A", "total_copies": 0}\n'
+            '{"title": "Default", "author_last_name": "A", "total_copies": ""}\n'
+            '{"title": "Huge", "author_last_name": "A", "total_copies": 100000000000000000000}\n'
+            '{"title": "Words", "author_last_name": "A", "total_copies": "много"}\n'
+        )
+        report = CatalogImporter().run(iter_jsonl(io.StringIO(content)))
+        self.assertEqual((report["created"], report["failed"]), (2, 2))
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 4])
+        self.assertEqual(dict(Book.objects.values_list("title", "total_copies")), {"Zero": 0, "Default": 1})
+        # CSV "0" и JSONL 0 читаются одинаково
+        self.run_import("title,author_last_name,total_copies\nZero,A,0\n")
+        self.assertEqual(Book.objects.get(title="Zero").total_copies, 0)
+
+    def test_reimport_upserts_and_keeps_loans(self):
+        self.run_import(self.CSV)
+        book = Book.objects.get(title="Война и мир")
+        user = User.objects.create_user(email="loan@example.com", password="pass1234")
+        from library.checkout import checkout
+        checkout(user, book)
+
+        report = self.run_import(self.CSV.replace("Роман,3", "Эпопея,5"))
+        self.assertEqual(report.get("created", 0), 0)
+        self.assertEqual(report["updated"], 3)
+        self.assertEqual(Book.objects.count(), 3)
+        book.refresh_from_db()
+        self.assertEqual((book.genre, book.total_copies, book.available_copies), ("Эпопея", 5, 4))
+
+    def test_admin_upload_endpoint(self):
+        from django.contrib.auth.models import Group
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        admin = User.objects.create_user(email="import.admin@example.com", password="admin123")
+        admin.groups.add(Group.objects.create(name="Administrator"))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        jsonl = '{"title": "Dune", "author_first_name": "Frank", "author_last_name": "Herbert", "total_copies": 2}\n'
+        upload = SimpleUploadedFile("catalog.jsonl", jsonl.encode())
+        response = client.post("/api/library/admin_books/import_catalog/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["created"], 1)
+        # Книга сразу находится поиском
+        self.assertEqual(client.get("/api/library/books/", {"search": "dune"}).json()["count"], 1)
+
+
+# EXPORT TESTS
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="export.admin@example.com", password="admin123")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+        author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=author, genre="Роман", total_copies=3)
+        Book.objects.create(title="Dune", genre="Фантастика")
+        self.reader = User.objects.create_user(email="export.reader@example.com", password="p")
+        Borrow.objects.create(user=self.reader, book=self.book, due_date=timezone.now().date() - timedelta(days=1))
+        Borrow.objects.create(user=self.admin, book=self.book)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_borrows_ndjson_uses_effective_status_filter(self):
+        import json
+
+        response = self.client.get("/api/library/export/borrows/", {"status": "overdue"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]["user_email"], rows[0]["status"]), ("export.reader@example.com", "overdue"))
+
+    def test_borrows_status_uses_current_date(self):
+        import json
+        from unittest import mock
+
+        later = timezone.now() + timedelta(days=30)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            response = self.client.get("/api/library/export/borrows/")
+            rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual({row["status"] for row in rows}, {"overdue"})
+
+    def test_books_csv_with_filter(self):
+        import csv
+        import io
+
+        response = self.client.get("/api/library/export/books/", {"file_format": "csv", "genre": "Роман"})
+        self.assertIn('filename="books.csv"', response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual([row["title"] for row in rows], ["Война и мир"])
+        self.assertEqual(rows[0]["author_last_name"], "Толстой")
+
+    def test_unknown_format_and_permissions(self):
+        response = self.client.get("/api/library/export/book_requests/", {"file_format": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(self.client.get("/api/library/export/book_requests/").status_code, 403)
+
+
+# CATALOG CACHE TESTS
+
+class CatalogCacheTest(TestCase):
+
+    def setUp(self):
+        from library.cache import catalog_cache
+
+        catalog_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="cache.reader@example.com", password="p")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=self.author, total_copies=2)
+
+    def get_books(self, params=None):
+        return self.client.get("/api/library/books/", params or {})
+
+    def test_hit_after_miss_with_normalized_params(self):
+        from library.cache import cache_stats
+
+        self.assertEqual(self.get_books({"title": "Война", "page_size": 5})["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.get_books({"page_size": 5, "title": "Война", "genre": ""})
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(cache_stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_checkout_invalidates_available_copies(self):
+        from library.checkout import checkout, return_borrow
+
+        self.assertEqual(self.get_books().json()["results"][0]["available_copies"], 2)
+        borrow = checkout(self.user, self.book)
+        response = self.get_books()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["available_copies"], 1)
+        return_borrow(borrow)
+        self.assertEqual(self.get_books().json()["results"][0]["available_copies"], 2)
+
+    def test_author_change_invalidates_authors_list(self):
+        self.client.get("/api/library/authors/")
+        self.author.last_name = "Толстой-младший"
+        self.author.save()
+        response = self.client.get("/api/library/authors/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["last_name"], "Толстой-младший")
+
+
+# CONDITIONAL GET TESTS
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        from library.cache import catalog_cache
+
+        catalog_cache().clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="etag.admin@example.com", password="admin123")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.reader = User.objects.create_user(email="etag.reader@example.com", password="p")
+        self.client.force_authenticate(user=self.reader)
+        self.author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=self.author, total_copies=2)
+
+    def assertNotModified(self, path, etag, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_books_list_304_until_checkout(self):
+        from library.checkout import checkout
+
+        response = self.client.get("/api/library/books/")
+        etag = response["ETag"]
+        self.assertNotIn("Last-Modified", response)
+        # Из кэша каталога — без обращений к БД
+        self.assertNotModified("/api/library/books/", etag, 0)
+
+        checkout(self.admin, self.book)
+        response = self.client.get("/api/library/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_ignores_if_modified_since_after_delete(self):
+        from django.utils.http import http_date
+
+        other = Book.objects.create(title="Анна Каренина", author=self.author)
+        self.client.force_authenticate(user=self.admin)
+        since = http_date(timezone.now().timestamp() + 60)
+        other.delete()
+        response = self.client.get("/api/library/admin_books/", HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        detail = self.client.get(f"/api/library/admin_books/{self.book.pk}/")
+        self.assertIn("Last-Modified", detail)
+
+    def test_book_detail_and_update_path(self):
+        self.client.force_authenticate(user=self.admin)
+        path = f"/api/library/admin_books/{self.book.pk}/"
+        etag = self.client.get(path)["ETag"]
+        # Проба (роли администратора уже на объекте) — один запрос, без выборки и сериализации
+        self.assertNotModified(path, etag, 1)
+        self.client.patch(path, {"genre": "Роман"}, format="json")
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_borrows_etag_tracks_return_and_overdue_sweep(self):
+        from library.checkout import checkout, return_borrow
+        from library.overdue import mark_overdue_borrows
+
+        borrow = checkout(self.reader, self.book)
+        etag = self.client.get("/api/library/borrows/")["ETag"]
+        self.assertNotModified("/api/library/borrows/", etag, 1)
+
+        Borrow.objects.filter(pk=borrow.pk).update(due_date=timezone.now().date() - timedelta(days=1))
+        Borrow.objects.filter(pk=borrow.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(mark_overdue_borrows(), 1)
+        etag_overdue = self.client.get("/api/library/borrows/", HTTP_IF_NONE_MATCH=etag)["ETag"]
+        self.assertNotEqual(etag_overdue, etag)
+
+        return_borrow(borrow)
+        response = self.client.get("/api/library/borrows/", HTTP_IF_NONE_MATCH=etag_overdue)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["status"], "returned")
+
+    def test_etag_differs_between_users(self):
+        from library.checkout import checkout
+
+        checkout(self.reader, self.book)
+        etag = self.client.get("/api/library/borrows/")["ETag"]
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/library/borrows/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+# FACET TESTS
+
+class FacetTest(TestCase):
+
+    def setUp(self):
+        from library.cache import catalog_cache
+
+        catalog_cache().clear()
+        self.client = APIClient()
+        self.reader = User.objects.create_user(email="facet.reader@example.com", password="p")
+        self.client.force_authenticate(user=self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tolstoy = Author.objects.create(first_name="Лев", last_name="Толстой")
+            self.orwell = Author.objects.create(first_name="George", last_name="Orwell")
+            self.war = Book.objects.create(title="Война и мир", author=self.tolstoy, genre="Роман")
+            self.anna = Book.objects.create(title="Анна Каренина", author=self.tolstoy, genre=" роман ")
+            self.farm = Book.objects.create(title="Animal Farm", author=self.orwell, genre="Сатира")
+
+    def rollup(self, dimension):
+        from library.models import FacetCount
+
+        return {facet.value_id: (facet.books, facet.available) for facet in FacetCount.objects.filter(dimension=dimension)}
+
+    def test_genres_are_normalized(self):
+        self.assertEqual(self.war.genre_ref_id, self.anna.genre_ref_id)
+        self.assertEqual(self.war.genre_ref.name, "Роман")
+
+    def test_rollup_follows_saves_checkouts_and_deletes(self):
+        from library.checkout import checkout
+
+        novel, satire = self.war.genre_ref_id, self.farm.genre_ref_id
+        self.assertEqual(self.rollup("genre"), {novel: (2, 2), satire: (1, 1)})
+        self.assertEqual(self.rollup("author")[self.tolstoy.pk], (2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.reader, self.farm)
+        self.assertEqual(self.rollup("genre")[satire], (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.anna.genre = "Сатира"
+            self.anna.save()
+        self.assertEqual(self.rollup("genre"), {novel: (1, 1), satire: (2, 1)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orwell.delete()
+        self.assertEqual(self.rollup("genre"), {novel: (1, 1), satire: (1, 1)})
+        self.assertNotIn(self.orwell.pk, self.rollup("author"))
+
+    def test_facets_endpoint_rollup_and_filtered(self):
+        data = self.client.get("/api/library/books/facets/").json()
+        self.assertEqual(data["source"], "rollup")
+        self.assertEqual(data["genre"][0], {"id": self.war.genre_ref_id, "count": 2, "available": 2, "name": "Роман"})
+
+        data = self.client.get("/api/library/books/facets/", {"search": "farm"}).json()
+        self.assertEqual(data["source"], "query")
+        self.assertEqual([row["name"] for row in data["author"]], ["George Orwell"])
+
+        response = self.client.get("/api/library/books/", {"genre_id": self.war.genre_ref_id})
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_facets_source_depends_on_request_only(self):
+        from unittest import mock
+
+        from library.views import BookFacetsAPIView
+
+        # Фильтр по умолчанию в базовом queryset не переключает ответ на подсчёт по запросу
+        default = Book.objects.filter(total_copies__gte=0)
+        with mock.patch.object(BookFacetsAPIView, "get_queryset", return_value=default):
+            data = self.client.get("/api/library/books/facets/").json()
+        self.assertEqual(data["source"], "rollup")
+
+        data = self.client.get("/api/library/books/facets/", {"title": ""}).json()
+        self.assertEqual(data["source"], "rollup")
+
+        data = self.client.get("/api/library/books/facets/", {"genre_id": self.farm.genre_ref_id}).json()
+        self.assertEqual(data["source"], "query")
+        self.assertEqual(data["genre"], [{"id": self.farm.genre_ref_id, "count": 1, "available": 1, "name": "Сатира"}])
+
+    def test_import_links_genres_and_refreshes_rollup(self):
+        import io
+        from library.importer import CatalogImporter, iter_csv
+
+        csv_data = "title,author_first_name,author_last_name,genre,total_copies\nAnimal Farm,George,Orwell,РОМАН,1\n"
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogImporter().run(iter_csv(io.StringIO(csv_data)))
+        self.farm.refresh_from_db()
+        self.assertEqual(self.farm.genre_ref_id, self.war.genre_ref_id)
+        self.assertEqual(self.rollup("genre"), {self.war.genre_ref_id: (3, 3)})
+
+    def test_checkout_touches_rollup_only_when_availability_crosses_zero(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from library.checkout import bulk_approve_requests, checkout, return_borrow
+        from library.facets import rebuild_facets
+
+        Book.objects.filter(pk=self.war.pk).update(total_copies=2, available_copies=2)
+        with CaptureQueriesContext(connection) as ctx:
+            checkout(self.reader, self.war)
+        self.assertFalse([q for q in ctx.captured_queries if "facetcount" in q["sql"]])
+
+        other = User.objects.create_user(email="facet.other@example.com", password="p")
+        with CaptureQueriesContext(connection) as ctx:
+            borrow = checkout(other, self.war)
+        self.assertEqual(len([q for q in ctx.captured_queries if "facetcount" in q["sql"]]), 1)
+        self.assertEqual(self.rollup("genre")[self.war.genre_ref_id], (2, 1))
+
+        return_borrow(borrow)
+        request = BookRequest.objects.create(user=other, book=self.farm)
+        bulk_approve_requests([request.pk])
+        self.anna.author = self.orwell
+        self.anna.save()
+        Book.objects.create(title="1984", author=self.orwell, genre="Антиутопия")
+        expected = (self.rollup("genre"), self.rollup("author"))
+        rebuild_facets()
+        self.assertEqual((self.rollup("genre"), self.rollup("author")), expected)
+
+
+# ASYNC VIEWS TESTS
+
+class AsyncViewsTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        from library.cache import catalog_cache
+
+        catalog_cache().clear()
+        self.reader = User.objects.create_user(email="async.reader@example.com", password="p")
+        self.admin = User.objects.create_user(email="async.admin@example.com", password="p")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.books = [Book.objects.create(title=f"Том {i}", author=author, total_copies=2) for i in range(12)]
+        self.own = BookRequest.objects.create(user=self.reader, book=self.books[0])
+        BookRequest.objects.create(user=self.admin, book=self.books[1], status="approved")
+
+    def client_for(self, user):
+        from users.serializers import RoleTokenObtainPairSerializer
+
+        client = APIClient()
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    @override_settings(TRUST_TOKEN_ROLES=True)
+    def test_books_match_sync_view_and_hit_cache(self):
+        client = self.client_for(self.reader)
+        params = {"title": "Том", "ordering": "-title", "page": 2, "page_size": 5}
+        expected = client.get("/api/library/books/", params).json()
+        response = client.get("/api/library/async/books/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        data = response.json()
+        self.assertEqual(data["results"], expected["results"])
+        self.assertEqual(data["count"], 12)
+        self.assertIn("page=3", data["next"])
+        self.assertNotIn("page=", data["previous"])
+
+        with self.assertNumQueries(0):
+            response = client.get("/api/library/async/books/", params)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json(), data)
+
+    def test_catalog_cache_calls_leave_event_loop(self):
+        import asyncio
+        from unittest import mock
+
+        from django.core.cache.backends.locmem import LocMemCache
+
+        on_loop = []
+
+        def spy(method):
+            def wrapper(cache, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(method.__name__)
+                except RuntimeError:
+                    pass
+                return method(cache, *args, **kwargs)
+            return wrapper
+
+        client = self.client_for(self.reader)
+        with mock.patch.multiple(LocMemCache, get=spy(LocMemCache.get), set=spy(LocMemCache.set),
+                                 add=spy(LocMemCache.add), incr=spy(LocMemCache.incr)):
+            for _ in range(2):
+                self.assertEqual(client.get("/api/library/async/authors/").status_code, 200)
+        # При Redis каждое такое обращение — сетевой вызов, блокирующий все соединения воркера
+        self.assertEqual(on_loop, [])
+
+    def test_book_requests_depend_on_role(self):
+        response = self.client_for(self.reader).get("/api/library/async/book_requests/")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.own.pk])
+        response = self.client_for(self.admin).get("/api/library/async/book_requests/")
+        self.assertEqual([row["status"] for row in response.json()["results"]], ["pending"])
+
+    def test_errors(self):
+        self.assertEqual(APIClient().get("/api/library/async/borrows/").status_code, 401)
+        client = self.client_for(self.reader)
+        self.assertEqual(client.get("/api/library/async/borrows/", {"page": 2}).status_code, 404)
+        self.assertEqual(client.get("/api/library/async/books/", {"genre_id": "x"}).status_code, 400)
+
+
+# API SCHEMA TESTS
+
+class ApiSchemaTest(TestCase):
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from pathlib import Path
+        from django.test import override_settings
+        from config import schema
+
+        self.schema = schema
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(API_SCHEMA_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Схема запоминается в памяти процесса
+        schema._schema = None
+        self.addCleanup(setattr, schema, "_schema", None)
+
+    def test_generated_schema_is_served_with_cache_headers(self):
+        content, digest = self.schema.generate_schema()
+        self.assertEqual((self.directory / f"openapi.{digest}.json").read_bytes(), content)
+        self.assertIn("/library/books/", self.client.get("/schema/openapi.json").json()["paths"])
+
+        response = self.client.get("/schema/openapi.json")
+        self.assertEqual(response["ETag"], f'"{digest}"')
+        self.assertIn("max-age=300", response["Cache-Control"])
+        self.assertEqual(self.client.get("/schema/openapi.json", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        hashed = self.client.get(f"/schema/openapi.{digest}.json")
+        self.assertEqual(hashed.content, content)
+        self.assertIn("immutable", hashed["Cache-Control"])
+        self.assertEqual(self.client.get("/schema/openapi.000000000000.json").status_code, 404)
+        self.assertContains(self.client.get("/redoc/"), f"/schema/openapi.{digest}.json")
+
+    def test_export_views_are_not_in_schema(self):
+        content, _ = self.schema.generate_schema()
+        self.assertNotIn(b"/library/export/", content)
+
+    def test_schema_generation_has_no_view_errors(self):
+        with self.assertNoLogs("drf_yasg", "WARNING"):
+            self.schema.generate_schema()
+
+    def test_schema_file_is_used_without_regeneration(self):
+        (self.directory / "openapi.json").write_bytes(b'{"swagger": "2.0", "paths": {}}')
+        response = self.client.get("/schema/openapi.json")
+        self.assertEqual(response.json(), {"swagger": "2.0", "paths": {}})
+
+    def test_debug_is_read_from_environment(self):
+        import os
+        import runpy
+        from unittest import mock
+        from django.conf import settings as django_settings
+
+        def load(**environ):
+            # Без чтения .env: значения задаёт только тест
+            with mock.patch.dict(os.environ, environ), mock.patch("dotenv.load_dotenv"):
+                return runpy.run_path(str(django_settings.BASE_DIR / "config" / "settings.py"))
+
+        settings = load(DEBUG="", ALLOWED_HOSTS="")
+        self.assertFalse(settings["DEBUG"])
+        self.assertEqual(settings["ALLOWED_HOSTS"], ["localhost", "127.0.0.1"])
+        settings = load(DEBUG="1", ALLOWED_HOSTS="library.example.com,localhost")
+        self.assertTrue(settings["DEBUG"])
+        self.assertEqual(settings["ALLOWED_HOSTS"], ["library.example.com", "localhost"])
+
+
+# DATASET GENERATOR AND BENCHMARK TESTS
+
+class LibraryGeneratorTest(TestCase):
+
+    def test_generated_library_is_consistent(self):
+        from collections import Counter
+        from django.db.models import Count, F
+        from library.datagen import LibraryGenerator
+        from library.models import FacetCount
+
+        stats = LibraryGenerator(authors=5, books=40, users=15, borrows=400, requests=20, years=1, seed=7).run()
+        self.assertEqual((stats["books"], stats["users"], stats["borrows"]), (40, 15, 400))
+        self.assertEqual(BookRequest.objects.filter(status="pending").count(), 20)
+
+        active = Borrow.objects.filter(status__in=["borrowed", "overdue"])
+        self.assertEqual(active.count(), stats["active_borrows"])
+        # Остаток соответствует активным выдачам, пары (читатель, книга) не повторяются
+        on_loan = dict(active.values("book").annotate(n=Count("pk")).values_list("book", "n"))
+        for book in Book.objects.all():
+            self.assertEqual(book.total_copies - book.available_copies, on_loan.get(book.pk, 0))
+        self.assertEqual(len(set(active.values_list("user", "book"))), active.count())
+
+        # История уходит в прошлое, популярность книг неравномерна
+        self.assertTrue(Borrow.objects.filter(borrowed_at__lt=timezone.localdate() - timedelta(days=60)).exists())
+        self.assertFalse(Borrow.objects.filter(returned_at__isnull=False, returned_at__lt=F("borrowed_at")).exists())
+        popularity = Counter(Borrow.objects.values_list("book", flat=True)).most_common()
+        self.assertGreater(popularity[0][1], 400 / 40 * 3)
+        self.assertTrue(FacetCount.objects.filter(dimension="genre").exists())
+
+
+class BenchmarkTest(TestCase):
+
+    def test_benchmark_reports_percentiles_queries_and_allocations(self):
+        from library.perf.benchmark import compare, percentile, run_benchmark
+        from library.perf.profiling import ENDPOINTS
+
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 99), 5)
+
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in ("BookListAPIView.list", "BookViewSet.create")]
+        report = run_benchmark(endpoints, repeat=3, warmup=1, cold_cache=True, label="test")
+        self.assertEqual(report["meta"]["label"], "test")
+        for row in report["results"]:
+            self.assertLess(row["status"], 400, row)
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+            self.assertGreater(row["queries"], 0)
+            self.assertIn("alloc_peak_kb", row)
+        # Изменяющий маршрут откатывается после каждого запроса
+        self.assertFalse(Book.objects.filter(title="New Book").exists())
+        self.assertEqual([row["queries_change"] for row in compare(report, report)], [0, 0])
+
+    def test_concurrency_through_asgi_handler(self):
+        from library.perf.benchmark import run_concurrency
+
+        # Без токена: запросы доходят до представлений через ASGI, но не требуют данных в БД
+        routes = (("library:books-list", "library:async-books-list"),)
+        rows = run_concurrency(None, routes=routes, total=6, concurrency=3)
+        self.assertEqual([row["statuses"] for row in rows], [[401], [401]])
+        self.assertTrue(all(row["rps"] > 0 and row["peak_threads"] >= 1 for row in rows))
@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncAuthorListView, AsyncBookListView, AsyncBookRequestListView, AsyncBorrowListView, \
+    EventStreamView
 from .views import AuthorViewSet, BookViewSet, BorrowViewSet, AuthorListAPIView, BookListAPIView, BorrowListAPIView, \
-    BookRequestViewSet
+    BookRequestViewSet, BorrowExportAPIView, BookRequestExportAPIView, BookExportAPIView, \
+    CatalogCacheStatsAPIView, BookFacetsAPIView, UserSummaryAPIView, BookAvailabilityAPIView
 
 app_name = "library"
 
@@ -17,5 +20,19 @@ urlpatterns = [
     path('', include(router.urls)),
     path('authors/', AuthorListAPIView.as_view(), name='authors-list'),
     path('books/', BookListAPIView.as_view(), name='books-list'),
+    path('books/facets/', BookFacetsAPIView.as_view(), name='books-facets'),
+    path('books/availability/', BookAvailabilityAPIView.as_view(), name='books-availability'),
     path('borrows/', BorrowListAPIView.as_view(), name='borrows-list'),
+    path('me/summary/', UserSummaryAPIView.as_view(), name='me-summary'),
+    path('catalog_cache/', CatalogCacheStatsAPIView.as_view(), name='catalog-cache-stats'),
+    path('export/borrows/', BorrowExportAPIView.as_view(), name='export-borrows'),
+    path('export/book_requests/', BookRequestExportAPIView.as_view(), name='export-book-requests'),
+    path('export/books/', BookExportAPIView.as_view(), name='export-books'),
+    # Асинхронные версии списков для запуска под ASGI (см. README, «Асинхронные списки»)
+    path('async/authors/', AsyncAuthorListView.as_view(), name='async-authors-list'),
+    path('async/books/', AsyncBookListView.as_view(), name='async-books-list'),
+    path('async/borrows/', AsyncBorrowListView.as_view(), name='async-borrows-list'),
+    path('async/book_requests/', AsyncBookRequestListView.as_view(), name='async-book-requests-list'),
+    # Живые изменения наличия и статусов (SSE), только под ASGI
+    path('events/', EventStreamView.as_view(), name='events'),
 ]
@@ -1,38 +1,51 @@
 from rest_framework import viewsets, generics
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from users.permissions import IsAdministrator
+from users.roles import is_administrator
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from .pagination import StandardResultsSetPagination
-from .filters import BookFilter, BorrowFilter
+from .filters import BookFilter, BookRequestFilter, BookSearchFilter, BorrowFilter
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Author, Book, Borrow, BookRequest
+from .cache import CatalogCacheMixin, cache_stats
+from .conditional import ConditionalGetMixin
+from .exports import ExportAPIView
+from .facets import global_facets, queryset_facets
+from .checkout import CheckoutError, bulk_approve_requests, bulk_reject_requests, delete_borrow
+from .importer import CatalogImporter, open_records
+from .summary import get_summary
+from .availability import lookup_availability
+from .models import Author, Book, Borrow, BookRequest, BorrowRecord
 from .serializers import (
     AuthorSerializer, BookSerializer, BookCreateUpdateSerializer,
     BorrowSerializer, BorrowCreateSerializer, BorrowReturnSerializer,
-    BookRequestCreateSerializer, BookRequestApproveSerializer, BookRequestSerializer, BookRequestRejectSerializer
+    BookRequestCreateSerializer, BookRequestApproveSerializer, BookRequestSerializer, BookRequestRejectSerializer,
+    BookRequestBulkSerializer, BookRequestBulkRejectSerializer, CatalogImportSerializer, BookAvailabilitySerializer
 )
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticated, IsAdministrator]
     pagination_class = StandardResultsSetPagination
 
 
-class AuthorListAPIView(generics.ListAPIView):
+class AuthorListAPIView(CatalogCacheMixin, ConditionalGetMixin, generics.ListAPIView):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
 
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, BookSearchFilter, OrderingFilter)
     filterset_class = BookFilter
     search_fields = ("title", "author__last_name", "genre")
     ordering_fields = ("title", "publication_year")
@@ -41,25 +54,87 @@ class BookViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ("create", "update", "partial_update"):
             return BookCreateUpdateSerializer
+        if self.action == "import_catalog":
+            return CatalogImportSerializer
         return BookSerializer
 
     permission_classes = [IsAuthenticated, IsAdministrator]
 
+    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser])
+    def import_catalog(self, request):
+        serializer = CatalogImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        importer = CatalogImporter(batch_size=data["batch_size"])
+        try:
+            with open_records(data["file"], data.get("format")) as records:
+                report = importer.run(records)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+        return Response(report)
+
 
-class BookListAPIView(generics.ListAPIView):
+class BookListAPIView(CatalogCacheMixin, ConditionalGetMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, BookSearchFilter, OrderingFilter)
     filterset_class = BookFilter
-    search_fields = ("title", "author__name", "genre")
+    search_fields = ("title", "author__last_name", "genre")
     ordering_fields = ("title", "created_at")
 
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
 
 
+class BookFacetsAPIView(CatalogCacheMixin, generics.GenericAPIView):
+    """
+    Фасеты «жанр (число книг)» и «автор (число книг)» с числом доступных сейчас.
+    Без параметров запроса — из сводки FacetCount, с фильтрами BookFilter / поиском — по результату фильтра.
+    """
+    # Ответ собирается без сериализатора: в OpenAPI-схему не попадает
+    swagger_schema = None
+    queryset = Book.objects.all()
+    filter_backends = (DjangoFilterBackend, BookSearchFilter)
+    filterset_class = BookFilter
+    search_fields = ("title", "author__last_name", "genre")
+    pagination_class = None
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Сводку выбираем по запросу, а не по итоговому queryset: фильтр базового queryset её не отключает
+        if not any(value for _, values in request.query_params.lists() for value in values):
+            return Response({**global_facets(), "source": "rollup"})
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({**queryset_facets(queryset), "source": "query"})
+
+
+class BookAvailabilityAPIView(APIView):
+    """
+    Наличие экземпляров и ближайший срок возврата для списка книг (OPAC, киоски):
+    GET ?ids=1,2,3 или POST {"ids": [...]}, до AVAILABILITY_MAX_IDS книг за запрос.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        ids = [part for value in request.query_params.getlist("ids") for part in value.split(",") if part]
+        return self.availability({"ids": ids})
+
+    def post(self, request):
+        return self.availability(request.data)
+
+    def availability(self, data):
+        serializer = BookAvailabilitySerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        results, missing = lookup_availability(serializer.validated_data["ids"])
+        return Response({"results": results, "missing": missing})
+
+
 class BorrowViewSet(viewsets.ModelViewSet):
+    # Без ETag: проба MAX(updated_at) по всем выдачам читает таблицу целиком (см. explain_endpoints)
     queryset = Borrow.objects.all()
     permission_classes = [IsAuthenticated, IsAdministrator]
 
@@ -70,11 +145,24 @@ class BorrowViewSet(viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
 
 
+    def get_queryset(self):
+        # Статус вычисляется на текущую дату, поэтому queryset строится на каждый запрос
+        if self.action in ("list", "retrieve"):
+            # Список и карточка включают архивные выдачи; изменяются и возвращаются только выдачи из Borrow
+            return BorrowRecord.objects.select_related("user", "book").with_effective_status()
+        return Borrow.objects.select_related("user", "book").with_effective_status()
+
     def get_serializer_class(self):
         if self.action == "create":
             return BorrowCreateSerializer
         return BorrowSerializer
 
+    def perform_destroy(self, instance):
+        try:
+            delete_borrow(instance)
+        except CheckoutError as exc:
+            raise ValidationError(str(exc))
+
     @action(detail=True, methods=["post"])
     def return_borrow(self, request, pk=None):
         borrow = self.get_object()
@@ -84,13 +172,17 @@ class BorrowViewSet(viewsets.ModelViewSet):
         return Response({"detail": "Книга успешно возвращена!"})
 
 
-class BorrowListAPIView(generics.ListAPIView):
+class BorrowListAPIView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = BorrowSerializer
+    conditional_related = ("book",)
+    conditional_daily = True
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
-        return Borrow.objects.filter(user=self.request.user)
+        return (
+            BorrowRecord.objects.filter(user=self.request.user).select_related("user", "book").with_effective_status()
+        )
 
 
 class BookRequestViewSet(viewsets.ModelViewSet):
@@ -103,13 +195,21 @@ class BookRequestViewSet(viewsets.ModelViewSet):
             return BookRequestCreateSerializer
         if self.action == "approve":
             return BookRequestApproveSerializer
+        if self.action == "bulk_approve":
+            return BookRequestBulkSerializer
+        if self.action == "bulk_reject":
+            return BookRequestBulkRejectSerializer
         return BookRequestSerializer
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            # Генерация схемы (config/schema.py) идёт без запроса
+            return BookRequest.objects.none()
         user = self.request.user
-        if user.groups.filter(name="Administrator").exists():
-            return BookRequest.objects.filter(status="pending")
-        return BookRequest.objects.filter(user=user)
+        queryset = BookRequest.objects.select_related("user", "book")
+        if is_administrator(user):
+            return queryset.filter(status="pending")
+        return queryset.filter(user=user)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsAdministrator])
     def approve(self, request, pk=None):
@@ -126,3 +226,87 @@ class BookRequestViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response({"detail": "Заявка отклонена!"})
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsAdministrator])
+    def bulk_approve(self, request):
+        serializer = BookRequestBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        approved, failed = bulk_approve_requests(serializer.get_request_ids())
+        return Response(self.bulk_result(approved, failed))
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsAdministrator])
+    def bulk_reject(self, request):
+        serializer = BookRequestBulkRejectSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rejected, failed = bulk_reject_requests(
+            serializer.get_request_ids(), serializer.validated_data["reject_reason"]
+        )
+        return Response(self.bulk_result(rejected, failed))
+
+    @staticmethod
+    def bulk_result(processed, failed):
+        return {
+            "processed": processed,
+            "failed": [{"id": request_id, "detail": detail} for request_id, detail in failed.items()],
+        }
+
+
+class UserSummaryAPIView(APIView):
+    """
+    Сводка текущего пользователя: активные и просроченные выдачи, заявки в ожидании,
+    ближайший срок возврата и ближайшие по сроку выдачи.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_summary(request.user))
+
+
+class CatalogCacheStatsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdministrator]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class BorrowExportAPIView(ExportAPIView):
+    queryset = BorrowRecord.objects.all()
+    permission_classes = [IsAuthenticated, IsAdministrator]
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = BorrowFilter
+    filename = "borrows"
+    columns = (
+        ("id", "id"), ("user_id", "user_id"), ("user_email", "user__email"), ("book_id", "book_id"),
+        ("book_title", "book__title"), ("borrowed_at", "borrowed_at"), ("due_date", "due_date"),
+        ("returned_at", "returned_at"), ("status", "effective_status"),
+    )
+
+    def get_queryset(self):
+        # Статус вычисляется на текущую дату, поэтому queryset строится на каждый запрос
+        return BorrowRecord.objects.with_effective_status()
+
+
+class BookRequestExportAPIView(ExportAPIView):
+    queryset = BookRequest.objects.all()
+    permission_classes = [IsAuthenticated, IsAdministrator]
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = BookRequestFilter
+    filename = "book_requests"
+    columns = (
+        ("id", "id"), ("user_id", "user_id"), ("user_email", "user__email"), ("book_id", "book_id"),
+        ("book_title", "book__title"), ("desired_due_date", "desired_due_date"), ("status", "status"),
+        ("reject_reason", "reject_reason"), ("created_at", "created_at"),
+    )
+
+
+class BookExportAPIView(ExportAPIView):
+    queryset = Book.objects.all()
+    permission_classes = [IsAuthenticated, IsAdministrator]
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = BookFilter
+    filename = "books"
+    columns = (
+        ("id", "id"), ("title", "title"), ("author_id", "author_id"), ("author_first_name", "author__first_name"),
+        ("author_last_name", "author__last_name"), ("genre", "genre"), ("description", "description"),
+        ("total_copies", "total_copies"), ("available_copies", "available_copies"), ("created_at", "created_at"),
+    )
@@ -0,0 +1,44 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from monitoring.models import SlowQuery
+from monitoring.slow_queries import slow_log
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'duration_ms', 'view', 'method', 'path', 'short_sql')
+    list_filter = ('view', 'method')
+    search_fields = ('sql', 'view', 'path')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+    change_list_template = "admin/monitoring/slowquery/change_list.html"
+
+    @admin.display(description="SQL")
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('recent/', self.admin_site.admin_view(self.recent_view), name='monitoring_slowquery_recent'),
+        ]
+        return urls + super().get_urls()
+
+    def recent_view(self, request):
+        """
+        Последние медленные запросы из памяти этого процесса (без SLOW_QUERY_PERSIST тоже).
+        """
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Медленные запросы (память процесса)",
+            "entries": slow_log.recent(),
+        }
+        return TemplateResponse(request, "admin/monitoring/slowquery/recent.html", context)
@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+MIDDLEWARE = "monitoring.middleware.RequestMetricsMiddleware"
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        commenter = getattr(settings, "SQL_COMMENTER_ENABLED", False)
+        # Без middleware у запросов нет контекста и комментарии молча не добавлялись бы
+        if commenter and MIDDLEWARE not in settings.MIDDLEWARE:
+            raise ImproperlyConfigured(f"SQL_COMMENTER_ENABLED требует {MIDDLEWARE} в MIDDLEWARE.")
+        if getattr(settings, "MONITORING_ENABLED", False):
+            from monitoring.instrumentation import install
+            install()
+        elif commenter:
+            from monitoring.instrumentation import install_commenter
+            install_commenter()
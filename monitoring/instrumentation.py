@@ -0,0 +1,149 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from monitoring.slow_queries import capture_slow_query
+
+# Статистика текущего запроса; contextvars переносятся через sync_to_async/async_to_sync,
+# поэтому запросы async ORM из потока тоже попадают в свой запрос
+current_request = ContextVar("monitoring_request", default=None)
+
+_installed = False
+
+
+@dataclass
+class RequestStats:
+    method: str = ""
+    path: str = ""
+    request_id: str = ""
+    view: str = "unresolved"
+    controller: str = ""
+    action: str = ""
+    route: str = ""
+    db_time: float = 0.0
+    queries: int = 0
+    serializer_time: float = 0.0
+    # Медленные запросы для сохранения в БД после ответа (SLOW_QUERY_PERSIST)
+    slow_queries: list = field(default_factory=list)
+    # Комментарий sqlcommenter: (как есть, с экранированным % для запросов с параметрами)
+    sql_comment: tuple = None
+
+    def resolve(self, request):
+        """
+        Обработчик запроса (после разрешения URL): для меток, журнала медленных запросов и комментариев SQL.
+        """
+        self.controller, self.action = view_parts(request)
+        self.view = f"{self.controller}.{self.action}" if self.action else self.controller
+        match = getattr(request, "resolver_match", None)
+        self.route = match.route if match is not None else ""
+        self.sql_comment = None
+
+
+def observe_query(execute, sql, params, many, context):
+    """
+    Время каждого SQL-запроса: в статистику текущего запроса и, если оно выше
+    SLOW_QUERY_THRESHOLD_MS, в журнал медленных запросов (и вне запросов — в командах и т.п.).
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_time += duration
+            stats.queries += 1
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold and duration * 1000 >= threshold:
+            capture_slow_query(sql, params, many, duration, stats)
+
+
+def add_execute_wrapper(connection, wrapper):
+    """
+    Постоянная обёртка выполнения SQL для соединения (execute_wrapper без контекстного менеджера):
+    ставится один раз при открытии соединения и работает в любом потоке.
+    """
+    if wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(wrapper)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    add_execute_wrapper(connection, observe_query)
+
+
+def timed_data(data):
+    """
+    Свойство serializer.data с замером времени. Вложенные сериализаторы вызывают
+    to_representation, а не data, поэтому время учитывается один раз.
+    """
+    getter = data.fget
+
+    def wrapper(self):
+        stats = current_request.get()
+        if stats is None:
+            return getter(self)
+        started = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+
+    return property(wrapper)
+
+
+def install_sql_commenter(sender, connection, **kwargs):
+    from monitoring.sqlcomment import add_sql_comment
+
+    add_execute_wrapper(connection, add_sql_comment)
+
+
+def install_commenter():
+    """
+    Подключает комментарии sqlcommenter к каждому новому соединению. Работает и без остальных замеров
+    (MONITORING_ENABLED=0, SQL_COMMENTER_ENABLED=1): контекст запроса ставит RequestMetricsMiddleware.
+    """
+    connection_created.connect(install_sql_commenter, dispatch_uid="monitoring.sql_commenter")
+
+
+def install():
+    """
+    Подключает замеры SQL и комментарии sqlcommenter (к каждому новому соединению)
+    и замер сериализации (BaseSerializer.data).
+    """
+    global _installed
+    from rest_framework.serializers import BaseSerializer
+
+    if _installed:
+        return
+    _installed = True
+    # Порядок важен: замер времени снаружи, комментарий — ближе к драйверу
+    connection_created.connect(install_query_timer, dispatch_uid="monitoring.query_timer")
+    install_commenter()
+    BaseSerializer.data = timed_data(BaseSerializer.data)
+
+
+def view_parts(request):
+    """
+    (класс, действие) обработчика: ('BookViewSet', 'list'), ('BookRequestViewSet', 'approve'),
+    ('BookListAPIView', 'get'); для функций — (имя функции, '').
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved", ""
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if view_class is None:
+        return getattr(func, "__name__", "unknown"), ""
+    method = request.method.lower()
+    return view_class.__name__, (getattr(func, "actions", None) or {}).get(method, method)
+
+
+def view_name(request):
+    """
+    Имя обработчика для меток: 'BookViewSet.list', 'BookRequestViewSet.approve', 'BookListAPIView.get'.
+    """
+    controller, action = view_parts(request)
+    return f"{controller}.{action}" if action else controller
@@ -0,0 +1,87 @@
+import threading
+from bisect import bisect_left
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+
+class Histogram:
+    """
+    Гистограмма в памяти процесса (как histogram в Prometheus): счётчики по корзинам,
+    сумма и число наблюдений для каждого набора меток.
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in series:
+            base = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket = ",".join([*base, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket}}} {cumulative}")
+            selector = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{selector} {total}")
+            lines.append(f"{self.name}_count{selector} {cumulative}")
+        return lines
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REQUEST_DURATION = Histogram(
+    "library_request_duration_seconds", "Полное время обработки запроса.", ("view", "method", "status"),
+    SECONDS_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "library_request_db_seconds", "Время SQL-запросов за запрос.", ("view",), SECONDS_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "library_request_queries", "Число SQL-запросов за запрос.", ("view",), QUERY_BUCKETS,
+)
+REQUEST_SERIALIZER_TIME = Histogram(
+    "library_request_serializer_seconds", "Время сериализации (serializer.data) за запрос.", ("view",),
+    SECONDS_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "library_response_size_bytes", "Размер тела ответа (кроме потоковых).", ("view",), SIZE_BUCKETS,
+)
+
+REGISTRY = (REQUEST_DURATION, REQUEST_DB_TIME, REQUEST_QUERIES, REQUEST_SERIALIZER_TIME, RESPONSE_SIZE)
+
+
+def render_metrics(registry=REGISTRY):
+    """
+    Текстовый формат экспозиции Prometheus (version 0.0.4).
+    """
+    return "\n".join(line for histogram in registry for line in histogram.render()) + "\n"
+
+
+def reset_metrics(registry=REGISTRY):
+    for histogram in registry:
+        histogram.clear()
@@ -0,0 +1,100 @@
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from monitoring.instrumentation import RequestStats, current_request, view_name
+from monitoring.metrics import (
+    REQUEST_DB_TIME, REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SERIALIZER_TIME, RESPONSE_SIZE,
+)
+from monitoring.slow_queries import persist_slow_queries
+
+REQUEST_ID_RE = re.compile(r"^[\w.-]{1,64}$")
+
+
+def request_id(request):
+    """
+    X-Request-ID от прокси/клиента, если он корректен, иначе новый.
+    """
+    incoming = request.headers.get("X-Request-ID", "")
+    return incoming if REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+
+class RequestMetricsMiddleware:
+    """
+    Для каждого запроса: полное время, время и число SQL-запросов, время сериализации и размер ответа.
+    Значения попадают в гистограммы (monitoring.metrics, /metrics) и в заголовок Server-Timing.
+    Ставится первым в MIDDLEWARE, чтобы учитывать время остальных middleware.
+    При MONITORING_ENABLED=0 и SQL_COMMENTER_ENABLED=1 только задаёт контекст запроса для комментариев SQL
+    и X-Request-ID, без замеров.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.metrics = getattr(settings, "MONITORING_ENABLED", False)
+        if not self.metrics and not getattr(settings, "SQL_COMMENTER_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "MONITORING_SERVER_TIMING", True)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        response = self.finish(request, response, stats, started)
+        if stats.slow_queries:
+            persist_slow_queries(stats.slow_queries)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        response = self.finish(request, response, stats, started)
+        if stats.slow_queries:
+            await sync_to_async(persist_slow_queries)(stats.slow_queries)
+        return response
+
+    @staticmethod
+    def start(request):
+        stats = RequestStats(method=request.method, path=request.path, request_id=request_id(request))
+        return stats, current_request.set(stats), time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Обработчик известен до его вызова: медленные запросы приписываются ему
+        stats = current_request.get()
+        if stats is not None:
+            stats.resolve(request)
+
+    def finish(self, request, response, stats, started):
+        response["X-Request-ID"] = stats.request_id
+        if not self.metrics:
+            return response
+        elapsed = time.perf_counter() - started
+        view = stats.view if stats.view != "unresolved" else view_name(request)
+        REQUEST_DURATION.observe(elapsed, view, request.method, str(response.status_code))
+        REQUEST_DB_TIME.observe(stats.db_time, view)
+        REQUEST_QUERIES.observe(stats.queries, view)
+        REQUEST_SERIALIZER_TIME.observe(stats.serializer_time, view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view)
+
+        if self.server_timing:
+            response["Server-Timing"] = (
+                f'app;dur={elapsed * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f"serializer;dur={stats.serializer_time * 1000:.1f}"
+            )
+        return response
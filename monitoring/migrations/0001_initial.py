@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Время')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params_shape', models.CharField(blank=True, max_length=255, verbose_name='Параметры (типы)')),
+                ('view', models.CharField(blank=True, db_index=True, max_length=200, verbose_name='Обработчик')),
+                ('method', models.CharField(blank=True, max_length=10, verbose_name='HTTP-метод')),
+                ('path', models.CharField(blank=True, max_length=500, verbose_name='Путь')),
+                ('stack', models.TextField(blank=True, verbose_name='Стек')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """
+    Медленный SQL-запрос (SLOW_QUERY_PERSIST): текст, типы параметров, обработчик и стек вызова.
+    """
+    created_at = models.DateTimeField(db_index=True, verbose_name="Время")
+    duration_ms = models.FloatField(verbose_name="Длительность, мс")
+    sql = models.TextField(verbose_name="SQL")
+    params_shape = models.CharField(max_length=255, blank=True, verbose_name="Параметры (типы)")
+    view = models.CharField(max_length=200, blank=True, db_index=True, verbose_name="Обработчик")
+    method = models.CharField(max_length=10, blank=True, verbose_name="HTTP-метод")
+    path = models.CharField(max_length=500, blank=True, verbose_name="Путь")
+    stack = models.TextField(blank=True, verbose_name="Стек")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+
+    def __str__(self):
+        return f"{self.view or '—'}: {self.duration_ms} мс"
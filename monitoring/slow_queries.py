@@ -0,0 +1,112 @@
+import logging
+import threading
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_SQL_LENGTH = 10000
+MAX_SHAPE_ITEMS = 20
+
+# Сохранение журнала само выполняет SQL: эти запросы не перехватываются
+_capturing = ContextVar("monitoring_slow_capture", default=True)
+
+
+class SlowQueryLog:
+    """
+    Кольцевой буфер последних медленных запросов процесса (старые вытесняются).
+    """
+
+    def __init__(self, maxlen):
+        self._entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def recent(self, limit=None):
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_log = SlowQueryLog(getattr(settings, "SLOW_QUERY_BUFFER_SIZE", 500))
+
+
+def params_shape(params, many):
+    """
+    Типы параметров без значений (в них могут быть персональные данные): '(int, str, datetime)'.
+    """
+    if many:
+        return f"executemany[{len(params)}]" if hasattr(params, "__len__") else "executemany"
+    if params is None:
+        return ""
+    if isinstance(params, dict):
+        items = [f"{name}: {type(value).__name__}" for name, value in params.items()]
+        return "{" + ", ".join(items) + "}"
+    types = [type(value).__name__ for value in params]
+    if len(types) > MAX_SHAPE_ITEMS:
+        types = [*types[:MAX_SHAPE_ITEMS], f"…+{len(types) - MAX_SHAPE_ITEMS}"]
+    return "(" + ", ".join(types) + ")"
+
+
+def project_stack(depth):
+    """
+    Последние depth кадров стека из кода проекта (без библиотек и самого monitoring).
+    """
+    root = str(settings.BASE_DIR)
+    own = str(Path(__file__).parent)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root) and not frame.filename.startswith(own)
+        and "site-packages" not in frame.filename
+    ]
+    return "\n".join(
+        f"{Path(frame.filename).relative_to(root)}:{frame.lineno} in {frame.name}" for frame in frames[-depth:]
+    )
+
+
+def capture_slow_query(sql, params, many, duration, stats):
+    if not _capturing.get():
+        return
+    entry = {
+        "created_at": timezone.now(),
+        "duration_ms": round(duration * 1000, 2),
+        "sql": sql[:MAX_SQL_LENGTH],
+        "params_shape": params_shape(params, many)[:255],
+        "view": stats.view if stats is not None else "",
+        "method": stats.method if stats is not None else "",
+        "path": stats.path[:500] if stats is not None else "",
+        "stack": project_stack(getattr(settings, "SLOW_QUERY_STACK_DEPTH", 8)),
+    }
+    slow_log.add(entry)
+    if stats is not None and getattr(settings, "SLOW_QUERY_PERSIST", False):
+        stats.slow_queries.append(entry)
+
+
+def persist_slow_queries(entries):
+    """
+    Сохраняет медленные запросы в SlowQuery. Вызывается после ответа; ошибка записи не ломает запрос.
+    """
+    from monitoring.models import SlowQuery
+
+    token = _capturing.set(False)
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.bulk_create([SlowQuery(**entry) for entry in entries])
+    except DatabaseError:
+        logger.exception("Не удалось сохранить медленные запросы")
+    finally:
+        _capturing.reset(token)
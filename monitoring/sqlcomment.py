@@ -0,0 +1,43 @@
+from urllib.parse import quote
+
+from django.conf import settings
+
+from monitoring.instrumentation import current_request
+
+
+def format_comment(tags):
+    """
+    Комментарий в формате sqlcommenter: ключи по алфавиту, значения URL-кодированы и в кавычках
+    ('/*action='list',controller='BookViewSet'*/'). Кодирование исключает кавычки и '*/' в значениях.
+    """
+    pairs = [f"{key}='{quote(str(value), safe='')}'" for key, value in sorted(tags.items()) if value]
+    return f"/*{','.join(pairs)}*/" if pairs else ""
+
+
+def request_comment(stats):
+    tags = {
+        "controller": stats.controller,
+        "action": stats.action,
+        "route": stats.route,
+        "http_method": stats.method,
+    }
+    # Уникальный на каждый запрос текст мешает кэшу подготовленных выражений (psycopg 3, prepare_threshold)
+    if settings.SQL_COMMENTER_REQUEST_ID:
+        tags["request_id"] = stats.request_id
+    comment = format_comment(tags)
+    # С параметрами драйвер подставляет их через %-форматирование: % в комментарии удваивается
+    return comment, comment.replace("%", "%%")
+
+
+def add_sql_comment(execute, sql, params, many, context):
+    """
+    Добавляет к SQL комментарий с обработчиком, действием DRF, методом и id запроса,
+    чтобы в pg_stat_statements и логах БД было видно источник запроса.
+    """
+    stats = current_request.get()
+    if stats is None or not settings.SQL_COMMENTER_ENABLED:
+        return execute(sql, params, many, context)
+    if stats.sql_comment is None:
+        stats.sql_comment = request_comment(stats)
+    comment = stats.sql_comment[0 if params is None and not many else 1]
+    return execute(f"{sql} {comment}" if comment else sql, params, many, context)
@@ -0,0 +1,193 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from library.models import Author, Book, BookRequest
+from monitoring.metrics import REQUEST_DURATION, Histogram, reset_metrics
+
+User = get_user_model()
+
+
+# METRICS TESTS
+
+class HistogramTest(TestCase):
+
+    def test_prometheus_text_format(self):
+        histogram = Histogram("test_seconds", "Тест.", ("view",), (0.1, 1))
+        histogram.observe(0.05, "A")
+        histogram.observe(0.5, "A")
+        histogram.observe(5, "A")
+        self.assertEqual(histogram.render(), [
+            "# HELP test_seconds Тест.",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{view="A",le="0.1"} 1',
+            'test_seconds_bucket{view="A",le="1"} 2',
+            'test_seconds_bucket{view="A",le="+Inf"} 3',
+            'test_seconds_sum{view="A"} 5.55',
+            'test_seconds_count{view="A"} 3',
+        ])
+
+
+# MIDDLEWARE TESTS
+
+@override_settings(METRICS_TOKEN="secret")
+class RequestMetricsTest(TestCase):
+
+    def setUp(self):
+        reset_metrics()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="metrics.admin@example.com", password="p")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+        author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=author, total_copies=2)
+
+    def series(self, histogram):
+        return {labels: counts for labels, (counts, _) in histogram._series.items()}
+
+    def test_server_timing_and_view_labels(self):
+        response = self.client.get("/api/library/admin_books/")
+        self.assertRegex(response["Server-Timing"],
+                         r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serializer;dur=')
+
+        reader = User.objects.create_user(email="metrics.reader@example.com", password="p")
+        request = BookRequest.objects.create(user=reader, book=self.book)
+        self.client.post(f"/api/library/book_requests/{request.pk}/approve/", {}, format="json")
+
+        self.assertEqual(
+            {labels[0] for labels in self.series(REQUEST_DURATION)},
+            {"BookViewSet.list", "BookRequestViewSet.approve"},
+        )
+
+    def test_metrics_endpoint_requires_token(self):
+        self.client.get("/api/library/admin_books/")
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('library_request_duration_seconds_count{view="BookViewSet.list",method="GET",status="200"} 1',
+                      body)
+        self.assertIn('library_request_queries_count{view="BookViewSet.list"} 1', body)
+
+
+# SLOW QUERY TESTS
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+class SlowQueryTest(TestCase):
+
+    def setUp(self):
+        from monitoring.slow_queries import slow_log
+
+        self.slow_log = slow_log
+        slow_log.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="slow.admin@example.com", password="p")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+
+    def test_captures_view_params_shape_and_stack(self):
+        response = self.client.get("/api/users/", {"search": "secret@example.com"})
+        self.assertEqual(response.status_code, 200)
+        entries = [entry for entry in self.slow_log.recent() if entry["view"] == "UserViewSet.list"]
+        self.assertTrue(entries)
+        entry = entries[0]
+        self.assertEqual((entry["method"], entry["path"]), ("GET", "/api/users/"))
+        self.assertNotIn("secret", "".join(e["params_shape"] for e in entries))
+        self.assertTrue(all(line.split(":")[0].endswith(".py") for line in entry["stack"].splitlines()))
+
+    def test_persist_and_admin_views(self):
+        from django.urls import reverse
+        from monitoring.models import SlowQuery
+
+        with override_settings(SLOW_QUERY_PERSIST=True):
+            self.client.get("/api/library/admin_borrows/")
+        rows = SlowQuery.objects.filter(view="BorrowViewSet.list")
+        self.assertTrue(rows.exists())
+        # Запись журнала в таблицу сама не перехватывается
+        self.assertFalse(SlowQuery.objects.filter(sql__contains="monitoring_slowquery").exists())
+
+        superuser = User.objects.create_superuser(email="slow.root@example.com", password="p")
+        self.client.force_login(superuser)
+        self.assertContains(self.client.get(reverse("admin:monitoring_slowquery_recent")), "BorrowViewSet.list")
+        self.assertEqual(self.client.get(reverse("admin:monitoring_slowquery_changelist")).status_code, 200)
+
+    def test_params_shape(self):
+        from monitoring.slow_queries import params_shape
+
+        self.assertEqual(params_shape((1, "a", None), False), "(int, str, NoneType)")
+        self.assertEqual(params_shape({"id": 1}, False), "{id: int}")
+        self.assertEqual(params_shape([(1,), (2,)], True), "executemany[2]")
+
+
+# SQL COMMENT TESTS
+
+@override_settings(SQL_COMMENTER_ENABLED=True)
+class SqlCommentTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="comment.admin@example.com", password="p")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+        author = Author.objects.create(first_name="Лев", last_name="Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=author, total_copies=2)
+
+    def executed_sql(self, *args, **kwargs):
+        from django.db import connection
+
+        statements = []
+
+        def spy(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(spy):
+            response = self.client.get(*args, **kwargs)
+        return response, statements
+
+    def test_queries_carry_route_and_action(self):
+        response, statements = self.executed_sql("/api/library/admin_books/", HTTP_X_REQUEST_ID="req-42")
+        self.assertEqual(response["X-Request-ID"], "req-42")
+        tagged = [sql for sql in statements if "controller='BookViewSet'" in sql]
+        self.assertTrue(tagged)
+        self.assertTrue(all(sql.endswith(
+            "/*action='list',controller='BookViewSet',http_method='GET',request_id='req-42',"
+            "route='api%%2Flibrary%%2Fadmin_books%%2F%%24'*/"
+        ) for sql in tagged))
+        self.assertEqual(response.status_code, 200)
+
+    def test_format_and_toggles(self):
+        from monitoring.sqlcomment import format_comment
+
+        self.assertEqual(format_comment({"b": "x'*/y", "a": "1", "c": ""}), "/*a='1',b='x%27%2A%2Fy'*/")
+        with override_settings(SQL_COMMENTER_REQUEST_ID=False):
+            _, statements = self.executed_sql("/api/library/admin_books/")
+        self.assertFalse(any("request_id" in sql for sql in statements))
+        with override_settings(SQL_COMMENTER_ENABLED=False):
+            _, statements = self.executed_sql("/api/library/admin_books/")
+        self.assertFalse(any("/*" in sql for sql in statements))
+
+    @override_settings(MONITORING_ENABLED=False)
+    def test_commenter_works_without_monitoring(self):
+        from unittest import mock
+
+        from django.apps import apps
+        from django.core.exceptions import ImproperlyConfigured
+
+        # Middleware собирается заново: без замеров, но с контекстом запроса
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        response, statements = self.executed_sql("/api/library/admin_books/", HTTP_X_REQUEST_ID="req-7")
+        self.assertEqual(response["X-Request-ID"], "req-7")
+        self.assertNotIn("Server-Timing", response)
+        self.assertTrue(any("request_id='req-7'" in sql for sql in statements))
+
+        config = apps.get_app_config("monitoring")
+        with mock.patch("monitoring.instrumentation.install_commenter") as install_commenter:
+            config.ready()
+        install_commenter.assert_called_once_with()
+        with override_settings(MIDDLEWARE=[]), self.assertRaises(ImproperlyConfigured):
+            config.ready()
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from monitoring.metrics import render_metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics(request):
+    """
+    Гистограммы процесса в формате Prometheus. Доступ по заголовку
+    'Authorization: Bearer <METRICS_TOKEN>'; без заданного токена эндпоинт закрыт.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    scheme, _, provided = request.headers.get("Authorization", "").partition(" ")
+    if not token or scheme != "Bearer" or not constant_time_compare(provided, token):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from users.models import User
-from library.models import Author, Book, Borrow, BookRequest
+from library.models import Author, Book, Borrow, BookRequest, OutboxEvent
 
 
 @admin.register(User)
@@ -26,3 +26,9 @@ class Borrow(admin.ModelAdmin):
 @admin.register(BookRequest)
 class BookRequest(admin.ModelAdmin):
     list_display = ('id','user', 'book', 'desired_due_date', 'created_at', 'status')
+
+
+@admin.register(OutboxEvent)
+class OutboxEvent(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'aggregate_id', 'created_at', 'dispatched_at', 'attempts', 'last_error')
+    list_filter = ('topic',)
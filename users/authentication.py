@@ -0,0 +1,76 @@
+import copy
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.roles import achanged_at, changed_at, user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без обращения к БД на горячем пути: пользователь берётся из
+    кэша процесса, а группы — из claim 'roles' токена, если они не менялись после выдачи.
+    Работает только при TRUST_TOKEN_ROLES (общий кэш отметок); иначе — обычная загрузка из БД.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.TRUST_TOKEN_ROLES:
+            return super().get_user(validated_token)
+
+        changed = changed_at(str(user_id))
+        user = self.get_cached_user(validated_token, changed)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(str(user_id), user)
+        return self.with_roles(user, validated_token, changed)
+
+    async def aauthenticate(self, request):
+        """
+        Асинхронный authenticate: проверка токена и кэш пользователей процесса — прямо в цикле событий,
+        отметки об изменениях — через асинхронный API кэша, в поток уходит только загрузка пользователя из БД.
+        """
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and settings.TRUST_TOKEN_ROLES:
+            changed = await achanged_at(str(user_id))
+            user = self.get_cached_user(validated_token, changed)
+            if user is not None:
+                return self.with_roles(user, validated_token, changed), validated_token
+        return await sync_to_async(self.get_user)(validated_token), validated_token
+
+    def get_cached_user(self, validated_token, changed):
+        """
+        Пользователь из кэша процесса или None. К БД не обращается.
+        """
+        user = user_cache.get(str(validated_token.get(api_settings.USER_ID_CLAIM)), newer_than=changed)
+        if user is not None:
+            self.check_user(user, validated_token)
+        return user
+
+    @staticmethod
+    def with_roles(user, validated_token, changed):
+        # Копия, чтобы кэшированный экземпляр не разделял состояние между запросами
+        user = copy.copy(user)
+        roles = validated_token.get("roles")
+        if roles is not None and validated_token.get("roles_at", 0) >= changed:
+            user._roles = frozenset(roles)
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
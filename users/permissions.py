@@ -1,12 +1,14 @@
 from rest_framework.permissions import BasePermission
 
+from users.roles import is_administrator
+
 
 class IsAdministrator(BasePermission):
     """
     Разрешает доступ пользователям из группы 'Administrator'
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.groups.filter(name='Administrator').exists()
+        return is_administrator(request.user)
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -0,0 +1,76 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from config.ttlcache import TTLCache
+
+ADMINISTRATOR_GROUP = "Administrator"
+
+_CHANGED_KEY = "users:changed:{}"
+_ALL_CHANGED_KEY = _CHANGED_KEY.format("*")
+
+
+def get_roles(user):
+    """
+    Возвращает множество групп пользователя. Результат запоминается на объекте пользователя,
+    поэтому в рамках одного запроса к БД обращаемся не больше одного раза.
+    Если группы пришли в JWT (см. CachedJWTAuthentication), запроса нет вовсе.
+    """
+    roles = getattr(user, "_roles", None)
+    if roles is None:
+        if user.is_authenticated:
+            roles = frozenset(user.groups.values_list("name", flat=True))
+        else:
+            roles = frozenset()
+        user._roles = roles
+    return roles
+
+
+def is_administrator(user):
+    return user.is_authenticated and ADMINISTRATOR_GROUP in get_roles(user)
+
+
+async def ais_administrator(user):
+    """
+    is_administrator для асинхронного кода: в поток уходит только запрос групп к БД,
+    если они не пришли в токене.
+    """
+    if getattr(user, "_roles", None) is None:
+        return await sync_to_async(is_administrator)(user)
+    return is_administrator(user)
+
+
+def markers():
+    return caches[settings.USER_MARKERS_CACHE_ALIAS]
+
+
+def mark_changed(user_id=None):
+    """
+    Отмечает изменение пользователя (или всех пользователей, если user_id не указан).
+    Данные, загруженные или выданные в токене раньше этой отметки, считаются устаревшими.
+    """
+    key = _ALL_CHANGED_KEY if user_id is None else _CHANGED_KEY.format(user_id)
+    timeout = settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds()
+    markers().set(key, time.time(), timeout=timeout)
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.pop(str(user_id))
+
+
+def changed_at(user_id):
+    """
+    Время последнего изменения пользователя или его групп (0, если изменений не было).
+    """
+    found = markers().get_many([_CHANGED_KEY.format(user_id), _ALL_CHANGED_KEY])
+    return max(found.values(), default=0)
+
+
+async def achanged_at(user_id):
+    found = await markers().aget_many([_CHANGED_KEY.format(user_id), _ALL_CHANGED_KEY])
+    return max(found.values(), default=0)
+
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
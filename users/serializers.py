@@ -1,30 +1,53 @@
+import time
+
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from library.serializers import BorrowSerializer
 from users.models import User
-from library.models import Borrow
+from library.models import BorrowRecord
+from users.roles import get_roles
+
+
+class UserBorrowSerializer(BorrowSerializer):
+    """
+    Выдача в истории пользователя (без поля user).
+    """
+    user = None
+
+    class Meta(BorrowSerializer.Meta):
+        fields = None
+        exclude = ("user",)
 
 
 class UserSerializer(serializers.ModelSerializer):
     borrows = serializers.SerializerMethodField()
+    borrows_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ("id", "email", "phone", "avatar", "city", "borrows")
+        fields = ("id", "email", "phone", "avatar", "city", "borrows", "borrows_count")
 
     def get_borrows(self, obj):
-        borrows_qs = Borrow.objects.filter(user=obj.id)
-
-        if not borrows_qs.exists():
+        # recent_borrows подгружается во вьюхе через Prefetch с ограничением на пользователя
+        borrows = getattr(obj, "recent_borrows", None)
+        if borrows is None:
+            borrows = list(
+                BorrowRecord.objects.filter(user=obj.id).select_related("book").with_effective_status()
+                .order_by("-borrowed_at", "-id")[:settings.USER_BORROWS_HISTORY_LIMIT]
+            )
+
+        if not borrows:
             return "Отсутствуют"
 
-        data = BorrowSerializer(borrows_qs, many=True).data
-
-        # Удаляем поле user из каждого элемента
-        for item in data:
-            item.pop("user", None)
+        return UserBorrowSerializer(borrows, many=True).data
 
-        return data
+    def get_borrows_count(self, obj):
+        count = getattr(obj, "borrows_count", None)
+        if count is None:
+            count = BorrowRecord.objects.filter(user=obj.id).count()
+        return count
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -43,4 +66,14 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Добавляет в токен группы пользователя, чтобы не запрашивать их на каждый запрос.
+    """
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["roles"] = sorted(get_roles(user))
+        token["roles_at"] = time.time()
+        return token
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from users.roles import mark_changed
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    mark_changed(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        mark_changed(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            mark_changed(user_id)
+    else:
+        # Очистка группы целиком — состав неизвестен, сбрасываем всех
+        mark_changed()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        mark_changed()
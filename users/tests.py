@@ -1,3 +1,116 @@
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from library.models import Author, Book, Borrow
+from users.models import User
+
+
+class UserViewSetTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email="admin@example.com", password="admin123")
+        self.admin.groups.add(Group.objects.create(name="Administrator"))
+        self.client.force_authenticate(user=self.admin)
+        self.author = Author.objects.create(first_name="Bob", last_name="Bobovich")
+        self.books = [Book.objects.create(title=f"Book {i}", author=self.author, total_copies=5) for i in range(4)]
+
+    def make_users(self, count):
+        for i in range(count):
+            user = User.objects.create_user(email=f"reader{count}_{i}@example.com", password="pass1234")
+            for book in self.books:
+                Borrow.objects.create(user=user, book=book)
+
+    def list_queries(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.admin.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/users/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    @override_settings(USER_BORROWS_HISTORY_LIMIT=3)
+    def test_list_is_paginated_and_history_is_capped(self):
+        self.make_users(2)
+        _, data = self.list_queries()
+        self.assertEqual(data["count"], 3)
+        reader = next(item for item in data["results"] if item["email"].startswith("reader"))
+        self.assertEqual(len(reader["borrows"]), 3)
+        self.assertEqual(reader["borrows_count"], 4)
+        self.assertNotIn("user", reader["borrows"][0])
+        self.assertTrue(reader["borrows"][0]["book"].startswith("Book"))
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.make_users(1)
+        few, _ = self.list_queries()
+        self.make_users(6)
+        many, _ = self.list_queries()
+        self.assertEqual(few, many)
+
+    def test_user_without_borrows(self):
+        _, data = self.list_queries()
+        self.assertEqual(data["results"][0]["borrows"], "Отсутствуют")
+        self.assertEqual(data["results"][0]["borrows_count"], 0)
+
+
+@override_settings(TRUST_TOKEN_ROLES=True)
+class RoleCacheTest(TestCase):
+
+    def setUp(self):
+        from users.roles import markers, user_cache
+
+        markers().clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.group = Group.objects.create(name="Administrator")
+        self.admin = User.objects.create_user(email="jwt.admin@example.com", password="admin123")
+        self.admin.groups.add(self.group)
+        response = self.client.post("/api/users/token/", {"email": self.admin.email, "password": "admin123"})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+    def auth_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        tables = ("auth_group", "users_user")
+        return response, [q["sql"] for q in ctx.captured_queries if any(t in q["sql"] for t in tables)]
+
+    def test_token_contains_roles(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        token = AccessToken(self.client._credentials["HTTP_AUTHORIZATION"].split()[1])
+        self.assertEqual(token["roles"], ["Administrator"])
+
+    def test_admin_endpoint_has_no_auth_queries_when_warm(self):
+        self.auth_queries("/api/library/admin_authors/")
+        response, queries = self.auth_queries("/api/library/admin_authors/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_group_change_invalidates_token_roles(self):
+        self.auth_queries("/api/library/admin_authors/")
+        self.admin.groups.remove(self.group)
+        response, queries = self.auth_queries("/api/library/admin_authors/")
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(queries)
+
+    def test_untrusted_token_roles_are_checked_in_db(self):
+        from users.roles import markers
+
+        with self.settings(TRUST_TOKEN_ROLES=False):
+            self.auth_queries("/api/library/admin_authors/")
+            self.admin.groups.remove(self.group)
+            # Отметка не видна (другой процесс или вытеснена) — группы всё равно читаются из БД
+            markers().clear()
+            response, queries = self.auth_queries("/api/library/admin_authors/")
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(any("auth_group" in sql for sql in queries))
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth_queries("/api/library/admin_authors/")
+        self.admin.is_active = False
+        self.admin.save()
+        response, _ = self.auth_queries("/api/library/admin_authors/")
+        self.assertEqual(response.status_code, 401)
@@ -1,6 +1,11 @@
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .permissions import IsAdministrator
 from users.models import User
+from library.models import Borrow, BorrowHistory, BorrowRecord
+from library.pagination import StandardResultsSetPagination
 from rest_framework import generics, viewsets
 from .serializers import UserRegisterSerializer, UserSerializer
 
@@ -15,3 +20,26 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdministrator]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        # Последние выдачи каждого пользователя (с архивом) подгружаются одним запросом (окно по user_id)
+        recent_borrows = (
+            BorrowRecord.objects.select_related("book").with_effective_status()
+            .order_by("-borrowed_at", "-id")[:settings.USER_BORROWS_HISTORY_LIMIT]
+        )
+        # Коррелированные подзапросы вместо GROUP BY по всем пользователям: страница берётся по индексу id,
+        # число выдач считается только для её строк — отдельно по Borrow и по архиву, каждое по индексу user_id
+        borrows_count = [
+            Coalesce(Subquery(
+                model.objects.filter(user=OuterRef("pk")).order_by()
+                .values("user").annotate(count=Count("pk")).values("count"),
+                output_field=IntegerField(),
+            ), Value(0))
+            for model in (Borrow, BorrowHistory)
+        ]
+        return (
+            User.objects.annotate(borrows_count=borrows_count[0] + borrows_count[1])
+            .prefetch_related(Prefetch("borrow_records", queryset=recent_borrows, to_attr="recent_borrows"))
+            .order_by("id")
+        )